@@ -304,7 +304,9 @@ class ApiService {
   getInsightsCacheStats() { return {}; }
 
   // File Upload Methods
-  async uploadAndAnalyzeFile(file) {
+  // POST /upload_excel/ queues a background job; poll GET /jobs/{jobId} until it finishes
+  // and resolve with the job result ({ general-insights, Supplier-KPIs, ingestion, sheetCache })
+  async uploadAndAnalyzeFile(file, { pollIntervalMs = 1000, onProgress } = {}) {
     const formData = new FormData();
     formData.append('file', file);
 
@@ -325,7 +327,18 @@ class ApiService {
         throw new Error(message);
       }
 
-      return await response.json();
+      const { jobId } = await response.json();
+      while (true) {
+        const job = await api.get(`/jobs/${jobId}`);
+        if (onProgress) onProgress(job);
+        if (job.status === 'completed') {
+          return job.result;
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error?.detail || 'File processing failed');
+        }
+        await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+      }
     } catch (error) {
       console.error('File upload error:', error);
       throw error;
@@ -0,0 +1,225 @@
+"""
+Dashboard and KPI builder scaling benchmarks.
+
+Run from the server directory:
+
+    python -m benchmarks.run --suppliers 10,100,1000 --kpis 9 --missing 0.1 --years 1
+    python -m benchmarks.run --suppliers 1000 --compare benchmarks/results/<earlier>.json
+
+For every supplier count it generates synthetic data in a temp directory and
+records latency (min/median/max over --repeat runs), peak traced memory of
+one extra run, and output size for build_kpi_json (cold, warm, one changed
+CSV) and for each dashboard section. Results are written as JSON to
+--output (default: benchmarks/results/bench-<timestamp>.json).
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks import synthetic
+from services.dashboard_logic import DashboardAnalytics, SECTIONS
+from services.kpi_arrow import arrow_available, arrow_path, write_arrow_snapshot
+from services.kpi_builder import build_kpi_json
+from services.kpi_repository import kpi_repository
+
+BENCHMARKS_DIR = Path(__file__).parent
+RESULTS_VERSION = 1
+
+
+def _output_bytes(value: Any) -> int:
+    if value is None:
+        return 0
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def measure(run: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Time `run` `repeat` times (after `setup` each time), then trace one more run's peak memory."""
+    timings = []
+    value = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        value = run()
+        timings.append((time.perf_counter() - start) * 1000)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "latencyMs": {
+            "min": round(min(timings), 3),
+            "median": round(statistics.median(timings), 3),
+            "max": round(max(timings), 3),
+        },
+        "peakMemoryBytes": peak,
+        "outputBytes": _output_bytes(value),
+    }
+
+
+def bench_kpi_builder(workdir: Path, suppliers: int, kpis: int, missing: float, repeat: int, seed: int) -> List[Dict[str, Any]]:
+    csv_dir = workdir / "csv_output"
+    output = workdir / "final_supplier_kpis.json"
+    manifest = workdir / "kpi_manifest.json"
+    synthetic.write_csv_folder(csv_dir, suppliers, kpis, missing, seed)
+
+    def build():
+        return build_kpi_json(csv_dir, output, manifest)
+
+    def cold():
+        manifest.unlink(missing_ok=True)
+        output.unlink(missing_ok=True)
+
+    def one_changed():
+        synthetic.rewrite_supplier_csvs(csv_dir, 1, kpis, missing)
+
+    results = []
+    for name, setup in (("cold", cold), ("warm", None), ("oneChanged", one_changed)):
+        if setup is None:
+            build()
+        result = measure(build, repeat, setup)
+        result["outputBytes"] = output.stat().st_size
+        results.append({"benchmark": f"kpi_builder.{name}", **result})
+    return results
+
+
+def bench_dashboard(kpi_files: List[Path], repeat: int) -> List[Dict[str, Any]]:
+    kpi_file = kpi_files[-1]
+    results = []
+
+    def load():
+        analytics = DashboardAnalytics(str(kpi_file))
+        analytics.load_data()
+        return None
+
+    def cold():
+        # The repository would otherwise serve the already parsed file
+        kpi_repository(kpi_file).bump()
+
+    results.append({"benchmark": "dashboard.load", **measure(load, repeat, cold)})
+
+    if arrow_available():
+        with open(kpi_file, "r", encoding="utf-8") as f:
+            write_arrow_snapshot(json.load(f), kpi_file)
+        results.append({"benchmark": "dashboard.loadArrow", **measure(load, repeat, cold)})
+        arrow_path(kpi_file).unlink()
+
+    analytics = DashboardAnalytics(str(kpi_file))
+    analytics.load_data()
+    for section in SECTIONS:
+        results.append({"benchmark": f"dashboard.{section}", **measure(lambda: analytics.generate_section(section), repeat)})
+
+    results.append({"benchmark": "dashboard.complete", **measure(lambda: DashboardAnalytics(str(kpi_file)).generate_complete(), repeat)})
+
+    if len(kpi_files) > 1:
+        def history():
+            return [DashboardAnalytics(str(path)).generate_complete() for path in kpi_files]
+        results.append({"benchmark": "dashboard.completeAllYears", **measure(history, repeat)})
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCHMARKS_DIR, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(supplier_counts: List[int], kpis: int, missing: float, years: int, repeat: int, seed: int, skip_builder: bool) -> Dict[str, Any]:
+    results = []
+    for suppliers in supplier_counts:
+        with tempfile.TemporaryDirectory(prefix="kpi-bench-") as tmp:
+            workdir = Path(tmp)
+            params = {"suppliers": suppliers, "kpis": kpis, "missingRatio": missing, "years": years}
+            kpi_files = synthetic.write_kpi_json(workdir / "dashboard" / "final_supplier_kpis.json", suppliers, kpis, missing, years, seed)
+            rows = bench_dashboard(kpi_files, repeat)
+            if not skip_builder:
+                rows += bench_kpi_builder(workdir / "builder", suppliers, kpis, missing, repeat, seed)
+            for row in rows:
+                row.update(params)
+                print(f"{row['benchmark']:<34} suppliers={suppliers:<7} median={row['latencyMs']['median']:>10.2f} ms  "
+                      f"peak={row['peakMemoryBytes'] / 1e6:>8.2f} MB  output={row['outputBytes'] / 1e6:>8.2f} MB")
+            results.extend(rows)
+    return {
+        "version": RESULTS_VERSION,
+        "generatedAt": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "gitCommit": _git_commit(),
+        },
+        "parameters": {"suppliers": supplier_counts, "kpis": kpis, "missingRatio": missing, "years": years, "repeat": repeat, "seed": seed},
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print median latency, peak memory and output size ratios (current / baseline) per benchmark."""
+    def key(row):
+        return (row["benchmark"], row["suppliers"], row["kpis"], row["missingRatio"], row["years"])
+
+    previous = {key(row): row for row in baseline.get("results", [])}
+    print(f"\nCompared with {baseline.get('environment', {}).get('gitCommit') or 'baseline'} ({baseline.get('generatedAt')}):")
+    for row in current["results"]:
+        old = previous.get(key(row))
+        if not old:
+            continue
+
+        def ratio(new_value, old_value):
+            return f"{new_value / old_value:6.2f}x" if old_value else "   n/a"
+
+        print(f"{row['benchmark']:<34} suppliers={row['suppliers']:<7} "
+              f"latency {ratio(row['latencyMs']['median'], old['latencyMs']['median'])}  "
+              f"memory {ratio(row['peakMemoryBytes'], old['peakMemoryBytes'])}  "
+              f"output {ratio(row['outputBytes'], old['outputBytes'])}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Dashboard / KPI builder scaling benchmarks")
+    parser.add_argument("--suppliers", default="10,100,1000", help="Comma-separated supplier counts (e.g. 10,1000,100000)")
+    parser.add_argument("--kpis", type=int, default=9, help="KPIs per supplier (CSV data is capped at the 9 the parser knows)")
+    parser.add_argument("--missing", type=float, default=0.1, help="Fraction of missing monthly values")
+    parser.add_argument("--years", type=int, default=1, help="Yearly KPI files to generate; the dashboard runs on the last, plus once over all")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-builder", action="store_true", help="Only benchmark the dashboard")
+    parser.add_argument("--output", type=Path, default=None, help="Results JSON path")
+    parser.add_argument("--compare", type=Path, default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    # The builder logs every CSV at INFO
+    logging.basicConfig(level=logging.WARNING)
+
+    supplier_counts = [int(value) for value in args.suppliers.split(",") if value.strip()]
+    report = run(supplier_counts, args.kpis, args.missing, args.years, max(1, args.repeat), args.seed, args.skip_builder)
+
+    output = args.output or BENCHMARKS_DIR / "results" / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Synthetic supplier KPI data for the benchmarks: final_supplier_kpis.json
+payloads and per-supplier CSVs in the layout kpi_builder parses.
+"""
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from services.kpi_builder import ALL_MONTHS, kpi_map
+
+# (row label, kpi name, unit, value range) for the KPIs the CSV parser recognises
+KPI_SPECS = [
+    (label, kpi_name, unit, value_range)
+    for (label, kpi_name), (unit, value_range) in zip(
+        kpi_map.items(),
+        [
+            ("Nos", (0, 3)),
+            ("Hrs", (0, 20)),
+            ("%", (60, 100)),
+            ("Nos", (10, 200)),
+            ("Nos", (1000, 50000)),
+            ("Nos", (50, 500)),
+            ("Hrs", (1, 12)),
+            ("Hrs", (0, 40)),
+            ("Nos", (0, 10)),
+        ],
+    )
+]
+UNIT_DESCRIPTIONS = {kpi_name: f"Synthetic {kpi_name} ({unit})" for _, kpi_name, unit, _ in KPI_SPECS}
+
+
+def kpi_names(count: int) -> List[str]:
+    """The real KPI names first, then `kpi_10`, `kpi_11`, ... beyond the nine known ones."""
+    names = [kpi_name for _, kpi_name, _, _ in KPI_SPECS][:count]
+    names += [f"kpi_{i + 1}" for i in range(len(names), count)]
+    return names
+
+
+def supplier_names(count: int) -> List[str]:
+    return [f"Supplier_{i:06d}" for i in range(count)]
+
+
+def _value(rng: random.Random, value_range, missing_ratio: float):
+    if rng.random() < missing_ratio:
+        return None
+    low, high = value_range
+    if isinstance(low, int) and high <= 10:
+        return rng.randint(low, high)
+    return round(rng.uniform(low, high), 2)
+
+
+def _value_range(kpi_name: str):
+    for _, name, _, value_range in KPI_SPECS:
+        if name == kpi_name:
+            return value_range
+    return (0.0, 100.0)
+
+
+def generate_kpi_data(suppliers: int, kpis: int = 9, missing_ratio: float = 0.1, year: int = 2025, seed: int = 0) -> Dict[str, Any]:
+    """A final_supplier_kpis.json payload: {generatedOn, kpiMetadata, <kpi>: {<supplier>: {<month>: value}}}."""
+    rng = random.Random(seed)
+    names = kpi_names(kpis)
+    data: Dict[str, Any] = {
+        "generatedOn": f"{year}-12-31",
+        "kpiMetadata": {"unitDescriptions": {name: UNIT_DESCRIPTIONS.get(name, name) for name in names}},
+    }
+    for kpi_name in names:
+        value_range = _value_range(kpi_name)
+        data[kpi_name] = {
+            supplier: {month: _value(rng, value_range, missing_ratio) for month in ALL_MONTHS}
+            for supplier in supplier_names(suppliers)
+        }
+    return data
+
+
+def write_kpi_json(path: Path, suppliers: int, kpis: int = 9, missing_ratio: float = 0.1, years: int = 1, seed: int = 0) -> List[Path]:
+    """Write one KPI file per year (the last year at `path`, earlier ones as `<stem>_<year>.json`)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    last_year = 2025
+    written = []
+    for offset in range(years):
+        year = last_year - (years - 1) + offset
+        target = path if year == last_year else path.with_name(f"{path.stem}_{year}{path.suffix}")
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(generate_kpi_data(suppliers, kpis, missing_ratio, year, seed + offset), f)
+        written.append(target)
+    return written
+
+
+def write_supplier_csv(path: Path, rng: random.Random, kpis: int = 9, missing_ratio: float = 0.1):
+    """One supplier sheet as csv_parser would extract it: header, KPI rows with a unit column, and noise rows."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["S.No", "KPI", "Parameter", "Target", "Unit"] + ALL_MONTHS)
+        for i, (label, _, unit, value_range) in enumerate(KPI_SPECS[:kpis], start=1):
+            values = []
+            for _ in ALL_MONTHS:
+                value = _value(rng, value_range, missing_ratio)
+                values.append("" if value is None else ("#DIV/0!" if rng.random() < 0.02 else value))
+            writer.writerow([i, label, "", "", unit] + values)
+            if rng.random() < 0.2:
+                writer.writerow(["", "Remarks", "", "", ""] + [""] * len(ALL_MONTHS))
+
+
+def write_csv_folder(folder: Path, suppliers: int, kpis: int = 9, missing_ratio: float = 0.1, seed: int = 0) -> List[Path]:
+    """Per-supplier CSVs for build_kpi_json (only the nine KPIs the parser maps can appear)."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for supplier in supplier_names(suppliers):
+        path = folder / f"{supplier}.csv"
+        write_supplier_csv(path, rng, min(kpis, len(KPI_SPECS)), missing_ratio)
+        paths.append(path)
+    return paths
+
+
+def rewrite_supplier_csvs(folder: Path, count: int, kpis: int = 9, missing_ratio: float = 0.1, seed: Optional[int] = None) -> List[Path]:
+    """Regenerate the first `count` supplier CSVs with new values (an incremental re-upload)."""
+    rng = random.Random(seed)
+    paths = sorted(Path(folder).glob("*.csv"))[:count]
+    for path in paths:
+        write_supplier_csv(path, rng, min(kpis, len(KPI_SPECS)), missing_ratio)
+    return paths
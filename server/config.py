@@ -13,9 +13,61 @@ DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 BASE_DIR = Path(__file__).parent
 CSV_DIR = BASE_DIR / "results" / "csv_output"
 RESULTS_DIR = BASE_DIR / "results"
+SHEET_CACHE_FILE = RESULTS_DIR / "sheet_cache.json"
+# results/ artifacts are published as versioned snapshots (results/snapshots/<n>, results/current);
+# this many recent snapshots are kept
+RESULTS_SNAPSHOTS_KEEP = int(os.getenv("RESULTS_SNAPSHOTS_KEEP", "5"))
 
 # Excel processing settings
 EXCLUDED_SHEETS = ['Average Summary', 'Analysis SUMMARY', 'Sheet1']
+# Process-pool size for per-sheet extraction (1 = serial)
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "1"))
+
+# Background upload jobs: all jobs write the same results/ artifacts, so the default pool runs one at a time
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "1"))
+# Finished jobs kept for GET /jobs/{id}
+UPLOAD_JOB_HISTORY = int(os.getenv("UPLOAD_JOB_HISTORY", "100"))
+# Job state is mirrored here so every server worker can answer for jobs started by another
+UPLOAD_JOBS_DIR = RESULTS_DIR / "jobs"
+
+# Upload spooling: uploads are copied in chunks into a temp file that stays in memory
+# up to UPLOAD_SPOOL_MEMORY_BYTES and rolls over to disk beyond it
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_SPOOL_MEMORY_BYTES = int(os.getenv("UPLOAD_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Batch uploads: workbooks per request and process-pool size for extracting them side by side
+MAX_BATCH_WORKBOOKS = int(os.getenv("MAX_BATCH_WORKBOOKS", "200"))
+# Total bytes unpacked from .zip archives in one batch upload
+MAX_BATCH_UNPACKED_BYTES = int(os.getenv("MAX_BATCH_UNPACKED_BYTES", str(2 * 1024 * 1024 * 1024)))
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Dashboard responses cached per KPI data version (full payload + section/filter variants)
+DASHBOARD_CACHE_ENTRIES = int(os.getenv("DASHBOARD_CACHE_ENTRIES", "64"))
+# Where dashboard aggregates come from: "json" (final_supplier_kpis.json, in-process)
+# or "postgres" (grouped SQL over supplier_kpi_monthly; DASHBOARD_YEAR defaults to the latest year)
+DASHBOARD_BACKEND = os.getenv("DASHBOARD_BACKEND", "json").lower()
+DASHBOARD_YEAR = int(os.getenv("DASHBOARD_YEAR")) if os.getenv("DASHBOARD_YEAR") else None
+# Postgres backend: seconds a worker reuses the ingest version (supplier_kpi_version) it last read
+DASHBOARD_VERSION_POLL_SECONDS = float(os.getenv("DASHBOARD_VERSION_POLL_SECONDS", "1"))
+# Multi-worker deployments (json backend): keep one copy of the dashboard KPI cube in named
+# shared memory (<name>_ctl + <name>_<version>) that every worker maps read-only
+KPI_SHARED_MEMORY = os.getenv("KPI_SHARED_MEMORY", "False").lower() == "true"
+KPI_SHARED_MEMORY_NAME = os.getenv("KPI_SHARED_MEMORY_NAME", "supplier_kpi_cube")
+
+# Postgres ingest of final_supplier_kpis.json: "values" (execute_values upserts), "batch"
+# (executemany) or "copy" (COPY into an unlogged staging table + one set-based merge)
+KPI_INGEST_METHOD = os.getenv("KPI_INGEST_METHOD", "values").lower()
+KPI_INGEST_BATCH_SIZE = int(os.getenv("KPI_INGEST_BATCH_SIZE", "2000"))
+# Write only new/changed rows and delete removed ones, using per-supplier content hashes (supplier_kpi_hashes)
+KPI_INGEST_DELTA = os.getenv("KPI_INGEST_DELTA", "True").lower() == "true"
+# Concurrent ingest connections (rows are split by supplier; capped at 4, one less than the engine pool of 5)
+KPI_INGEST_WORKERS = int(os.getenv("KPI_INGEST_WORKERS", "1"))
+# Apply all partitions in one transaction (parallel load into a staging table, single merge)
+KPI_INGEST_ATOMIC = os.getenv("KPI_INGEST_ATOMIC", "False").lower() == "true"
+# Create supplier_kpi_monthly partitioned by year (LIST, one partition per year, added on ingest);
+# an existing plain table is migrated on the first ingest
+KPI_TABLE_PARTITIONED = os.getenv("KPI_TABLE_PARTITIONED", "False").lower() == "true"
 
 
 # Logging settings
@@ -1,37 +1,96 @@
-from fastapi import APIRouter, HTTPException
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import json
 import logging
-from services.dashboard_logic import generate_dashboard_analytics as generate_dashboard
-from config import RESULTS_DIR
+import time
+from services.dashboard_cache import dashboard_cache
+from services.dashboard_logic import SECTIONS, RANKING_DIRECTIONS
+from services.dashboard_columnar import ColumnarEncoder, FORMATS
+from services.results_store import results_store
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+def _ranking_page(limit: Optional[int], offset: int, direction: str) -> Dict[str, Any]:
+    if direction not in RANKING_DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown ranking direction '{direction}'. Expected one of: {', '.join(RANKING_DIRECTIONS)}")
+    return {"limit": limit, "offset": offset, "direction": direction}
+
+
+def _output(format: str, binary: bool) -> Dict[str, Any]:
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Expected one of: {', '.join(FORMATS)}")
+    if binary and format != "columnar":
+        raise HTTPException(status_code=400, detail="binary=true requires format=columnar")
+    return {"format": format, "binary": binary}
+
+
+def _build_dashboard_response(ranking_page: Dict[str, Any], output: Dict[str, Any]) -> bytes:
+    analytics = dashboard_cache.analytics()
+    if analytics is None:
+        raise HTTPException(status_code=500, detail="Failed to load KPI data")
+
+    dashboard_data = analytics.generate_complete(**ranking_page)
+    if "error" in dashboard_data:
+        raise HTTPException(status_code=500, detail=dashboard_data["error"])
+
+    dashboard_data["status"] = "success"
+    paged = ranking_page["limit"] is not None or ranking_page["offset"] or ranking_page["direction"] != "best"
+    if paged:
+        dashboard_data["rankingPage"] = dict(ranking_page, totals=analytics.ranking_totals())
+    if output["format"] == "columnar":
+        encoder = ColumnarEncoder(analytics.suppliers, analytics.kpi_names, analytics.months, binary=output["binary"])
+        dashboard_data = encoder.dashboard(dashboard_data)
+    elif not paged:
+        # Written once per KPI data version rather than on every request
+        results_store.write_json('dashboard_analytics.json', dashboard_data, indent=None, ensure_ascii=False)
+
+    payload = {
+        "message": "Dashboard analytics generated successfully",
+        "data": dashboard_data,
+        "totalSuppliers": dashboard_data.get("metadata", {}).get("totalSuppliers", 0),
+        "totalKPIs": dashboard_data.get("metadata", {}).get("totalKPIs", 0),
+    }
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _json_response(request: Request, fingerprint, body: bytes) -> Response:
+    etag = f'"{fingerprint}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @router.get("/dashboard")
-def get_dashboard_analytics():
+def get_dashboard_analytics(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    direction: str = "best",
+    format: str = "json",
+    binary: bool = False,
+):
+    """Full dashboard. `limit`/`offset`/`direction` ("best" or "worst") page every
+    KPI's rankings; unpaged requests return the complete lists.
+    `format=columnar` (optionally with `binary=true`) returns the compact
+    encoding described in services/dashboard_columnar.py."""
     try:
-        kpi_file = RESULTS_DIR / 'final_supplier_kpis.json'
-        if not kpi_file.exists():
+        if not dashboard_cache.has_data():
             raise HTTPException(status_code=404, detail="KPI data not found. Please upload and process an Excel file first.")
 
-        dashboard_data = generate_dashboard()
-        if "error" in dashboard_data:
-            raise HTTPException(status_code=500, detail=dashboard_data["error"])
-
-        dashboard_data["status"] = "success"
-        dashboard_file = RESULTS_DIR / 'dashboard_analytics.json'
-        with open(dashboard_file, "w", encoding="utf-8") as f:
-            json.dump(dashboard_data, f, indent=2, ensure_ascii=False)
-
-        return {
-            "message": "Dashboard analytics generated successfully",
-            "data": dashboard_data,
-            "totalSuppliers": dashboard_data.get("metadata", {}).get("totalSuppliers", 0),
-            "totalKPIs": dashboard_data.get("metadata", {}).get("totalKPIs", 0),
-        }
+        ranking_page = _ranking_page(limit, offset, direction)
+        output = _output(format, binary)
+        if ranking_page == _ranking_page(None, 0, "best") and output == _output("json", False):
+            cache_key = "complete"
+        else:
+            cache_key = json.dumps(["complete", ranking_page, output], sort_keys=True)
+        fingerprint, body = dashboard_cache.get(cache_key, lambda: _build_dashboard_response(ranking_page, output))
+        return _json_response(request, fingerprint, body)
     except HTTPException:
         raise
     except Exception as e:
@@ -39,3 +98,149 @@ def get_dashboard_analytics():
         raise HTTPException(status_code=500, detail=f"Failed to generate dashboard analytics: {str(e)}")
 
 
+def _diff_data(fingerprint: str, changed: List[str], sections: bytes) -> str:
+    """JSON for a 'diff' event: {"fingerprint", "changedSuppliers", "sections"}.
+
+    `sections` is the cached, already serialised generate_diff output; it is
+    embedded verbatim as the last member rather than parsed and dumped again
+    for every subscriber.
+    """
+    return f'{{"fingerprint": {json.dumps(fingerprint)}, "changedSuppliers": {json.dumps(changed)}, "sections": {sections.decode("utf-8")}}}'
+
+
+def _diff_event(since: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(fingerprint, 'diff' SSE event) for the suppliers changed since `since`, or
+    None when the change is not limited to known suppliers (send a 'version' event)."""
+    fingerprint, changed = dashboard_cache.changes_since(since)
+    if not changed:
+        return None
+
+    def build() -> bytes:
+        analytics = dashboard_cache.analytics()
+        if analytics is None:
+            raise HTTPException(status_code=500, detail="Failed to load KPI data")
+        return json.dumps(analytics.generate_diff(changed), ensure_ascii=False).encode("utf-8")
+
+    # Built once per version and change set, shared by every subscriber
+    built_for, body = dashboard_cache.get(json.dumps(["diff", changed]), build)
+    if built_for != fingerprint:
+        return None
+    return fingerprint, f"event: diff\ndata: {_diff_data(fingerprint, changed, body)}\n\n"
+
+
+@router.get("/dashboard/events")
+async def stream_dashboard_events(request: Request, diff: bool = False):
+    """Server-Sent Events stream of dashboard data versions.
+
+    Sends a 'version' event with the current fingerprint (the `/dashboard` ETag)
+    on connect and whenever the data changes, e.g. after an upload or ingest.
+    With `diff=true`, changes limited to some suppliers are sent as a 'diff'
+    event instead (see DashboardAnalytics.generate_diff); a 'version' event
+    still means "refetch". Nothing is computed while the data is unchanged.
+    """
+
+    async def event_generator():
+        last = None
+        connected = False
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            fingerprint = dashboard_cache.fingerprint()
+            if not connected or fingerprint != last:
+                diff_event = None
+                if connected and diff:
+                    try:
+                        diff_event = await run_in_threadpool(_diff_event, last)
+                    except Exception as e:
+                        logger.warning(f"Dashboard diff failed, sending version: {e}")
+                if diff_event is None:
+                    fingerprint = dashboard_cache.fingerprint()
+                    data = {"fingerprint": fingerprint, "hasData": dashboard_cache.has_data()}
+                    event = f"event: version\ndata: {json.dumps(data)}\n\n"
+                else:
+                    fingerprint, event = diff_event
+                connected = True
+                last = fingerprint
+                last_sent = time.monotonic()
+                yield event
+            elif time.monotonic() - last_sent > 15:
+                # Keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            await asyncio.sleep(0.5)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    return items or None
+
+
+@router.get("/dashboard/{section}")
+def get_dashboard_section(
+    section: str,
+    request: Request,
+    suppliers: Optional[str] = None,
+    kpis: Optional[str] = None,
+    months: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    direction: str = "best",
+    format: str = "json",
+    binary: bool = False,
+):
+    """One dashboard section, optionally restricted to comma-separated
+    `suppliers`, `kpis` and `months` (e.g. `?kpis=accidents,trips&months=Jan,Feb`).
+    Only the requested section is computed, over the requested slice.
+    For `rankings`, `limit`/`offset`/`direction` return one page per KPI
+    (e.g. `?limit=10&direction=worst` for the bottom 10). `format`/`binary`
+    as for /dashboard."""
+    if section not in SECTIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown dashboard section '{section}'. Available: {', '.join(SECTIONS)}")
+    try:
+        if not dashboard_cache.has_data():
+            raise HTTPException(status_code=404, detail="KPI data not found. Please upload and process an Excel file first.")
+
+        filters = {"suppliers": _split(suppliers), "kpis": _split(kpis), "months": _split(months)}
+        ranking_page = _ranking_page(limit, offset, direction) if section == "rankings" else {}
+        output = _output(format, binary)
+
+        def build() -> bytes:
+            analytics = dashboard_cache.analytics()
+            if analytics is None:
+                raise HTTPException(status_code=500, detail="Failed to load KPI data")
+            try:
+                view = analytics.sliced(**filters)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            data = view.generate_section(section, **ranking_page)
+            if output["format"] == "columnar":
+                encoder = ColumnarEncoder(view.suppliers, view.kpi_names, view.months, binary=output["binary"])
+                data = {"format": "columnar", "binary": output["binary"], section: encoder.section(section, data), "dictionaries": encoder.dictionaries()}
+            payload = {
+                "section": section,
+                "filters": filters,
+                "data": data,
+                "totalSuppliers": len(view.suppliers),
+                "totalKPIs": len(view.kpi_names),
+                "status": "success",
+            }
+            if ranking_page:
+                payload["page"] = dict(ranking_page, totals=view.ranking_totals())
+            return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+        cache_key = json.dumps([section, filters, ranking_page, output], sort_keys=True)
+        fingerprint, body = dashboard_cache.get(cache_key, build)
+        return _json_response(request, fingerprint, body)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error generating dashboard section '{section}'")
+        raise HTTPException(status_code=500, detail=f"Failed to generate dashboard section: {str(e)}")
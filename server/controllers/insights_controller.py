@@ -4,7 +4,8 @@ import json
 import logging
 from services.additional_insights_service import generate_additional_insights
 from services.general_summary_service import generate_general_insights
-from config import RESULTS_DIR
+from services.kpi_repository import kpi_repository
+from services.results_store import results_store
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +15,10 @@ router = APIRouter()
 @router.get("/insights")
 def get_general_insights(refresh: bool = False):
     try:
-        kpi_file = RESULTS_DIR / 'final_supplier_kpis.json'
-        if not kpi_file.exists():
+        if not kpi_repository().exists():
             raise HTTPException(status_code=404, detail="KPI data not found. Please upload and process an Excel file first.")
 
-        general_file = RESULTS_DIR / 'General-info.json'
+        general_file = results_store.path('General-info.json')
 
         if not refresh and general_file.exists():
             with open(general_file, "r", encoding="utf-8") as f:
@@ -46,21 +46,18 @@ def get_general_insights(refresh: bool = False):
 @router.post("/generate_more_insights")
 def generate_more_insights():
     try:
-        kpi_file = RESULTS_DIR / 'final_supplier_kpis.json'
-        if not kpi_file.exists():
+        if not kpi_repository().exists():
             raise HTTPException(status_code=404, detail="KPI data not found. Please upload and process an Excel file first.")
 
         additional_insights = generate_additional_insights()
 
         existing_general = []
-        general_file = RESULTS_DIR / 'General-info.json'
+        general_file = results_store.path('General-info.json')
         if general_file.exists():
             with open(general_file, "r", encoding="utf-8") as f:
                 existing_general = json.load(f)
 
-        additional_file = RESULTS_DIR / 'additional-insights.json'
-        with open(additional_file, "w", encoding="utf-8") as f:
-            json.dump(additional_insights, f, indent=2, ensure_ascii=False)
+        results_store.write_json('additional-insights.json', additional_insights, indent=2, ensure_ascii=False)
 
         return {
             "message": "Additional insights generated successfully",
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+import logging
+
+from services.upload_jobs import get_job, list_jobs, TERMINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/jobs")
+def get_jobs():
+    jobs = list_jobs()
+    return {"jobs": jobs, "total": len(jobs)}
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-Sent Events stream of job snapshots.
+
+    Emits a 'progress' event whenever the job changes and a final 'completed' or
+    'failed' event (carrying the result) before closing.
+    """
+    if get_job(job_id, include_result=False) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+    async def event_generator():
+        last_version = -1
+        while True:
+            job = get_job(job_id, include_result=False)
+            if job is None:
+                break
+            if job["status"] in TERMINAL_STATUSES:
+                final = get_job(job_id) or job
+                yield f"event: {final['status']}\ndata: {json.dumps(final, default=str)}\n\n"
+                break
+            if job["version"] != last_version:
+                last_version = job["version"]
+                yield f"event: progress\ndata: {json.dumps(job, default=str)}\n\n"
+            await asyncio.sleep(0.5)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
@@ -1,122 +1,135 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import json
+from typing import List
+import hashlib
 import logging
-import openpyxl
-import io
+import os
+import tempfile
 
-from config import CSV_DIR, RESULTS_DIR
-from services.csv_parser import extract_csv, normalize_sheet_name
-from services.kpi_builder import build_kpi_json
-from services.general_summary_service import generate_general_insights
-from services.kpi_ingest_service import ingest_final_kpis, test_db_connection
+from config import MAX_UPLOAD_BYTES, UPLOAD_SPOOL_MEMORY_BYTES, UPLOAD_CHUNK_BYTES, MAX_BATCH_WORKBOOKS
+from services.upload_jobs import submit_upload_job, submit_batch_upload_job
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.post("/upload_excel/")
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the maximum upload size of {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.",
+    )
+
+
+async def _spool_upload(file: UploadFile, spool=None):
+    """Copy the upload in chunks into a spooled temp file, hashing as it goes.
+
+    Memory stays bounded by UPLOAD_SPOOL_MEMORY_BYTES (the spool rolls over to
+    disk beyond it); the size ceiling is enforced as soon as it is crossed.
+    A different target file (e.g. a named temp file) can be passed as `spool`.
+    Returns (spool positioned at 0, sha256 hex digest, size in bytes).
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+
+    if spool is None:
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MEMORY_BYTES)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise _too_large()
+            hasher.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, hasher.hexdigest(), size
+
+
+@router.post("/upload_excel/", status_code=202)
 async def upload_excel(file: UploadFile = File(...)):
+    """Accept a workbook and process it in the background.
+
+    Parsing, KPI build, insights and ingestion run on the upload job pool; poll
+    `GET /jobs/{jobId}` or stream `GET /jobs/{jobId}/events` for stage progress
+    and the final result.
+    """
     if not file.filename.endswith(".xlsx"):
         raise HTTPException(status_code=400, detail="Only .xlsx files are supported.")
 
-    # Load workbook directly from uploaded bytes (writes a temp XLSX only for CSV extraction)
-    file_bytes = await file.read()
-    workbook = openpyxl.load_workbook(filename=io.BytesIO(file_bytes), read_only=True, data_only=True)
-
+    spool, sha256, size = await _spool_upload(file)
     try:
-        all_sheet_names = workbook.sheetnames
-        if not all_sheet_names:
-            raise HTTPException(status_code=400, detail="No sheets found in the Excel file")
-
-        from config import EXCLUDED_SHEETS
-        sheets_to_process = [sheet for sheet in all_sheet_names if sheet.strip() not in EXCLUDED_SHEETS]
-        if not sheets_to_process:
-            raise HTTPException(status_code=400, detail="No processable sheets found after exclusions")
-
-        sheets_with_content = []
-        for sheet_name in sheets_to_process:
-            try:
-                if sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    rows = list(sheet.iter_rows(min_row=1, max_row=20, values_only=True))
-                    non_empty_rows = [row for row in rows if any(cell is not None and str(cell).strip() for cell in row)]
-                    if len(non_empty_rows) >= 2:
-                        sheets_with_content.append(sheet_name)
-                    else:
-                        logger.warning(f"Sheet '{sheet_name}' has no meaningful content - skipping")
-            except Exception as e:
-                logger.warning(f"Error checking sheet '{sheet_name}': {e}")
-                sheets_with_content.append(sheet_name)
-        workbook.close()
-
-        existing_csv_files = []
-        missing_csv_files = []
-        for sheet in sheets_to_process:
-            csv_path = CSV_DIR / (normalize_sheet_name(sheet) + ".csv")
-            if csv_path.exists():
-                existing_csv_files.append(sheet)
-            elif sheet in sheets_with_content:
-                missing_csv_files.append(sheet)
-
-        if missing_csv_files:
-            # Re-parse from in-memory workbook by saving temp CSVs directly
-            tmp_path = CSV_DIR  # write CSV outputs only
-            tmp_path.mkdir(parents=True, exist_ok=True)
-            # Use existing extract_csv with a temporary file fallback
-            # Save a temp XLSX only for parsing to CSVs
-            temp_xlsx = RESULTS_DIR / "temp_upload.xlsx"
-            with open(temp_xlsx, "wb") as f:
-                f.write(file_bytes)
-            try:
-                extract_csv(str(temp_xlsx), tmp_path, sheets_to_process=missing_csv_files, skip_first_sheet=False)
-            finally:
-                try:
-                    temp_xlsx.unlink()
-                except Exception:
-                    pass
-
-        all_csv_paths = []
-        for sheet in sheets_to_process:
-            csv_path = CSV_DIR / (normalize_sheet_name(sheet) + ".csv")
-            if csv_path.exists():
-                all_csv_paths.append(csv_path)
-
-        if not all_csv_paths:
-            raise HTTPException(status_code=400, detail="No CSV files available for processing")
-
-        supplier_kpi_info = build_kpi_json()
-        if supplier_kpi_info is None:
-            logger.warning("KPI builder returned None; continuing with empty outputs")
-            supplier_kpi_info = {}
-
-        # Generate general insights first (sync)
-        try:
-            general = generate_general_insights()
-        except Exception as e:
-            logger.warning(f"General insights generation failed: {e}")
-            general = []
-
-        ingest_result = {"upserted": 0}
-        try:
-            # quick connectivity check to fail fast
-            if test_db_connection():
-                ingest_result = ingest_final_kpis(str(RESULTS_DIR / "final_supplier_kpis.json"), skip_nulls=False)
-            else:
-                logger.warning("Skipping ingestion: DB connectivity test failed")
-        except Exception as ingest_err:
-            logger.warning(f"KPI ingestion failed: {ingest_err}")
-
-        return {
-            "message": "Processing completed",
-            "general-insights": general,
-            "Supplier-KPIs": supplier_kpi_info,
-            "ingestion": ingest_result,
-        }
+        # The job owns the spool from here and closes it when it finishes
+        job = submit_upload_job(file.filename, spool, upload={"sha256": sha256, "sizeBytes": size})
+    except Exception as e:
+        spool.close()
+        logger.exception("Failed to queue upload job")
+        raise HTTPException(status_code=500, detail=f"Failed to queue upload: {str(e)}")
+
+    return {
+        "message": "Upload accepted",
+        "jobId": job["jobId"],
+        "status": job["status"],
+        "upload": job["upload"],
+        "statusUrl": f"/jobs/{job['jobId']}",
+        "eventsUrl": f"/jobs/{job['jobId']}/events",
+    }
+
+
+@router.post("/upload_excel/batch", status_code=202)
+async def upload_excel_batch(files: List[UploadFile] = File(...)):
+    """Accept many workbooks (.xlsx files and/or .zip archives of them) as one job.
+
+    The workbooks are extracted in parallel, then all suppliers go through a
+    single KPI build and one bulk ingest.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded.")
+    if len(files) > MAX_BATCH_WORKBOOKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_WORKBOOKS} files can be uploaded at once.")
+    for file in files:
+        if not file.filename.lower().endswith((".xlsx", ".zip")):
+            raise HTTPException(status_code=400, detail=f"'{file.filename}': only .xlsx and .zip files are supported.")
+
+    # Named temp files so extraction workers can open each workbook by path
+    spooled = []
+    uploads = []
+    queued = False
+    try:
+        for file in files:
+            suffix = os.path.splitext(file.filename)[1].lower()
+            target = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+            spooled.append((file.filename, target.name))
+            target, sha256, size = await _spool_upload(file, spool=target)
+            target.close()
+            uploads.append({"filename": file.filename, "sha256": sha256, "sizeBytes": size})
+        # The job owns the temp files from here and removes them when it finishes
+        job = submit_batch_upload_job(spooled, uploads)
+        queued = True
     except HTTPException:
         raise
     except Exception as e:
-        logger.exception("Unexpected error during processing")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
-
+        logger.exception("Failed to queue batch upload job")
+        raise HTTPException(status_code=500, detail=f"Failed to queue upload: {str(e)}")
+    finally:
+        if not queued:
+            for _, path in spooled:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
 
+    return {
+        "message": "Upload accepted",
+        "jobId": job["jobId"],
+        "status": job["status"],
+        "upload": job["upload"],
+        "statusUrl": f"/jobs/{job['jobId']}",
+        "eventsUrl": f"/jobs/{job['jobId']}/events",
+    }
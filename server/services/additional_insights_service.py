@@ -3,7 +3,7 @@ import os
 import logging
 import re
 from services.ai_client import client
-from config import RESULTS_DIR
+from services.kpi_repository import load_kpis
 
 logger = logging.getLogger(__name__)
 
@@ -80,9 +80,10 @@ def _normalize_items(items):
 
 
 def generate_additional_insights():
-    kpi_path = os.path.abspath(str(RESULTS_DIR / "final_supplier_kpis.json"))
-    with open(kpi_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    snapshot = load_kpis()
+    if snapshot is None:
+        raise FileNotFoundError("KPI data not found")
+    data = snapshot.data
 
     excluded_suppliers = ['Sheet1']
     filtered_data = {}
@@ -1,9 +1,20 @@
 import openpyxl
 import csv
+import hashlib
+import os
 import re
 import logging
+import posixpath
+import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
+from config import EXTRACT_WORKERS, UPLOAD_CHUNK_BYTES
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,11 +24,66 @@ def normalize_sheet_name(sheet_name: str) -> str:
     return clean_name
 
 
-def get_sheet_names(file_path: str):
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _read_sheet_index(archive: zipfile.ZipFile):
+    """Return [(sheet name, zip part path)] in workbook order.
+
+    Only the package relationships and workbook.xml are read.
+    """
+    workbook_part = "xl/workbook.xml"
+    try:
+        rels = ET.fromstring(archive.read("_rels/.rels"))
+        for rel in rels:
+            if rel.get("Type", "").endswith("/officeDocument"):
+                workbook_part = rel.get("Target", workbook_part).lstrip('/')
+                break
+    except KeyError:
+        pass
+
+    workbook_dir = posixpath.dirname(workbook_part)
+    rels_part = posixpath.join(workbook_dir, "_rels", posixpath.basename(workbook_part) + ".rels")
+    targets = {}
     try:
-        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
-        names = workbook.sheetnames
-        workbook.close()
+        for rel in ET.fromstring(archive.read(rels_part)):
+            target = rel.get("Target", "")
+            if target.startswith('/'):
+                targets[rel.get("Id")] = target.lstrip('/')
+            else:
+                targets[rel.get("Id")] = posixpath.normpath(posixpath.join(workbook_dir, target))
+    except KeyError:
+        pass
+
+    root = ET.fromstring(archive.read(workbook_part))
+    sheets = []
+    for child in root:
+        if _local_name(child.tag) != "sheets":
+            continue
+        for sheet in child:
+            if _local_name(sheet.tag) != "sheet" or sheet.get("name") is None:
+                continue
+            rel_id = next((v for k, v in sheet.attrib.items() if _local_name(k) == "id" and k.startswith('{')), None)
+            sheets.append((sheet.get("name"), targets.get(rel_id)))
+    return sheets
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def get_sheet_names(source):
+    """List sheet names without loading the workbook.
+
+    `source` may be a path or a binary file object. Only the zip directory and
+    workbook.xml are read, so shared strings and worksheets are never parsed.
+    """
+    try:
+        with zipfile.ZipFile(_rewind(source)) as archive:
+            names = [name for name, _ in _read_sheet_index(archive)]
         logger.info(f"Found {len(names)} sheets: {names}")
         return names
     except Exception as e:
@@ -25,6 +91,40 @@ def get_sheet_names(file_path: str):
         return []
 
 
+def hash_sheet_parts(source, chunk_size=1 << 20):
+    """Map each sheet name to a SHA-256 of its raw worksheet XML part.
+
+    Cell values also depend on the workbook-wide shared strings and styles
+    (dates/number formats), so their digest is folded into every sheet's hash.
+    Sheets whose part cannot be located are left out.
+    """
+    def _digest_member(archive, part, hasher):
+        with archive.open(part) as member:
+            for chunk in iter(lambda: member.read(chunk_size), b""):
+                hasher.update(chunk)
+
+    digests = {}
+    try:
+        with zipfile.ZipFile(_rewind(source)) as archive:
+            members = set(archive.namelist())
+            shared = hashlib.sha256()
+            for part in ("xl/sharedStrings.xml", "xl/styles.xml"):
+                if part in members:
+                    _digest_member(archive, part, shared)
+            shared_digest = shared.digest()
+
+            for name, part in _read_sheet_index(archive):
+                if not part or part not in members:
+                    continue
+                hasher = hashlib.sha256(shared_digest)
+                hasher.update(name.encode("utf-8"))
+                _digest_member(archive, part, hasher)
+                digests[name] = hasher.hexdigest()
+    except Exception as e:
+        logger.error(f"Failed to hash sheet parts: {e}")
+    return digests
+
+
 def _is_empty_row(row):
     return all(cell is None or str(cell).strip() == '' for cell in row)
 
@@ -37,110 +137,238 @@ def _has_meaningful_content(row):
     return not (formula_only and len(non_empty_cells) < 3)
 
 
-def _find_data_boundaries(sheet, start_row=6):
-    rows = list(sheet.iter_rows(min_row=start_row, values_only=True))
-    last_meaningful_row = -1
-    for i, row in enumerate(rows):
+def _scan_sheet(sheet, start_row=6, content_rows=20):
+    """Single pass over a sheet: content check and data boundaries together.
+
+    Returns (has_content, rows), where `has_content` mirrors the "at least two
+    non-empty rows in the first `content_rows`" check and `rows` runs from
+    `start_row` to three rows past the last meaningful row (the first ten
+    rows when none is meaningful), falling back to the same boundaries from
+    row 1 when nothing non-empty remains. Rows after the last meaningful one
+    are only held until the next meaningful row or the end.
+    """
+    head = []
+    kept = []
+    pending = []
+    content_count = 0
+    for index, row in enumerate(sheet.iter_rows(values_only=True)):
+        if index < content_rows and not _is_empty_row(row):
+            content_count += 1
+        if index < 10:
+            head.append(row)
+        if index < start_row - 1:
+            continue
+        pending.append(row)
         if _has_meaningful_content(row):
-            last_meaningful_row = i
-    return rows[:last_meaningful_row + 4] if last_meaningful_row >= 0 else rows[:10]
+            kept.extend(pending)
+            pending = []
+
+    rows = kept + pending[:3] if kept else pending[:10]
+    if not any(not _is_empty_row(row) for row in rows):
+        # Nothing from start_row onward: take the boundaries from row 1 instead
+        last_meaningful_row = -1
+        for i, row in enumerate(head):
+            if _has_meaningful_content(row):
+                last_meaningful_row = i
+        rows = head[:last_meaningful_row + 4] if last_meaningful_row >= 0 else head[:10]
+        if not any(not _is_empty_row(row) for row in rows):
+            rows = []
+    return content_count >= 2, rows
+
+
+def _clean_row(row, max_cols):
+    padded_row = list(row)
+    if len(padded_row) < max_cols:
+        padded_row.extend([None] * (max_cols - len(padded_row)))
+
+    cleaned = []
+    for i, cell in enumerate(padded_row):
+        if cell is None:
+            cleaned.append('')
+        elif isinstance(cell, str) and cell.strip() == '':
+            cleaned.append('')
+        elif cell == 0 and i >= 4:
+            if i == 4:
+                cleaned.append('')
+            else:
+                cleaned.append(str(cell).strip())
+        else:
+            cleaned.append(str(cell).strip())
+    return cleaned
 
 
-def extract_csv(file_path: str, output_dir: Path, sheets_to_process=None, skip_first_sheet=True):
-    all_sheet_names = get_sheet_names(file_path)
-    if not all_sheet_names:
-        logger.error("No sheets found in Excel file")
-        return [], {}
+def _resolve_sheet_name(workbook, sheet_name):
+    if sheet_name in workbook.sheetnames:
+        return sheet_name
+    for wb_sheet in workbook.sheetnames:
+        if wb_sheet.strip() == sheet_name.strip():
+            return wb_sheet
+    return None
 
-    target_sheets = sheets_to_process if sheets_to_process else (
-        all_sheet_names[1:] if skip_first_sheet else all_sheet_names
-    )
 
-    logger.info(f"Processing {len(target_sheets)} sheet(s): {target_sheets}")
+# Returned by _extract_sheet when a sheet could not be read, as opposed to None for a sheet
+# without content; a plain string so it compares equal after crossing a process pool
+EXTRACTION_FAILED = "extraction-failed"
 
-    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
-    csv_paths = []
-    name_mapping = {}
 
-    exact_sheet_names = {sheet.strip(): sheet for sheet in workbook.sheetnames}
+def _extract_sheet(workbook, sheet_name, output_dir: Path, require_content=False):
+    """Extract one sheet to `output_dir`.
 
-    for sheet_name in target_sheets:
-        try:
-            logger.info(f"Processing sheet: '{sheet_name}'")
+    Returns (csv_path, clean_name, actual_sheet_name), None when the sheet has
+    no content, or EXTRACTION_FAILED when it could not be read.
+    """
+    try:
+        logger.info(f"Processing sheet: '{sheet_name}'")
 
-            actual_sheet_name = None
-            if sheet_name in workbook.sheetnames:
-                actual_sheet_name = sheet_name
-            elif sheet_name.strip() in exact_sheet_names:
-                actual_sheet_name = exact_sheet_names[sheet_name.strip()]
-            else:
-                for wb_sheet in workbook.sheetnames:
-                    if wb_sheet.strip() == sheet_name.strip():
-                        actual_sheet_name = wb_sheet
-                        break
-
-            if not actual_sheet_name:
-                logger.error(f"Sheet '{sheet_name}' not found in workbook")
-                logger.error(f"Available sheets: {workbook.sheetnames}")
-                continue
+        actual_sheet_name = _resolve_sheet_name(workbook, sheet_name)
+        if not actual_sheet_name:
+            logger.error(f"Sheet '{sheet_name}' not found in workbook")
+            logger.error(f"Available sheets: {workbook.sheetnames}")
+            return EXTRACTION_FAILED
 
-            logger.info(f"Using actual sheet name: '{actual_sheet_name}'")
-            sheet = workbook[actual_sheet_name]
+        logger.info(f"Using actual sheet name: '{actual_sheet_name}'")
+        sheet = workbook[actual_sheet_name]
 
-            rows = _find_data_boundaries(sheet, start_row=6)
-            non_empty_rows = [row for row in rows if not _is_empty_row(row)]
+        has_content, rows = _scan_sheet(sheet, start_row=6)
+        if require_content and not has_content:
+            logger.warning(f"Sheet '{sheet_name}' has no meaningful content - skipping")
+            return None
+        if not rows:
+            logger.warning(f"No meaningful content found in sheet: {sheet_name}")
+            return None
+
+        max_cols = max(len(row) for row in rows)
+        clean_name = normalize_sheet_name(sheet_name)
+        csv_path = output_dir / f"{clean_name}.csv"
+
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            for row in rows:
+                writer.writerow(_clean_row(row, max_cols))
+
+        logger.info(f"Created CSV: {csv_path}")
+        return csv_path, clean_name, actual_sheet_name
+
+    except Exception as e:
+        logger.error(f"Failed to process sheet {sheet_name}: {e}")
+        return EXTRACTION_FAILED
+
+
+# Per-process workbook opened once by the pool initializer and reused for every sheet task
+_worker_workbook = None
 
-            if not non_empty_rows:
-                logger.warning(f"No meaningful content found in sheet: {sheet_name}")
-                rows_from_start = _find_data_boundaries(sheet, start_row=1)
-                non_empty_rows_from_start = [row for row in rows_from_start if not _is_empty_row(row)]
-                if not non_empty_rows_from_start:
-                    logger.warning(f"Retrying from row 1: found {len(non_empty_rows_from_start)} non-empty rows")
-                    continue
-                else:
-                    rows = rows_from_start
-
-            max_cols = max(len(row) for row in rows)
-            clean_name = normalize_sheet_name(sheet_name)
-            csv_path = output_dir / f"{clean_name}.csv"
-
-            with open(csv_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                for row in rows:
-                    padded_row = list(row)
-                    if len(padded_row) < max_cols:
-                        padded_row.extend([None] * (max_cols - len(padded_row)))
-
-                    cleaned = []
-                    for i, cell in enumerate(padded_row):
-                        if cell is None:
-                            cleaned.append('')
-                        elif isinstance(cell, str) and cell.strip() == '':
-                            cleaned.append('')
-                        elif cell == 0 and i >= 4:
-                            if i == 4:
-                                cleaned.append('')
-                            else:
-                                cleaned.append(str(cell).strip())
-                        else:
-                            cleaned.append(str(cell).strip())
-
-                    writer.writerow(cleaned)
-
-            csv_paths.append(csv_path)
-            name_mapping[clean_name] = actual_sheet_name
-            logger.info(f"Created CSV: {csv_path}")
 
+def _init_extract_worker(path):
+    global _worker_workbook
+    _worker_workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+
+def _extract_sheet_in_worker(args):
+    sheet_name, output_dir, require_content = args
+    return _extract_sheet(_worker_workbook, sheet_name, output_dir, require_content)
+
+
+@contextmanager
+def _worker_source(source):
+    """A path the pool initializer can open.
+
+    Paths are used as they are, and so are file objects backed by a named file
+    on disk. Other file handles (e.g. a spooled upload still in memory) are
+    copied in UPLOAD_CHUNK_BYTES chunks to a named temp file, removed
+    afterwards, so the workbook is never held in memory as one bytes object.
+    """
+    if isinstance(source, (str, Path)):
+        yield str(source)
+        return
+    name = getattr(source, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        if hasattr(source, "flush"):
+            source.flush()
+        yield name
+        return
+    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as target:
+        shutil.copyfileobj(_rewind(source), target, UPLOAD_CHUNK_BYTES)
+    try:
+        yield target.name
+    finally:
+        os.unlink(target.name)
+
+
+def _extract_parallel(source, target_sheets, output_dir: Path, require_content, workers):
+    tasks = [(sheet_name, output_dir, require_content) for sheet_name in target_sheets]
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with _worker_source(source) as path, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_extract_worker,
+        initargs=(path,),
+    ) as executor:
+        return list(executor.map(_extract_sheet_in_worker, tasks, chunksize=chunksize))
+
+
+def extract_csv(source, output_dir: Path, sheets_to_process=None, skip_first_sheet=True, require_content=False, workers=None):
+    """Write one CSV per target sheet.
+
+    `source` may be a path or a binary file object (e.g. the uploaded bytes in
+    a BytesIO); the workbook is opened once and each sheet is read in a single
+    pass. With `require_content`, sheets with fewer than two non-empty rows in
+    their first 20 rows are skipped.
+
+    `workers` (default `EXTRACT_WORKERS`) > 1 spreads the sheets over a process
+    pool in which every worker opens the workbook once; results are collected in
+    sheet order, so the output matches the serial path.
+
+    Returns (csv paths, {clean name: sheet name}, failed sheet names). A failed
+    sheet (the workbook or the sheet could not be read) is not the same as an
+    empty one: its previous CSV, if any, should be kept.
+    """
+    # Names come from the zip index; the workbook itself is only opened where sheets are read
+    all_sheet_names = get_sheet_names(source)
+    if not all_sheet_names:
+        logger.error("No sheets found in Excel file")
+        return [], {}, list(sheets_to_process or [])
+
+    target_sheets = sheets_to_process if sheets_to_process else (
+        all_sheet_names[1:] if skip_first_sheet else all_sheet_names
+    )
+
+    workers = min(max(1, int(workers if workers is not None else EXTRACT_WORKERS)), len(target_sheets) or 1)
+    logger.info(f"Processing {len(target_sheets)} sheet(s) with {workers} worker(s): {target_sheets}")
+
+    results = None
+    if workers > 1:
+        try:
+            results = _extract_parallel(source, target_sheets, output_dir, require_content, workers)
+        except Exception as e:
+            logger.warning(f"Parallel extraction failed ({e}); falling back to serial extraction")
+    if results is None:
+        try:
+            workbook = openpyxl.load_workbook(_rewind(source), read_only=True, data_only=True)
         except Exception as e:
-            logger.error(f"Failed to process sheet {sheet_name}: {e}")
+            logger.error(f"Failed to load workbook: {e}")
+            return [], {}, list(target_sheets)
+        try:
+            results = [_extract_sheet(workbook, sheet_name, output_dir, require_content) for sheet_name in target_sheets]
+        finally:
+            workbook.close()
+
+    csv_paths = []
+    name_mapping = {}
+    failed_sheets = []
+    for sheet_name, result in zip(target_sheets, results):
+        if result == EXTRACTION_FAILED:
+            failed_sheets.append(sheet_name)
+            continue
+        if result is None:
             continue
+        csv_path, clean_name, actual_sheet_name = result
+        csv_paths.append(csv_path)
+        name_mapping[clean_name] = actual_sheet_name
 
-    workbook.close()
     logger.info(f"Successfully saved {len(csv_paths)} CSV files")
 
     if not csv_paths:
         logger.warning("No CSV files were generated. Check for empty sheets or processing errors.")
+    if failed_sheets:
+        logger.warning(f"Failed to extract {len(failed_sheets)} sheet(s): {failed_sheets}")
 
-    return csv_paths, name_mapping
-
-
+    return csv_paths, name_mapping, failed_sheets
@@ -0,0 +1,332 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import RESULTS_DIR, DASHBOARD_CACHE_ENTRIES, DASHBOARD_BACKEND, DASHBOARD_YEAR, DASHBOARD_VERSION_POLL_SECONDS, KPI_SHARED_MEMORY, KPI_SHARED_MEMORY_NAME
+from services.dashboard_logic import DashboardAnalytics
+from services.dashboard_sql import SqlDashboardAnalytics, data_version
+from services.kpi_shared import SharedCubeStore
+
+logger = logging.getLogger(__name__)
+
+# Versions remembered for `changes_since`
+CHANGE_LOG_SIZE = 32
+
+
+class _UpdateLock:
+    """Lets any number of `reading()` holders run together while `updating()` waits for them
+    and then runs alone. A waiting update holds back new readers so it is not starved."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._updates = 0
+        self._updating = False
+
+    @contextmanager
+    def reading(self):
+        with self._condition:
+            while self._updating or self._updates:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def updating(self):
+        with self._condition:
+            self._updates += 1
+            while self._updating or self._readers:
+                self._condition.wait()
+            self._updates -= 1
+            self._updating = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._updating = False
+                self._condition.notify_all()
+
+
+class DashboardCache:
+    """Pre-serialized dashboard responses keyed by the KPI data fingerprint.
+
+    The fingerprint combines an explicit version (bumped by `invalidate()` when
+    an upload rebuilds the KPIs) with the KPI file's mtime and size, so edits
+    made outside the upload flow are picked up too. Entries for older
+    fingerprints are dropped as soon as a new one is seen.
+
+    With the "postgres" backend the data lives in supplier_kpi_monthly and the
+    fingerprint comes from supplier_kpi_version, which every ingest bumps in
+    its last transaction, so all workers move on together once the rows are
+    written (not when the KPI file changes). The version is re-read at most
+    every DASHBOARD_VERSION_POLL_SECONDS, and at once after `invalidate()`.
+    If it cannot be read the process-local version is used instead.
+
+    With `shared_memory` (json backend) the KPI cube is kept once in a
+    SharedCubeStore: a worker that loads or patches the data publishes it, the
+    others map the published cube instead of parsing the file, and the shared
+    version is part of the fingerprint so every worker switches together.
+
+    The lock only guards the bookkeeping: responses are built and analytics
+    loaded outside it, once per key (and fingerprint) however many requests
+    miss at the same time, so a slow miss never holds up hits on other keys.
+    Builds read the loaded analytics concurrently, and `apply_updates` waits
+    for them before patching it in place.
+    """
+
+    def __init__(self, kpi_file: Path = RESULTS_DIR / "final_supplier_kpis.json", max_entries: int = DASHBOARD_CACHE_ENTRIES, backend: str = DASHBOARD_BACKEND,
+                 shared_memory: bool = KPI_SHARED_MEMORY):
+        if backend not in ("json", "postgres"):
+            raise ValueError(f"Unknown dashboard backend '{backend}' (expected 'json' or 'postgres')")
+        self.kpi_file = Path(kpi_file)
+        self.max_entries = max_entries
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._version = 0
+        self._fingerprint: Optional[str] = None
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._analytics: Optional[DashboardAnalytics] = None
+        # (monotonic time read, supplier_kpi_version sum) for the postgres backend
+        self._data_version: Optional[Tuple[float, Optional[int]]] = None
+        # Builds and loads in progress, joined by concurrent misses
+        self._building: Dict[Tuple[Optional[str], str], Future] = {}
+        self._loading: Dict[str, Future] = {}
+        self._updates = _UpdateLock()
+        # (fingerprint, suppliers changed to reach it, or None for "everything")
+        self._changes: "deque[Tuple[Optional[str], Optional[List[str]]]]" = deque(maxlen=CHANGE_LOG_SIZE)
+        self._shared = SharedCubeStore(KPI_SHARED_MEMORY_NAME, self.kpi_file.parent / ".kpi_shared.lock") if shared_memory and backend == "json" else None
+
+    def has_data(self) -> bool:
+        return self.backend == "postgres" or self.kpi_file.exists()
+
+    def fingerprint(self) -> Optional[str]:
+        if self.backend == "postgres":
+            version = self._polled_data_version()
+            raw = f"{self._version}" if version is None else f"ingest{version}"
+        else:
+            try:
+                stat = self.kpi_file.stat()
+                raw = f"{self._version}:{stat.st_mtime_ns}:{stat.st_size}"
+                if self._shared is not None:
+                    raw += f":{self._shared.version()}"
+            except FileNotFoundError:
+                return None
+        raw = f"{self.backend}:{raw}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _polled_data_version(self) -> Optional[int]:
+        polled = self._data_version
+        now = time.monotonic()
+        if polled is None or now - polled[0] >= DASHBOARD_VERSION_POLL_SECONDS:
+            polled = self._data_version = (now, data_version())
+        return polled[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._data_version = None
+            self._fingerprint = None
+            self._entries.clear()
+            self._analytics = None
+            self._changes.append((self.fingerprint(), None))
+        logger.info("Dashboard cache invalidated")
+
+    def changes_since(self, fingerprint: Optional[str]) -> Tuple[Optional[str], Optional[List[str]]]:
+        """(current fingerprint, suppliers changed since `fingerprint`).
+
+        The supplier list is None when the change is not known to be limited to
+        some suppliers (full reloads, edits outside the upload flow, or versions
+        older than the change log), and empty when nothing changed.
+        """
+        with self._lock:
+            current = self.fingerprint()
+            if current == fingerprint:
+                return current, []
+            log = list(self._changes)
+            starts = [i for i, (logged, _) in enumerate(log) if logged == fingerprint]
+            if not starts:
+                return current, None
+            after = log[starts[-1] + 1:]
+            if not after or after[-1][0] != current:
+                return current, None
+            suppliers = set()
+            for _, changed in after:
+                if changed is None:
+                    return current, None
+                suppliers.update(changed)
+            return current, sorted(suppliers)
+
+    def apply_updates(self, kpi_data: Dict[str, Any], suppliers: List[Optional[str]]):
+        """Refresh after a KPI rebuild that changed only `suppliers`.
+
+        Cached responses are dropped, but a loaded DashboardAnalytics is patched
+        in place (see DashboardAnalytics.apply_updates) instead of being reloaded
+        from disk; anything it cannot patch falls back to `invalidate()`.
+        """
+        if not suppliers:
+            return
+        with self._updates.updating(), self._lock:
+            analytics = self._analytics
+            patched = False
+            if analytics is not None and self.backend == "json" and None not in suppliers:
+                try:
+                    patched = analytics.apply_updates(kpi_data, suppliers)
+                except Exception as e:
+                    logger.warning(f"Incremental dashboard update failed, reloading: {e}")
+            if not patched:
+                self.invalidate()
+                return
+            previous = self._fingerprint
+            if self._shared is not None:
+                self._publish(analytics)
+            if not self._changes or self._changes[-1][0] != previous:
+                self._changes.append((previous, None))
+            self._version += 1
+            self._entries.clear()
+            self._fingerprint = self.fingerprint()
+            self._changes.append((self._fingerprint, sorted(set(suppliers))))
+        logger.info(f"Dashboard state updated in place for {len(set(suppliers))} supplier(s)")
+
+    def _sync(self) -> Optional[str]:
+        fingerprint = self.fingerprint()
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._entries.clear()
+            self._analytics = None
+        return fingerprint
+
+    def analytics(self) -> Optional[DashboardAnalytics]:
+        """Loaded DashboardAnalytics for the current KPI data, or None if it cannot be loaded."""
+        with self._lock:
+            fingerprint = self._sync()
+            if fingerprint is None:
+                return None
+            if self._analytics is not None:
+                return self._analytics
+            loading = self._loading.get(fingerprint)
+            if loading is None:
+                loading = self._loading[fingerprint] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return loading.result()
+        try:
+            analytics, loaded_for = self._load(fingerprint)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(fingerprint, None)
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            self._loading.pop(fingerprint, None)
+            # Only keep it if the data did not change while loading
+            if analytics is not None and self._sync() == loaded_for:
+                self._analytics = analytics
+        loading.set_result(analytics)
+        return analytics
+
+    def _load(self, fingerprint: str) -> Tuple[Optional[DashboardAnalytics], Optional[str]]:
+        """(analytics or None, fingerprint it belongs to); runs outside the lock."""
+        if self.backend == "postgres":
+            analytics = SqlDashboardAnalytics(DASHBOARD_YEAR)
+        else:
+            analytics = DashboardAnalytics(str(self.kpi_file))
+        if self._shared is not None:
+            return self._load_shared(analytics, fingerprint)
+        return (analytics if analytics.load_data() else None), fingerprint
+
+    def _source(self) -> Optional[Dict[str, int]]:
+        try:
+            stat = self.kpi_file.stat()
+        except FileNotFoundError:
+            return None
+        return {"mtimeNs": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _load_shared(self, analytics: DashboardAnalytics, fingerprint: str) -> Tuple[Optional[DashboardAnalytics], Optional[str]]:
+        """Map the shared cube if it was built from the current KPI file; otherwise load and publish it."""
+        shared = self._shared.attach()
+        if shared is not None and shared.source == self._source():
+            analytics.load_shared(shared)
+            return analytics, fingerprint
+        if not analytics.load_data():
+            return None, fingerprint
+        self._publish(analytics)
+        # Publishing moved the shared version on; nothing is cached for it yet
+        return analytics, self.fingerprint()
+
+    def _publish(self, analytics: DashboardAnalytics):
+        """Publish `analytics`' cube and switch it to the shared mapping, dropping its private copy.
+
+        The reductions are recomputed from the mapping, exactly as other workers
+        do, so every worker serves identical payloads for a version.
+        """
+        try:
+            shared = self._shared.publish(analytics.kpi_names, analytics.suppliers, analytics.months, analytics.cube,
+                                          {key: analytics.data[key] for key in ("generatedOn", "kpiMetadata") if key in analytics.data},
+                                          self._source())
+        except Exception as e:
+            logger.warning(f"Failed to publish the KPI cube to shared memory: {e}")
+            return
+        if shared is not None:
+            analytics.load_shared(shared)
+
+    def get(self, key: str, build: Callable[[], bytes]) -> Tuple[Optional[str], bytes]:
+        """Return (fingerprint, body) for `key`, calling `build` only on a miss.
+
+        Concurrent misses on the same key and fingerprint wait for one build.
+        """
+        with self._lock:
+            fingerprint = self._sync()
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return fingerprint, body
+            building = self._building.get((fingerprint, key))
+            if building is None:
+                building = self._building[(fingerprint, key)] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return fingerprint, building.result()
+        try:
+            with self._updates.reading():
+                body = build()
+        except BaseException as e:
+            with self._lock:
+                self._building.pop((fingerprint, key), None)
+            building.set_exception(e)
+            raise
+        with self._lock:
+            self._building.pop((fingerprint, key), None)
+            # Only keep it if the data did not change while building
+            if self._sync() == fingerprint:
+                self._entries[key] = body
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        building.set_result(body)
+        return fingerprint, body
+
+
+dashboard_cache = DashboardCache()
+
+
+def invalidate_dashboard_cache():
+    dashboard_cache.invalidate()
+
+
+def update_dashboard_cache(kpi_data: Dict[str, Any], suppliers: List[Optional[str]]):
+    dashboard_cache.apply_updates(kpi_data, suppliers)
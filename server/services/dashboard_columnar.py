@@ -0,0 +1,176 @@
+import base64
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+FORMATS = ("json", "columnar")
+TRENDS = ["stable", "increasing", "decreasing"]
+RISK_LEVELS = ["low", "medium", "high"]
+# In the order DashboardAnalytics._reliability awards them
+RELIABILITY_FACTORS = [
+    "zero_accidents",
+    "low_accidents",
+    "excellent_delivery",
+    "good_delivery",
+    "acceptable_delivery",
+    "zero_production_loss",
+    "minimal_production_loss",
+    "low_downtime",
+    "moderate_downtime",
+]
+
+
+class ColumnarEncoder:
+    """Re-encodes dashboard sections as flat columns over shared dictionaries.
+
+    Suppliers, KPIs, months and other repeated labels are sent once under
+    `dictionaries` and referenced by index. Numeric columns are plain lists
+    (null for missing) or, with `binary=True`, little-endian typed arrays:
+    `{"dtype": "float64" | "int32", "shape": [...], "data": <base64>}` with
+    NaN for missing, ready for `new Float64Array(...)` on the client.
+    """
+
+    def __init__(self, suppliers: List[str], kpi_names: List[str], months: List[str], binary: bool = False):
+        self.suppliers = list(suppliers)
+        self.kpi_names = list(kpi_names)
+        self.months = list(months)
+        self.binary = binary
+        self._supplier_index = {supplier: s for s, supplier in enumerate(self.suppliers)}
+        self.factors = list(RELIABILITY_FACTORS)
+
+    def dictionaries(self) -> Dict[str, List[str]]:
+        return {
+            "suppliers": self.suppliers,
+            "kpis": self.kpi_names,
+            "months": self.months,
+            "trends": TRENDS,
+            "riskLevels": RISK_LEVELS,
+            "reliabilityFactors": self.factors,
+        }
+
+    def floats(self, values, shape: Optional[List[int]] = None):
+        if not self.binary:
+            return [None if value is None or value != value else value for value in values]
+        array = np.array([np.nan if value is None else value for value in values], dtype="<f8")
+        return self._typed(array, "float64", shape)
+
+    def ints(self, values, shape: Optional[List[int]] = None):
+        if not self.binary:
+            return [int(value) for value in values]
+        return self._typed(np.array(list(values), dtype="<i4"), "int32", shape)
+
+    @staticmethod
+    def _typed(array: np.ndarray, dtype: str, shape: Optional[List[int]]):
+        return {
+            "dtype": dtype,
+            "shape": shape or [int(array.size)],
+            "data": base64.b64encode(array.tobytes()).decode("ascii"),
+        }
+
+    def _supplier_ids(self, names) -> List[int]:
+        return [self._supplier_index[name] for name in names]
+
+    def summary(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        return summary
+
+    def rankings(self, rankings: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Per KPI: parallel columns in rank order; `monthlyData` is (entries x months) row-major."""
+        trend_index = {trend: i for i, trend in enumerate(TRENDS)}
+        encoded = {}
+        for kpi_name, entries in rankings.items():
+            monthly = [entry["monthlyData"].get(month) for entry in entries for month in self.months]
+            encoded[kpi_name] = {
+                "supplier": self.ints(self._supplier_ids(entry["supplier"] for entry in entries)),
+                "score": self.floats([entry["score"] for entry in entries]),
+                "average": self.floats([entry["average"] for entry in entries]),
+                "trend": self.ints([trend_index[entry["trend"]] for entry in entries]),
+                "dataPoints": self.ints([entry["dataPoints"] for entry in entries]),
+                "monthlyData": self.floats(monthly, [len(entries), len(self.months)]),
+            }
+        return encoded
+
+    def time_series(self, time_series: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """(KPIs x months) matrices in `dictionaries.kpis` order."""
+        kpis = [kpi_name for kpi_name in self.kpi_names if kpi_name in time_series]
+        shape = [len(kpis), len(self.months)]
+        return {
+            "kpi": self.ints(self.kpi_names.index(kpi_name) for kpi_name in kpis),
+            "monthlyData": self.floats([time_series[kpi_name]["monthlyData"].get(month) for kpi_name in kpis for month in self.months], shape),
+            "supplierCounts": self.ints([time_series[kpi_name]["supplierCounts"].get(month, 0) for kpi_name in kpis for month in self.months], shape),
+            "unit": [time_series[kpi_name]["unit"] for kpi_name in kpis],
+            "chartType": [time_series[kpi_name]["chartType"] for kpi_name in kpis],
+        }
+
+    def performance_matrix(self, matrix: Dict[str, Any]) -> Dict[str, Any]:
+        """(suppliers x KPIs) scores, row-major, rows in `dictionaries.suppliers` order."""
+        rows = matrix["matrixData"]
+        kpi_names = matrix["kpiNames"]
+        return {
+            "supplier": self.ints(self._supplier_ids(row["supplier"] for row in rows)),
+            "kpi": self.ints(self.kpi_names.index(kpi_name) for kpi_name in kpi_names),
+            "values": self.floats([row.get(kpi_name) for row in rows for kpi_name in kpi_names], [len(rows), len(kpi_names)]),
+            "performanceTypes": matrix["performanceTypes"],
+        }
+
+    def operational_insights(self, insights: Dict[str, Any]) -> Dict[str, Any]:
+        capacity = insights["capacityUtilization"]
+        reliability = insights["reliabilityMetrics"]
+        monthly = insights["monthlyPerformance"]
+
+        factor_masks = []
+        for metrics in reliability.values():
+            mask = 0
+            for factor in metrics["reliabilityFactors"]:
+                if factor not in self.factors:
+                    self.factors.append(factor)
+                mask |= 1 << self.factors.index(factor)
+            factor_masks.append(mask)
+
+        monthly_columns = {}
+        months = [month for month in self.months if month in monthly]
+        for column in next(iter(monthly.values()), {}):
+            values = [monthly[month][column] for month in months]
+            monthly_columns[column] = self.ints(values) if column in ("totalSuppliers", "activeSuppliers") else self.floats(values)
+
+        return {
+            "capacityUtilization": {
+                "supplier": self.ints(self._supplier_ids(capacity)),
+                "totalTrips": self.floats([row["totalTrips"] for row in capacity.values()]),
+                "totalQuantity": self.floats([row["totalQuantity"] for row in capacity.values()]),
+                "avgPartsPerTrip": self.floats([row["avgPartsPerTrip"] for row in capacity.values()]),
+            },
+            "reliabilityMetrics": {
+                "supplier": self.ints(self._supplier_ids(reliability)),
+                "overallScore": self.ints([row["overallScore"] for row in reliability.values()]),
+                "riskLevel": self.ints([RISK_LEVELS.index(row["riskLevel"]) for row in reliability.values()]),
+                # Bit i set when dictionaries.reliabilityFactors[i] applies, listed in that order
+                "reliabilityFactors": self.ints(factor_masks),
+            },
+            "efficiencyTrends": insights["efficiencyTrends"],
+            "riskAssessment": insights["riskAssessment"],
+            "monthlyPerformance": {"month": self.ints(self.months.index(month) for month in months), **monthly_columns},
+        }
+
+    def _encoders(self):
+        return {
+            "summary": self.summary,
+            "rankings": self.rankings,
+            "timeSeries": self.time_series,
+            "performanceMatrix": self.performance_matrix,
+            "operationalInsights": self.operational_insights,
+        }
+
+    def section(self, section: str, data: Any) -> Any:
+        return self._encoders()[section](data)
+
+    def dashboard(self, dashboard: Dict[str, Any]) -> Dict[str, Any]:
+        """Encode a `generate_complete()` payload; non-section keys pass through."""
+        encoders = self._encoders()
+        encoded = {"format": "columnar", "binary": self.binary}
+        for key, value in dashboard.items():
+            if key in ("suppliers", "kpiNames"):
+                continue
+            encoded[key] = encoders[key](value) if key in encoders else value
+        # Last, so factors met while encoding are included
+        encoded["dictionaries"] = self.dictionaries()
+        return encoded
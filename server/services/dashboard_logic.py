@@ -1,81 +1,407 @@
-from typing import Dict, Any
-import json
+from typing import Dict, Any, List, Optional
 import logging
 from pathlib import Path
 from datetime import datetime
-import statistics
+import heapq
+import operator
+import numpy as np
+
+from services.kpi_repository import load_kpi_columns, load_kpis
 
 logger = logging.getLogger(__name__)
 
 
+SECTIONS = {
+    "summary": "_summary",
+    "rankings": "_rankings",
+    "timeSeries": "_time_series",
+    "performanceMatrix": "_matrix",
+    "operationalInsights": "_operational_insights",
+}
+LOWER_BETTER_KPIS = ["accidents", "productionLossHrs", "machineDowntimeHrs", "machineBreakdowns"]
+MEAN_AGGREGATE_KPIS = ["okDeliveryPercent", "vehicleTAT", "partsPerTrip"]
+RANKING_DIRECTIONS = ("best", "worst")
+
+
+def _json_rows(block):
+    """Rows of a cube slice as the JSON payload carried them: None where
+    there is no value, and whole numbers as ints, as the KPI files write
+    them (the cube stores everything as float64)."""
+    values = block.astype(object)
+    whole = np.isfinite(block) & (block == np.trunc(block))
+    values[whole] = block[whole].astype(np.int64).tolist()
+    values[np.isnan(block)] = None
+    return values.tolist()
+
+
+def _two_sum(a, b):
+    """(a + b, exact rounding error of that sum), elementwise."""
+    s = a + b
+    bb = s - a
+    return s, (a - (s - bb)) + (b - bb)
+
+
+def _exact_mean(filled, counts, axis=-1):
+    """Mean of `filled` along `axis` over `counts` values (the rest are 0),
+    rounded once from the exact sum as `statistics.mean` does, so means that
+    land on a rounding boundary come out as before. NaN where counts is 0.
+
+    The sum is kept as an unevaluated hi + lo pair through a pairwise tree of
+    exact additions; the quotient is then corrected by the remainder
+    hi + lo - q * n, with q * n split into exact halves (n < 2**26).
+    """
+    hi = np.moveaxis(np.asarray(filled, dtype=float), axis, 0)
+    lo = np.zeros_like(hi)
+    while len(hi) > 1:
+        if len(hi) % 2:
+            hi = np.concatenate([hi, np.zeros_like(hi[:1])])
+            lo = np.concatenate([lo, np.zeros_like(lo[:1])])
+        hi, err = _two_sum(hi[0::2], hi[1::2])
+        lo = lo[0::2] + lo[1::2] + err
+    hi, lo = (hi[0], lo[0]) if len(hi) else (np.zeros(hi.shape[1:]), np.zeros(hi.shape[1:]))
+    n = np.asarray(counts, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q = hi / n
+        split = q * 134217729.0
+        q_hi = split - (split - q)
+        product = q * n
+        product_err = (q_hi * n - product) + (q - q_hi) * n
+        mean = q + (((hi - product) - product_err) + lo) / n
+    return np.where(n > 0, mean, np.nan)
+
+
 class DashboardAnalytics:
+    """Dashboard sections computed from a dense KPI cube.
+
+    `cube[k, s, m]` holds KPI `kpi_names[k]` for supplier `suppliers[s]` in
+    month `months[m]` as float64, NaN where there is no numeric value; every
+    section is a vectorized reduction over it.
+
+    The reductions the sections share (per supplier: counts, sums, means;
+    per month: counts, sums, active suppliers) are kept as state, so
+    `apply_updates` can swap one supplier's block in O(KPIs x months).
+    """
+
     def __init__(self, kpi_file_path: str = "results/final_supplier_kpis.json"):
         self.kpi_file_path = Path(kpi_file_path)
         self.data = None
         self.suppliers = []
         self.kpi_names = []
         self.months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+        self.cube = np.empty((0, 0, len(self.months)))
+        self._kpi_index = {}
+        self._supplier_index = {}
 
     def load_data(self) -> bool:
         try:
-            if not self.kpi_file_path.exists():
+            columns = load_kpi_columns(self.kpi_file_path)
+            if columns is not None:
+                self._load_columns(columns)
+                return True
+            snapshot = load_kpis(self.kpi_file_path)
+            if snapshot is None:
                 logger.error(f"KPI file not found: {self.kpi_file_path}")
                 return False
-            with open(self.kpi_file_path, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
+            self.data = snapshot.data
             self._extract_metadata()
+            self._build_cube()
             return True
         except Exception as e:
             logger.error(f"Failed to load KPI data: {e}")
             return False
 
+    def _load_columns(self, columns):
+        """Fill the cube from a memory-mapped Arrow snapshot instead of parsing the JSON.
+
+        Only the metadata keys are kept in `data`; the sections read the cube.
+        """
+        self.data = {"kpiMetadata": columns.kpi_metadata}
+        if columns.has_generated_on:
+            self.data["generatedOn"] = columns.generated_on
+        self.kpi_names = list(columns.kpi_names)
+        supplier_names = {kpi_name: columns.suppliers(kpi_name) for kpi_name in self.kpi_names}
+        self.suppliers = sorted({supplier for names in supplier_names.values() for supplier in names if supplier != 'Sheet1'})
+        self._kpi_index = {kpi_name: k for k, kpi_name in enumerate(self.kpi_names)}
+        self._supplier_index = {supplier: s for s, supplier in enumerate(self.suppliers)}
+
+        cube = np.full((len(self.kpi_names), len(self.suppliers), len(self.months)), np.nan)
+        for k, kpi_name in enumerate(self.kpi_names):
+            _, values = columns.kpi(kpi_name, self.months)
+            rows = [(i, self._supplier_index[supplier]) for i, supplier in enumerate(supplier_names[kpi_name]) if supplier in self._supplier_index]
+            if rows:
+                cube[k, [s for _, s in rows]] = values[[i for i, _ in rows]]
+        self.cube = cube
+        self._prepare_stats()
+
+    def load_shared(self, shared):
+        """Use a cube mapped from shared memory (see services/kpi_shared.py) without copying it.
+
+        The mapping is read-only; `apply_updates` works on a private copy.
+        """
+        self.data = dict(shared.metadata)
+        self.kpi_names = list(shared.kpi_names)
+        self.suppliers = list(shared.suppliers)
+        self.months = list(shared.months)
+        self._kpi_index = {kpi_name: k for k, kpi_name in enumerate(self.kpi_names)}
+        self._supplier_index = {supplier: s for s, supplier in enumerate(self.suppliers)}
+        self.cube = shared.cube
+        self._prepare_stats()
+
     def _extract_metadata(self):
         self.suppliers = []
         self.kpi_names = []
+        seen = set()
         for key, value in self.data.items():
             if key in ['generatedOn', 'kpiMetadata']:
                 continue
             if isinstance(value, dict):
                 self.kpi_names.append(key)
                 for supplier in value.keys():
-                    if supplier not in self.suppliers and supplier != 'Sheet1':
+                    if supplier not in seen and supplier != 'Sheet1':
+                        seen.add(supplier)
                         self.suppliers.append(supplier)
         self.suppliers.sort()
+        self._kpi_index = {kpi_name: k for k, kpi_name in enumerate(self.kpi_names)}
+        self._supplier_index = {supplier: s for s, supplier in enumerate(self.suppliers)}
+
+    def _supplier_rows(self, blocks):
+        """(n, months) float64 array from {month: value} dicts; None and non-numeric values become NaN."""
+        months = self.months
+        month_values = operator.itemgetter(*months)
+        rows = []
+        for monthly in blocks:
+            try:
+                rows.append(month_values(monthly))
+            except KeyError:
+                rows.append(tuple(monthly.get(month) for month in months))
+        try:
+            # None converts to NaN under a float dtype
+            return np.array(rows, dtype=np.float64).reshape(len(rows), len(months))
+        except (TypeError, ValueError):
+            return np.array(
+                [[value if isinstance(value, (int, float)) else None for value in row] for row in rows],
+                dtype=np.float64,
+            ).reshape(len(rows), len(months))
+
+    def _build_cube(self):
+        cube = np.full((len(self.kpi_names), len(self.suppliers), len(self.months)), np.nan)
+        for k, kpi_name in enumerate(self.kpi_names):
+            blocks = []
+            positions = []
+            for supplier, monthly in self.data[kpi_name].items():
+                s = self._supplier_index.get(supplier)
+                if s is None or not isinstance(monthly, dict):
+                    continue
+                blocks.append(monthly)
+                positions.append(s)
+            if blocks:
+                cube[k, positions] = self._supplier_rows(blocks)
+        self.cube = cube
+        self._prepare_stats()
+
+    def _prepare_stats(self):
+        """Per (kpi, supplier) reductions shared by the sections."""
+        valid = ~np.isnan(self.cube)
+        self.valid = valid
+        self.counts = valid.sum(axis=2)
+        # Accumulate month by month (the order of a plain Python sum) so equal totals stay exact ties
+        filled = np.where(valid, self.cube, 0.0)
+        sums = np.zeros(filled.shape[:2])
+        for m in range(filled.shape[2]):
+            sums += filled[:, :, m]
+        self.sums = sums
+        self.means = _exact_mean(filled, self.counts)
+        self.monthly_counts = valid.sum(axis=1)
+        self.monthly_sums = filled.sum(axis=1)
+        self.active_counts = valid.any(axis=0).sum(axis=0)
+
+    def apply_updates(self, kpi_data: Dict[str, Any], suppliers: List[str]) -> bool:
+        """Bring the loaded state in line with `kpi_data` (a new final_supplier_kpis.json
+        payload) that differs from the current one only in the given suppliers' blocks.
+
+        Each supplier's old contribution is subtracted from the shared reductions
+        and the new one added, in O(KPIs x months) per supplier. Returns False,
+        changing nothing, when the update adds or removes suppliers or KPIs;
+        reload in that case.
+        """
+        if self.data is None:
+            return False
+        kpi_names = [key for key, value in kpi_data.items() if key not in ('generatedOn', 'kpiMetadata') and isinstance(value, dict)]
+        if kpi_names != self.kpi_names:
+            return False
+        positions = []
+        for supplier in dict.fromkeys(suppliers):
+            s = self._supplier_index.get(supplier)
+            if s is None or not any(isinstance(kpi_data[kpi_name].get(supplier), dict) for kpi_name in kpi_names):
+                return False
+            positions.append((s, supplier))
+
+        for s, supplier in positions:
+            blocks = [kpi_data[kpi_name].get(supplier) for kpi_name in kpi_names]
+            present = [k for k, block in enumerate(blocks) if isinstance(block, dict)]
+            block = np.full((len(kpi_names), len(self.months)), np.nan)
+            block[present] = self._supplier_rows([blocks[k] for k in present])
+            self._replace_supplier_block(s, block)
+        self.data = kpi_data
+        return True
+
+    def _replace_supplier_block(self, s, block):
+        old_valid = self.valid[:, s, :].copy()
+        old_filled = np.where(old_valid, self.cube[:, s, :], 0.0)
+        new_valid = ~np.isnan(block)
+        new_filled = np.where(new_valid, block, 0.0)
+
+        if not self.cube.flags.writeable:
+            self.cube = self.cube.copy()
+        self.cube[:, s, :] = block
+        self.valid[:, s, :] = new_valid
+        counts = new_valid.sum(axis=1)
+        # Month by month, as in _prepare_stats
+        sums = np.zeros(len(block))
+        for m in range(block.shape[1]):
+            sums += new_filled[:, m]
+        self.counts[:, s] = counts
+        self.sums[:, s] = sums
+        self.means[:, s] = _exact_mean(new_filled, counts)
+
+        self.monthly_counts += new_valid.astype(int) - old_valid
+        self.monthly_sums += new_filled - old_filled
+        self.active_counts += new_valid.any(axis=0).astype(int) - old_valid.any(axis=0)
+
+    @property
+    def data_source(self) -> str:
+        return str(self.kpi_file_path)
+
+    def _k(self, kpi_name):
+        return self._kpi_index.get(kpi_name)
+
+    def _monthly_counts(self, k):
+        """Suppliers with a value for KPI k in each month."""
+        return self.monthly_counts[k]
+
+    def _monthly_sums(self, k):
+        """Total of KPI k over all suppliers in each month."""
+        return self.monthly_sums[k]
+
+    def _active_by_month(self):
+        """Suppliers with a value for any KPI in each month."""
+        return self.active_counts
+
+    def _monthly_means(self, k):
+        """Mean of KPI k over the suppliers with a value in each month."""
+        return _exact_mean(np.where(self.valid[k], self.cube[k], 0.0), self.monthly_counts[k], axis=0)
+
+    def _monthly_integral(self, k):
+        """Whether every value of KPI k in each month is a whole number."""
+        return ~(self.valid[k] & (self.cube[k] != np.trunc(self.cube[k]))).any(axis=0)
 
-    def _get_valid_months_data(self, supplier_data):
-        values = []
-        for month in self.months:
-            value = supplier_data.get(month)
-            if value is not None and isinstance(value, (int, float)):
-                values.append(float(value))
-        return values
-
-    def _trend(self, data):
-        if len(data) < 2:
-            return "stable"
-        first_half = data[:len(data)//2] if len(data) > 2 else [data[0]]
-        second_half = data[len(data)//2:] if len(data) > 2 else [data[-1]]
-        avg_first = statistics.mean(first_half)
-        avg_second = statistics.mean(second_half)
-        if avg_second > avg_first * 1.1:
-            return "increasing"
-        if avg_second < avg_first * 0.9:
-            return "decreasing"
-        return "stable"
-
-    def generate_complete(self) -> Dict[str, Any]:
-        if not self.load_data():
+    def _trends(self, k):
+        """Vectorized `_trend` for every supplier of KPI k: compare the means of the
+        first and second half of each supplier's valid months."""
+        valid = self.valid[k]
+        values = np.where(valid, self.cube[k], 0.0)
+        n = self.counts[k]
+        rank = np.cumsum(valid, axis=1) - 1
+        half = (n // 2)[:, None]
+        first = valid & (rank < half)
+        second = valid & (rank >= half)
+        avg_first = _exact_mean(values * first, first.sum(axis=1))
+        avg_second = _exact_mean(values * second, second.sum(axis=1))
+        trends = np.full(len(n), "stable", dtype=object)
+        enough = n >= 2
+        increasing = enough & (avg_second > avg_first * 1.1)
+        decreasing = enough & ~increasing & (avg_second < avg_first * 0.9)
+        trends[increasing] = "increasing"
+        trends[decreasing] = "decreasing"
+        return trends
+
+    def sliced(self, suppliers: Optional[List[str]] = None, kpis: Optional[List[str]] = None, months: Optional[List[str]] = None) -> "DashboardAnalytics":
+        """A view restricted to the given suppliers, KPIs and months (None keeps all).
+
+        Only the selected part of the cube is copied and reduced; unknown names
+        raise ValueError.
+        """
+        def select(available, requested, label):
+            if requested is None:
+                return list(range(len(available)))
+            position = {name: i for i, name in enumerate(available)}
+            unknown = [name for name in requested if name not in position]
+            if unknown:
+                raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+            # Keep the canonical order and drop duplicates
+            wanted = set(requested)
+            return [i for i, name in enumerate(available) if name in wanted]
+
+        k_idx = select(self.kpi_names, kpis, "KPIs")
+        s_idx = select(self.suppliers, suppliers, "suppliers")
+        m_idx = select(self.months, months, "months")
+
+        view = DashboardAnalytics(str(self.kpi_file_path))
+        view.data = self.data
+        view.kpi_names = [self.kpi_names[k] for k in k_idx]
+        view.suppliers = [self.suppliers[s] for s in s_idx]
+        view.months = [self.months[m] for m in m_idx]
+        view._kpi_index = {kpi_name: k for k, kpi_name in enumerate(view.kpi_names)}
+        view._supplier_index = {supplier: s for s, supplier in enumerate(view.suppliers)}
+        view.cube = self.cube[np.ix_(k_idx, s_idx, m_idx)]
+        view._prepare_stats()
+        return view
+
+    def generate_section(self, section: str, **ranking_page) -> Any:
+        """Compute a single dashboard section by its payload key (see SECTIONS).
+
+        `ranking_page` (limit/offset/direction) only applies to "rankings".
+        """
+        if section not in SECTIONS:
+            raise ValueError(f"Unknown section '{section}'. Available: {', '.join(SECTIONS)}")
+        if self.data is None and not self.load_data():
+            return {"error": "Failed to load KPI data"}
+        if section == "rankings":
+            return self._rankings(**ranking_page)
+        return getattr(self, SECTIONS[section])()
+
+    def generate_diff(self, suppliers: List[str]) -> Dict[str, Any]:
+        """The parts of the dashboard that change when only `suppliers` changed.
+
+        Aggregate sections (summary, time series, monthly performance) come in
+        full, per-supplier parts (matrix rows, capacity and reliability entries)
+        only for those suppliers. Rankings are listed as stale since any
+        position may move; refetch them when needed.
+        """
+        if self.data is None and not self.load_data():
+            return {"error": "Failed to load KPI data"}
+        known = set(self.suppliers)
+        view = self.sliced(suppliers=[supplier for supplier in suppliers if supplier in known])
+        insights = view._operational_insights()
+        return {
+            "summary": self._summary(),
+            "timeSeries": self._time_series(),
+            "performanceMatrix": {"matrixData": view._matrix()["matrixData"]},
+            "operationalInsights": {
+                "capacityUtilization": insights["capacityUtilization"],
+                "reliabilityMetrics": insights["reliabilityMetrics"],
+                "monthlyPerformance": self._monthly_performance(),
+            },
+            "stale": ["rankings"],
+        }
+
+    def ranking_totals(self) -> Dict[str, int]:
+        """Number of ranked suppliers (those with data) per KPI, for paging."""
+        return {kpi_name: int((self.counts[k] > 0).sum()) for k, kpi_name in enumerate(self.kpi_names)}
+
+    def generate_complete(self, **ranking_page) -> Dict[str, Any]:
+        if self.data is None and not self.load_data():
             return {"error": "Failed to load KPI data"}
         return {
             "metadata": {
                 "generatedAt": datetime.now().isoformat(),
-                "dataSource": str(self.kpi_file_path),
+                "dataSource": self.data_source,
                 "totalSuppliers": len(self.suppliers),
                 "totalKPIs": len(self.kpi_names),
                 "reportingPeriod": self.data.get("generatedOn", "Unknown"),
             },
             "summary": self._summary(),
-            "rankings": self._rankings(),
+            "rankings": self._rankings(**ranking_page),
             "timeSeries": self._time_series(),
             "performanceMatrix": self._matrix(),
             "operationalInsights": self._operational_insights(),
@@ -93,47 +419,34 @@ class DashboardAnalytics:
         }
         zero_accident_suppliers = 0
         total_accidents = 0
-        if "accidents" in self.data:
-            for supplier in self.suppliers:
-                supplier_data = self.data["accidents"].get(supplier, {})
-                valid_data = self._get_valid_months_data(supplier_data)
-                supplier_total = sum(valid_data)
-                total_accidents += supplier_total
-                if supplier_total == 0:
-                    zero_accident_suppliers += 1
+        k = self._k("accidents")
+        if k is not None:
+            supplier_totals = self.sums[k]
+            total_accidents = self._total(k)
+            zero_accident_suppliers = int((supplier_totals == 0).sum())
         summary["safety"] = {
             "zeroAccidentSuppliers": zero_accident_suppliers,
             "totalAccidents": total_accidents,
             "safetyRate": (zero_accident_suppliers / len(self.suppliers) * 100) if self.suppliers else 0,
         }
-        if "okDeliveryPercent" in self.data:
-            delivery_rates = []
-            for supplier in self.suppliers:
-                supplier_data = self.data["okDeliveryPercent"].get(supplier, {})
-                valid_data = self._get_valid_months_data(supplier_data)
-                if valid_data:
-                    delivery_rates.append(statistics.mean(valid_data))
+        k = self._k("okDeliveryPercent")
+        if k is not None:
+            delivery_rates = self.means[k][self.counts[k] > 0]
+            has_rates = delivery_rates.size > 0
             summary["delivery"] = {
-                "averageDeliveryRate": statistics.mean(delivery_rates) if delivery_rates else 0,
-                "bestPerformer": max(delivery_rates) if delivery_rates else 0,
-                "worstPerformer": min(delivery_rates) if delivery_rates else 0,
-                "suppliersAbove90": len([r for r in delivery_rates if r >= 90]),
+                "averageDeliveryRate": float(_exact_mean(delivery_rates, delivery_rates.size)) if has_rates else 0,
+                "bestPerformer": float(delivery_rates.max()) if has_rates else 0,
+                "worstPerformer": float(delivery_rates.min()) if has_rates else 0,
+                "suppliersAbove90": int((delivery_rates >= 90).sum()),
             }
-        total_production_loss = 0
-        total_trips = 0
-        total_quantity = 0
-        if "productionLossHrs" in self.data:
-            for supplier in self.suppliers:
-                valid_data = self._get_valid_months_data(self.data["productionLossHrs"].get(supplier, {}))
-                total_production_loss += sum(valid_data)
-        if "trips" in self.data:
-            for supplier in self.suppliers:
-                valid_data = self._get_valid_months_data(self.data["trips"].get(supplier, {}))
-                total_trips += sum(valid_data)
-        if "quantityShipped" in self.data:
-            for supplier in self.suppliers:
-                valid_data = self._get_valid_months_data(self.data["quantityShipped"].get(supplier, {}))
-                total_quantity += sum(valid_data)
+
+        def total(kpi_name):
+            k = self._k(kpi_name)
+            return self._total(k) if k is not None else 0
+
+        total_production_loss = total("productionLossHrs")
+        total_trips = total("trips")
+        total_quantity = total("quantityShipped")
         summary["production"] = {
             "totalProductionLoss": total_production_loss,
             "totalTrips": total_trips,
@@ -142,90 +455,101 @@ class DashboardAnalytics:
         }
         return summary
 
-    def _rankings(self):
+    def _total(self, k):
+        """Total of KPI k over all suppliers, added up supplier by supplier;
+        int 0 when no supplier has a value."""
+        if not self.counts[k].any():
+            return 0
+        return sum(self.sums[k].tolist())
+
+    def _ranking_scores(self, k, kpi_name):
+        """(score, average) per supplier for KPI k: mean for okDeliveryPercent, total otherwise."""
+        average = self.means[k]
+        score = average if kpi_name == "okDeliveryPercent" else self.sums[k]
+        return score, average
+
+    def _ranked_page(self, k, kpi_name, score, limit, offset, direction):
+        """Supplier indices of KPI k in rank order ("best" first, or "worst" first),
+        restricted to [offset, offset + limit); ties keep supplier order."""
+        ranked = np.flatnonzero(self.counts[k] > 0)
+        key = score if kpi_name in LOWER_BETTER_KPIS else -score  # lower key ranks better
+        if limit is None:
+            ranked = ranked[np.argsort(key[ranked], kind="stable")].tolist()
+            if direction == "worst":
+                ranked.reverse()
+            return ranked[offset:]
+        # Heap selection of the first offset + limit entries; the rest are never sorted
+        candidates = zip(key[ranked].tolist(), ranked.tolist())
+        select = heapq.nsmallest if direction == "best" else heapq.nlargest
+        return [s for _, s in select(offset + limit, candidates)][offset:]
+
+    def _rankings(self, limit: Optional[int] = None, offset: int = 0, direction: str = "best"):
+        """Per-KPI supplier rankings; `limit`/`offset` page each list and
+        `direction="worst"` ranks from the bottom."""
+        if direction not in RANKING_DIRECTIONS:
+            raise ValueError(f"Unknown ranking direction '{direction}'. Expected one of: {', '.join(RANKING_DIRECTIONS)}")
         rankings = {}
         for kpi_name in self.kpi_names:
-            if kpi_name not in self.data:
-                continue
+            k = self._k(kpi_name)
+            score, average = self._ranking_scores(k, kpi_name)
+            ranked = self._ranked_page(k, kpi_name, score, limit, offset, direction)
+            trends = self._trends(k)
+            # Only the page's rows are converted to Python objects
+            monthly = _json_rows(self.cube[k, ranked])
             supplier_scores = []
-            for supplier in self.suppliers:
-                supplier_data = self.data[kpi_name].get(supplier, {})
-                valid_data = self._get_valid_months_data(supplier_data)
-                if valid_data:
-                    if kpi_name in ["accidents", "productionLossHrs", "machineDowntimeHrs", "machineBreakdowns"]:
-                        score = sum(valid_data)
-                        avg_score = statistics.mean(valid_data)
-                    elif kpi_name in ["okDeliveryPercent"]:
-                        score = statistics.mean(valid_data)
-                        avg_score = score
-                    else:
-                        score = sum(valid_data)
-                        avg_score = statistics.mean(valid_data)
-                    supplier_scores.append({
-                        "supplier": supplier,
-                        "score": score,
-                        "average": avg_score,
-                        "trend": self._trend(valid_data),
-                        "dataPoints": len(valid_data),
-                        "monthlyData": dict(zip(self.months, [supplier_data.get(m) for m in self.months])),
-                    })
-            if kpi_name in ["accidents", "productionLossHrs", "machineDowntimeHrs", "machineBreakdowns"]:
-                supplier_scores.sort(key=lambda x: x["score"])  # lower better
-            else:
-                supplier_scores.sort(key=lambda x: x["score"], reverse=True)  # higher better
+            for s, row in zip(ranked, monthly):
+                supplier_scores.append({
+                    "supplier": self.suppliers[s],
+                    "score": float(score[s]),
+                    "average": float(average[s]),
+                    "trend": trends[s],
+                    "dataPoints": int(self.counts[k, s]),
+                    "monthlyData": dict(zip(self.months, row)),
+                })
             rankings[kpi_name] = supplier_scores
         return rankings
 
     def _time_series(self):
         time_series = {}
+        unit_descriptions = self.data.get("kpiMetadata", {}).get("unitDescriptions", {})
         for kpi_name in self.kpi_names:
-            if kpi_name not in self.data:
-                continue
+            k = self._k(kpi_name)
+            counts = self._monthly_counts(k)
+            if kpi_name in MEAN_AGGREGATE_KPIS:
+                values = self._monthly_means(k)
+            else:
+                values = self._monthly_sums(k)
             monthly_aggregates = {}
             monthly_counts = {}
-            for month in self.months:
-                monthly_values = []
-                for supplier in self.suppliers:
-                    value = self.data[kpi_name].get(supplier, {}).get(month)
-                    if value is not None and isinstance(value, (int, float)):
-                        monthly_values.append(float(value))
-                if monthly_values:
-                    if kpi_name in ["okDeliveryPercent", "vehicleTAT", "partsPerTrip"]:
-                        monthly_aggregates[month] = statistics.mean(monthly_values)
-                    else:
-                        monthly_aggregates[month] = sum(monthly_values)
-                    monthly_counts[month] = len(monthly_values)
-                else:
-                    monthly_aggregates[month] = None
-                    monthly_counts[month] = 0
+            for m, month in enumerate(self.months):
+                count = int(counts[m])
+                monthly_aggregates[month] = float(values[m]) if count else None
+                monthly_counts[month] = count
             time_series[kpi_name] = {
                 "monthlyData": monthly_aggregates,
                 "supplierCounts": monthly_counts,
-                "unit": self.data.get("kpiMetadata", {}).get("unitDescriptions", {}).get(kpi_name, ""),
+                "unit": unit_descriptions.get(kpi_name, ""),
                 "chartType": "line" if kpi_name in ["okDeliveryPercent", "vehicleTAT"] else "bar",
             }
         return time_series
 
+    def _matrix_scores(self):
+        """(suppliers x KPIs) matrix of per-supplier scores, NaN when no data."""
+        scores = self.means.copy()
+        for kpi_name in LOWER_BETTER_KPIS:
+            k = self._k(kpi_name)
+            if k is not None:
+                scores[k] = np.where(self.counts[k] > 0, self.sums[k], np.nan)
+        return scores.T
+
     def _matrix(self):
+        scores = self._matrix_scores().tolist()
         matrix_data = []
-        for supplier in self.suppliers:
+        for s, supplier in enumerate(self.suppliers):
             supplier_row = {"supplier": supplier}
-            for kpi_name in self.kpi_names:
-                if kpi_name not in self.data:
-                    supplier_row[kpi_name] = None
-                    continue
-                supplier_data = self.data[kpi_name].get(supplier, {})
-                valid_data = self._get_valid_months_data(supplier_data)
-                if valid_data:
-                    if kpi_name in ["okDeliveryPercent"]:
-                        score = statistics.mean(valid_data)
-                    elif kpi_name in ["accidents", "productionLossHrs", "machineDowntimeHrs", "machineBreakdowns"]:
-                        score = sum(valid_data)
-                    else:
-                        score = statistics.mean(valid_data)
-                    supplier_row[kpi_name] = round(score, 2)
-                else:
-                    supplier_row[kpi_name] = None
+            for k, kpi_name in enumerate(self.kpi_names):
+                value = scores[s][k]
+                supplier_row[kpi_name] = None if value != value else round(value, 2)
             matrix_data.append(supplier_row)
         return {
             "matrixData": matrix_data,
@@ -244,6 +568,41 @@ class DashboardAnalytics:
             },
         }
 
+    def _reliability(self):
+        """Per-supplier reliability score (0-100) and factor names."""
+        supplier_count = len(self.suppliers)
+        score = np.zeros(supplier_count, dtype=int)
+        factors = [[] for _ in range(supplier_count)]
+
+        def award(mask, points, factor):
+            nonlocal score
+            score = score + np.where(mask, points, 0)
+            for s in np.flatnonzero(mask).tolist():
+                factors[s].append(factor)
+
+        k = self._k("accidents")
+        if k is not None:
+            total_accidents = self.sums[k]
+            award(total_accidents == 0, 25, "zero_accidents")
+            award((total_accidents != 0) & (total_accidents <= 1), 15, "low_accidents")
+        k = self._k("okDeliveryPercent")
+        if k is not None:
+            avg_delivery = np.where(self.counts[k] > 0, self.means[k], -np.inf)
+            award(avg_delivery >= 95, 25, "excellent_delivery")
+            award((avg_delivery >= 90) & (avg_delivery < 95), 20, "good_delivery")
+            award((avg_delivery >= 80) & (avg_delivery < 90), 10, "acceptable_delivery")
+        k = self._k("productionLossHrs")
+        if k is not None:
+            total_loss = self.sums[k]
+            award(total_loss == 0, 25, "zero_production_loss")
+            award((total_loss != 0) & (total_loss <= 5), 15, "minimal_production_loss")
+        k = self._k("machineDowntimeHrs")
+        if k is not None:
+            total_downtime = self.sums[k]
+            award(total_downtime <= 10, 25, "low_downtime")
+            award((total_downtime > 10) & (total_downtime <= 30), 15, "moderate_downtime")
+        return score, factors
+
     def _operational_insights(self):
         insights = {
             "capacityUtilization": {},
@@ -252,93 +611,67 @@ class DashboardAnalytics:
             "riskAssessment": {},
             "monthlyPerformance": {},
         }
-        if "trips" in self.data and "quantityShipped" in self.data:
-            for supplier in self.suppliers:
-                trips_values = self._get_valid_months_data(self.data["trips"].get(supplier, {}))
-                quantity_values = self._get_valid_months_data(self.data["quantityShipped"].get(supplier, {}))
-                if trips_values and quantity_values:
-                    total_trips = sum(trips_values)
-                    total_quantity = sum(quantity_values)
-                    avg_parts_per_trip = total_quantity / total_trips if total_trips > 0 else 0
-                    insights["capacityUtilization"][supplier] = {
-                        "totalTrips": total_trips,
-                        "totalQuantity": total_quantity,
-                        "avgPartsPerTrip": round(avg_parts_per_trip, 2),
-                    }
-        for supplier in self.suppliers:
-            reliability_score = 0
-            factors = []
-            if "accidents" in self.data:
-                accidents_values = self._get_valid_months_data(self.data["accidents"].get(supplier, {}))
-                total_accidents = sum(accidents_values)
-                if total_accidents == 0:
-                    reliability_score += 25
-                    factors.append("zero_accidents")
-                elif total_accidents <= 1:
-                    reliability_score += 15
-                    factors.append("low_accidents")
-            if "okDeliveryPercent" in self.data:
-                delivery_values = self._get_valid_months_data(self.data["okDeliveryPercent"].get(supplier, {}))
-                if delivery_values:
-                    avg_delivery = statistics.mean(delivery_values)
-                    if avg_delivery >= 95:
-                        reliability_score += 25
-                        factors.append("excellent_delivery")
-                    elif avg_delivery >= 90:
-                        reliability_score += 20
-                        factors.append("good_delivery")
-                    elif avg_delivery >= 80:
-                        reliability_score += 10
-                        factors.append("acceptable_delivery")
-            if "productionLossHrs" in self.data:
-                total_loss = sum(self._get_valid_months_data(self.data["productionLossHrs"].get(supplier, {})))
-                if total_loss == 0:
-                    reliability_score += 25
-                    factors.append("zero_production_loss")
-                elif total_loss <= 5:
-                    reliability_score += 15
-                    factors.append("minimal_production_loss")
-            if "machineDowntimeHrs" in self.data:
-                total_downtime = sum(self._get_valid_months_data(self.data["machineDowntimeHrs"].get(supplier, {})))
-                if total_downtime <= 10:
-                    reliability_score += 25
-                    factors.append("low_downtime")
-                elif total_downtime <= 30:
-                    reliability_score += 15
-                    factors.append("moderate_downtime")
+        k_trips = self._k("trips")
+        k_quantity = self._k("quantityShipped")
+        if k_trips is not None and k_quantity is not None:
+            trips_totals = self.sums[k_trips]
+            quantity_totals = self.sums[k_quantity]
+            both = (self.counts[k_trips] > 0) & (self.counts[k_quantity] > 0)
+            for s in np.flatnonzero(both).tolist():
+                total_trips = float(trips_totals[s])
+                total_quantity = float(quantity_totals[s])
+                avg_parts_per_trip = total_quantity / total_trips if total_trips > 0 else 0
+                insights["capacityUtilization"][self.suppliers[s]] = {
+                    "totalTrips": total_trips,
+                    "totalQuantity": total_quantity,
+                    "avgPartsPerTrip": round(avg_parts_per_trip, 2),
+                }
+
+        scores, factors = self._reliability()
+        for s, supplier in enumerate(self.suppliers):
+            reliability_score = int(scores[s])
             insights["reliabilityMetrics"][supplier] = {
                 "overallScore": min(reliability_score, 100),
-                "reliabilityFactors": factors,
+                "reliabilityFactors": factors[s],
                 "riskLevel": "low" if reliability_score >= 80 else "medium" if reliability_score >= 60 else "high",
             }
-        for month in self.months:
-            month_summary = {
+
+        insights["monthlyPerformance"] = self._monthly_performance()
+        return insights
+
+    def _monthly_performance(self):
+        monthly_performance = {}
+        active = self._active_by_month()
+
+        def monthly_totals(kpi_name):
+            # Whole-number months stay ints, as a sum of the JSON values would
+            k = self._k(kpi_name)
+            if k is None:
+                return [0] * len(self.months)
+            integral = self._monthly_integral(k)
+            return [int(total) if whole else float(total) for total, whole in zip(self._monthly_sums(k).tolist(), integral.tolist())]
+
+        safety = monthly_totals("accidents")
+        trips = monthly_totals("trips")
+        quantity = monthly_totals("quantityShipped")
+        delivery = [0] * len(self.months)
+        k = self._k("okDeliveryPercent")
+        if k is not None:
+            counts = self._monthly_counts(k)
+            integral = self._monthly_integral(k)
+            for m, mean in enumerate(self._monthly_means(k).tolist()):
+                if counts[m]:
+                    delivery[m] = int(mean) if integral[m] and mean.is_integer() else mean
+        for m, month in enumerate(self.months):
+            monthly_performance[month] = {
                 "totalSuppliers": len(self.suppliers),
-                "activeSuppliers": 0,
-                "safetyIncidents": 0,
-                "totalTrips": 0,
-                "totalQuantity": 0,
-                "avgDeliveryRate": 0,
+                "activeSuppliers": int(active[m]),
+                "safetyIncidents": safety[m],
+                "totalTrips": trips[m],
+                "totalQuantity": quantity[m],
+                "avgDeliveryRate": delivery[m],
             }
-            delivery_rates = []
-            for supplier in self.suppliers:
-                has_data = False
-                for kpi_name in self.kpi_names:
-                    if kpi_name in self.data:
-                        if self.data[kpi_name].get(supplier, {}).get(month) is not None:
-                            has_data = True
-                            break
-                if has_data:
-                    month_summary["activeSuppliers"] += 1
-                    month_summary["safetyIncidents"] += self.data.get("accidents", {}).get(supplier, {}).get(month, 0) or 0
-                    month_summary["totalTrips"] += self.data.get("trips", {}).get(supplier, {}).get(month, 0) or 0
-                    month_summary["totalQuantity"] += self.data.get("quantityShipped", {}).get(supplier, {}).get(month, 0) or 0
-                    delivery_value = self.data.get("okDeliveryPercent", {}).get(supplier, {}).get(month)
-                    if delivery_value is not None:
-                        delivery_rates.append(delivery_value)
-            month_summary["avgDeliveryRate"] = statistics.mean(delivery_rates) if delivery_rates else 0
-            insights["monthlyPerformance"][month] = month_summary
-        return insights
+        return monthly_performance
 
 
 
@@ -0,0 +1,258 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from services.dashboard_logic import DashboardAnalytics, LOWER_BETTER_KPIS, RANKING_DIRECTIONS
+from services.kpi_ingest_service import MONTH_MAP, _get_engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = "supplier_kpi_monthly"
+
+
+class SqlDashboardAnalytics(DashboardAnalytics):
+    """DashboardAnalytics computed by Postgres over supplier_kpi_monthly.
+
+    Only grouped aggregates leave the database: per (kpi, supplier) counts,
+    totals and means on load, per (kpi, month) totals for the time series and
+    monthly insights, and per-supplier rows positioned by a `row_number()`
+    window for the rankings, of which only the requested page is returned. The summary, matrix and reliability sections reuse the base
+    class code over those (KPIs x suppliers) arrays, so the payload matches
+    the JSON backend. One year is reported at a time (the latest by default).
+    """
+
+    def __init__(
+        self,
+        year: Optional[int] = None,
+        suppliers: Optional[List[str]] = None,
+        kpis: Optional[List[str]] = None,
+        months: Optional[List[str]] = None,
+    ):
+        super().__init__(TABLE)
+        self.year = year
+        self._filters = {"suppliers": suppliers, "kpis": kpis, "months": months}
+        if months is not None:
+            self.months = [month for month in self.months if month in set(months)]
+        self._monthly = None
+
+    @property
+    def data_source(self) -> str:
+        return f"postgres:{TABLE} (year {self.year})"
+
+    def _where(self, params: Dict[str, Any]) -> str:
+        clauses = ["year = :year"]
+        params["year"] = self.year
+        if self._filters["suppliers"] is not None:
+            clauses.append("supplier_name = ANY(:suppliers)")
+            params["suppliers"] = list(self._filters["suppliers"])
+        if self._filters["kpis"] is not None:
+            clauses.append("kpi_name = ANY(:kpis)")
+            params["kpis"] = list(self._filters["kpis"])
+        if self._filters["months"] is not None:
+            clauses.append("month = ANY(:months)")
+            params["months"] = [MONTH_MAP[month] for month in self.months]
+        return " AND ".join(clauses)
+
+    def _query(self, sql: str, **params):
+        where = self._where(params)
+        with _get_engine().connect() as conn:
+            return conn.execute(text(sql.format(where=where)), params).fetchall()
+
+    def load_data(self) -> bool:
+        try:
+            if self.year is None:
+                with _get_engine().connect() as conn:
+                    self.year = conn.execute(text(f"SELECT max(year) FROM {TABLE}")).scalar()
+                if self.year is None:
+                    logger.error(f"No KPI rows found in {TABLE}")
+                    return False
+
+            meta = self._query(
+                f"""
+                SELECT kpi_name, max(unit) AS unit, max(generated_on) AS generated_on
+                FROM {TABLE} WHERE {{where}}
+                GROUP BY kpi_name
+                ORDER BY min(id)
+                """
+            )
+            stats = self._query(
+                f"""
+                SELECT kpi_name, supplier_name,
+                       count(value) AS n,
+                       coalesce(sum(value::float8), 0) AS total,
+                       avg(value)::float8 AS mean
+                FROM {TABLE} WHERE {{where}}
+                GROUP BY kpi_name, supplier_name
+                """
+            )
+        except Exception as e:
+            logger.error(f"Failed to load KPI aggregates from {TABLE}: {e}")
+            return False
+
+        self.kpi_names = [row.kpi_name for row in meta]
+        self._kpi_index = {kpi_name: k for k, kpi_name in enumerate(self.kpi_names)}
+        self.suppliers = sorted({row.supplier_name for row in stats})
+        generated_on = max((row.generated_on for row in meta if row.generated_on), default=None)
+        self.data = {
+            "generatedOn": generated_on.isoformat() if generated_on else "Unknown",
+            "kpiMetadata": {"unitDescriptions": {row.kpi_name: row.unit for row in meta if row.unit}},
+        }
+
+        supplier_index = {supplier: s for s, supplier in enumerate(self.suppliers)}
+        shape = (len(self.kpi_names), len(self.suppliers))
+        self.counts = np.zeros(shape, dtype=int)
+        self.sums = np.zeros(shape)
+        self.means = np.full(shape, np.nan)
+        for row in stats:
+            k, s = self._kpi_index[row.kpi_name], supplier_index[row.supplier_name]
+            self.counts[k, s] = row.n
+            self.sums[k, s] = row.total
+            if row.mean is not None:
+                self.means[k, s] = row.mean
+        self._monthly = None
+        return True
+
+    def sliced(self, suppliers: Optional[List[str]] = None, kpis: Optional[List[str]] = None, months: Optional[List[str]] = None) -> "SqlDashboardAnalytics":
+        """A view whose queries are restricted to the given names (None keeps all)."""
+        for label, available, requested in (("suppliers", self.suppliers, suppliers), ("KPIs", self.kpi_names, kpis), ("months", self.months, months)):
+            unknown = [name for name in requested or [] if name not in set(available)]
+            if unknown:
+                raise ValueError(f"Unknown {label}: {', '.join(unknown)}")
+        view = SqlDashboardAnalytics(self.year, suppliers, kpis, months)
+        if not view.load_data():
+            raise RuntimeError(f"Failed to load KPI aggregates from {TABLE}")
+        return view
+
+    def _monthly_aggregates(self):
+        """(counts, sums, active, means, whole) per month: counts/sums/means/whole
+        are (KPIs x months), active counts suppliers with any value."""
+        if self._monthly is None:
+            rows = self._query(
+                f"""
+                SELECT kpi_name, month,
+                       count(value) AS n,
+                       coalesce(sum(value::float8), 0) AS total,
+                       avg(value)::float8 AS mean,
+                       coalesce(bool_and(value = trunc(value)), true) AS whole,
+                       count(DISTINCT supplier_name) FILTER (WHERE value IS NOT NULL) AS active
+                FROM {TABLE} WHERE {{where}}
+                GROUP BY GROUPING SETS ((kpi_name, month), (month))
+                """
+            )
+            month_index = {MONTH_MAP[month]: m for m, month in enumerate(self.months)}
+            counts = np.zeros((len(self.kpi_names), len(self.months)), dtype=int)
+            sums = np.zeros((len(self.kpi_names), len(self.months)))
+            active = np.zeros(len(self.months), dtype=int)
+            means = np.full(counts.shape, np.nan)
+            whole = np.ones(counts.shape, dtype=bool)
+            for row in rows:
+                m = month_index.get(row.month)
+                if m is None:
+                    continue
+                if row.kpi_name is None:
+                    active[m] = row.active
+                elif row.kpi_name in self._kpi_index:
+                    k = self._kpi_index[row.kpi_name]
+                    counts[k, m] = row.n
+                    sums[k, m] = row.total
+                    if row.mean is not None:
+                        means[k, m] = row.mean
+                    whole[k, m] = row.whole
+            self._monthly = (counts, sums, active, means, whole)
+        return self._monthly
+
+    def _monthly_counts(self, k):
+        return self._monthly_aggregates()[0][k]
+
+    def _monthly_sums(self, k):
+        return self._monthly_aggregates()[1][k]
+
+    def _active_by_month(self):
+        return self._monthly_aggregates()[2]
+
+    def _monthly_means(self, k):
+        return self._monthly_aggregates()[3][k]
+
+    def _monthly_integral(self, k):
+        return self._monthly_aggregates()[4][k]
+
+    def _rankings(self, limit: Optional[int] = None, offset: int = 0, direction: str = "best"):
+        if direction not in RANKING_DIRECTIONS:
+            raise ValueError(f"Unknown ranking direction '{direction}'. Expected one of: {', '.join(RANKING_DIRECTIONS)}")
+        best = direction == "best"
+        # Position within each KPI; "worst" is the exact reverse of "best", ties included
+        order = ", ".join([
+            f"CASE WHEN kpi_name = ANY(:lower_better) THEN score END {'ASC' if best else 'DESC'}",
+            f"CASE WHEN kpi_name = ANY(:lower_better) THEN NULL ELSE score END {'DESC' if best else 'ASC'}",
+            f'supplier_name COLLATE "C" {"ASC" if best else "DESC"}',
+        ])
+        page = "position > :offset" + (" AND position <= :offset + :limit" if limit is not None else "")
+        # Trend halves follow DashboardAnalytics._trends: the first n // 2 valid months vs the rest
+        rows = self._query(
+            f"""
+            WITH v AS (
+                SELECT kpi_name, supplier_name, month, value::float8 AS value,
+                       row_number() OVER (PARTITION BY kpi_name, supplier_name ORDER BY month) - 1 AS rn,
+                       count(*) OVER (PARTITION BY kpi_name, supplier_name) AS n
+                FROM {TABLE} WHERE {{where}} AND value IS NOT NULL
+            ), s AS (
+                SELECT kpi_name, supplier_name,
+                       count(*) AS n,
+                       sum(value) AS total,
+                       avg(value) AS mean,
+                       avg(value) FILTER (WHERE rn < n / 2) AS first_half,
+                       avg(value) FILTER (WHERE rn >= n / 2) AS second_half,
+                       array_agg(month ORDER BY month) AS months,
+                       array_agg(value ORDER BY month) AS vals,
+                       CASE WHEN kpi_name = 'okDeliveryPercent' THEN avg(value) ELSE sum(value) END AS score
+                FROM v
+                GROUP BY kpi_name, supplier_name
+            )
+            SELECT * FROM (
+                SELECT s.*, row_number() OVER (PARTITION BY kpi_name ORDER BY {order}) AS position
+                FROM s
+            ) ranked
+            WHERE {page}
+            ORDER BY kpi_name, position
+            """,
+            lower_better=LOWER_BETTER_KPIS,
+            offset=offset,
+            **({"limit": limit} if limit is not None else {}),
+        )
+        month_names = {number: month for month, number in MONTH_MAP.items()}
+        rankings = {kpi_name: [] for kpi_name in self.kpi_names}
+        for row in rows:
+            if row.kpi_name not in rankings:
+                continue
+            trend = "stable"
+            if row.n >= 2:
+                if row.second_half > row.first_half * 1.1:
+                    trend = "increasing"
+                elif row.second_half < row.first_half * 0.9:
+                    trend = "decreasing"
+            monthly = dict.fromkeys(self.months)
+            for month, value in zip(row.months, row.vals):
+                # Whole numbers as ints, as in the JSON backend's rankings
+                monthly[month_names[month]] = int(value) if value.is_integer() else value
+            rankings[row.kpi_name].append({
+                "supplier": row.supplier_name,
+                "score": float(row.score),
+                "average": float(row.mean),
+                "trend": trend,
+                "dataPoints": int(row.n),
+                "monthlyData": monthly,
+            })
+        return rankings
+
+
+def data_version() -> Optional[int]:
+    """Sum of the supplier_kpi_version rows the ingest bumps, identical for every worker;
+    None if it cannot be read (no ingest since the table was added, or no database)."""
+    try:
+        with _get_engine().connect() as conn:
+            return conn.execute(text("SELECT coalesce(sum(version), 0)::bigint FROM supplier_kpi_version")).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read the KPI data version: {e}")
+        return None
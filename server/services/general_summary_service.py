@@ -3,6 +3,8 @@ import os
 import logging
 from services.ai_client import client
 from config import RESULTS_DIR
+from services.kpi_repository import load_kpis
+from services.results_store import results_store
 
 
 SUMMARY_PROMPT = """
@@ -70,21 +72,18 @@ If there is not enough data, return: [{"text": "Not enough data available", "sen
 
 
 def generate_general_insights():
-    kpi_path = os.path.abspath(str(RESULTS_DIR / "final_supplier_kpis.json"))
-    output_path = str(RESULTS_DIR / 'General-info.json')
+    snapshot = load_kpis()
+    if snapshot is None:
+        raise FileNotFoundError("KPI data not found")
 
-    with open(kpi_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    input_text = json.dumps(data, indent=2)
+    input_text = json.dumps(snapshot.data, indent=2)
     model_name = os.getenv("AZURE_OPENAI_DEPLOYMENT") or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
     if model_name:
         model_name = model_name.strip().rstrip('%')
     if not model_name:
         logging.warning("AZURE_OPENAI_DEPLOYMENT not set; skipping general insights generation")
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
+            results_store.write_json('General-info.json', [], indent=None)
         except Exception:
             pass
         return []
@@ -105,8 +104,7 @@ def generate_general_insights():
 
         try:
             general = json.loads(reply)
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(general, f, indent=2)
+            results_store.write_json('General-info.json', general, indent=2)
             return general
         except json.JSONDecodeError:
             # Persist raw for debugging and return empty list
@@ -115,14 +113,12 @@ def generate_general_insights():
                     f.write(reply)
             except Exception:
                 pass
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
+            results_store.write_json('General-info.json', [], indent=None)
             return []
     except Exception as e:
         logging.warning(f"General insights generation failed: {e}")
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump([], f)
+            results_store.write_json('General-info.json', [], indent=None)
         except Exception:
             pass
         return []
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # optional: without pyarrow only the JSON file is written and read
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+META_KEYS = ("generatedOn", "kpiMetadata")
+# Supplier names that are sheet artefacts, not suppliers; kpi_repository shares this
+EXCLUDED_SUPPLIERS = ("Sheet1",)
+# Bump when the layout changes; older snapshots are then ignored (readers fall back to JSON)
+ARROW_SNAPSHOT_VERSION = 1
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def arrow_path(json_path) -> Path:
+    """The snapshot written next to a KPI JSON file: final_supplier_kpis.json -> final_supplier_kpis.arrow."""
+    return Path(json_path).with_suffix(".arrow")
+
+
+def _json_stat(json_path: Path) -> Optional[Dict[str, int]]:
+    try:
+        stat = json_path.stat()
+    except FileNotFoundError:
+        return None
+    return {"mtimeNs": stat.st_mtime_ns, "size": stat.st_size}
+
+
+# Month values np.array converts exactly as _numeric would (strings and bools would not be)
+_PLAIN_VALUE_TYPES = {int, float, type(None)}
+
+
+def _numeric(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def write_arrow_snapshot(data: Dict[str, Any], json_path) -> Optional[Path]:
+    """Write `data` (the payload just saved to `json_path`) as an Arrow IPC file.
+
+    One record batch per KPI, in file order, with a `supplier` column and one
+    float64 column per month; missing and non-numeric values are NaN, so the
+    month columns have no validity bitmap and map straight into NumPy. The
+    JSON file's mtime/size are stored in the schema metadata: a snapshot is
+    only used while they still match. Returns the path, or None if skipped.
+    """
+    if pa is None:
+        return None
+    json_path = Path(json_path)
+    target = arrow_path(json_path)
+    source = _json_stat(json_path)
+    if source is None:
+        return None
+    kpi_names = [key for key, value in data.items() if key not in META_KEYS and isinstance(value, dict)]
+    metadata = {
+        "version": str(ARROW_SNAPSHOT_VERSION),
+        "source": json.dumps(source),
+        "kpis": json.dumps(kpi_names),
+        "kpiMetadata": json.dumps(data.get("kpiMetadata", {})),
+    }
+    if "generatedOn" in data:
+        metadata["generatedOn"] = json.dumps(data["generatedOn"])
+    schema = pa.schema(
+        [pa.field("supplier", pa.string())] + [pa.field(month, pa.float64(), nullable=False) for month in MONTHS],
+        metadata=metadata,
+    )
+    tmp_path = target.with_suffix(".arrow.tmp")
+    try:
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for kpi_name in kpi_names:
+                blocks = [(supplier, monthly) for supplier, monthly in data[kpi_name].items() if isinstance(monthly, dict)]
+                rows = [tuple(map(monthly.get, MONTHS)) for _, monthly in blocks]
+                if {type(value) for row in rows for value in row} <= _PLAIN_VALUE_TYPES:
+                    # None converts to NaN under a float dtype
+                    values = np.array(rows, dtype=np.float64)
+                else:
+                    values = np.array([[_numeric(value) for value in row] for row in rows], dtype=np.float64)
+                values = values.reshape(len(blocks), len(MONTHS))
+                columns = [pa.array([supplier for supplier, _ in blocks], pa.string())]
+                columns += [pa.array(values[:, m]) for m in range(len(MONTHS))]
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+        os.replace(tmp_path, target)
+    except Exception as e:
+        logger.warning(f"Failed to write Arrow KPI snapshot {target}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+    return target
+
+
+class KpiArrowSnapshot:
+    """Memory-mapped, read-only view of an Arrow KPI snapshot.
+
+    Opening it reads only the footer and schema; `kpi()` touches just the
+    batch for that KPI and the requested month columns, which are zero-copy
+    NumPy views of the mapped file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._source = pa.memory_map(str(self.path), "r")
+        self._reader = pa.ipc.open_file(self._source)
+        metadata = {key.decode(): value.decode() for key, value in (self._reader.schema.metadata or {}).items()}
+        self.version = int(metadata.get("version", 0))
+        self.source = json.loads(metadata.get("source", "null"))
+        self.kpi_names: List[str] = json.loads(metadata.get("kpis", "[]"))
+        self.kpi_metadata: Dict[str, Any] = json.loads(metadata.get("kpiMetadata", "{}"))
+        self.unit_descriptions: Dict[str, str] = self.kpi_metadata.get("unitDescriptions") or {}
+        self.has_generated_on = "generatedOn" in metadata
+        self.generated_on: Optional[str] = json.loads(metadata["generatedOn"]) if self.has_generated_on else None
+        self._batch_index = {kpi_name: i for i, kpi_name in enumerate(self.kpi_names)}
+
+    def _batch(self, kpi_name: str):
+        return self._reader.get_batch(self._batch_index[kpi_name])
+
+    def suppliers(self, kpi_name: str) -> List[str]:
+        return self._batch(kpi_name).column(0).to_pylist()
+
+    def kpi(self, kpi_name: str, months: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+        """(suppliers, values) for one KPI: values is (suppliers x months) float64, NaN for missing."""
+        batch = self._batch(kpi_name)
+        months = months or MONTHS
+        columns = [batch.column(MONTHS.index(month) + 1).to_numpy() for month in months]
+        values = np.column_stack(columns) if columns else np.empty((batch.num_rows, 0))
+        return batch.column(0).to_pylist(), values
+
+    def iter_values(self, include_excluded: bool = False) -> Iterator[Tuple[str, str, str, Optional[float]]]:
+        """(kpi, supplier, month, value) per cell like KpiSnapshot.iter_values; NaN comes back as None."""
+        for kpi_name in self.kpi_names:
+            suppliers, values = self.kpi(kpi_name)
+            for supplier, row in zip(suppliers, values.tolist()):
+                if not include_excluded and supplier in EXCLUDED_SUPPLIERS:
+                    continue
+                for month, value in zip(MONTHS, row):
+                    yield kpi_name, supplier, month, None if value != value else value
+
+
+def open_arrow_snapshot(json_path) -> Optional[KpiArrowSnapshot]:
+    """The snapshot for `json_path` if pyarrow is installed and it matches the JSON file as it is now."""
+    if pa is None:
+        return None
+    json_path = Path(json_path)
+    path = arrow_path(json_path)
+    if not path.exists():
+        return None
+    try:
+        snapshot = KpiArrowSnapshot(path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable Arrow KPI snapshot {path}: {e}")
+        return None
+    if snapshot.version != ARROW_SNAPSHOT_VERSION or snapshot.source != _json_stat(json_path):
+        return None
+    return snapshot
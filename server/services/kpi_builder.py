@@ -1,9 +1,14 @@
 import json
 import csv
+import hashlib
 import logging
+import os
 from pathlib import Path
 from datetime import date
 
+from services.kpi_arrow import arrow_available, open_arrow_snapshot, write_arrow_snapshot
+from services.results_store import results_store, write_json_atomic
+
 logger = logging.getLogger(__name__)
 
 kpi_map = {
@@ -54,12 +59,161 @@ def parse_monthly_data_from_row(row, data_start_col):
     return monthly_data
 
 
-def build_kpi_json(csv_folder: Path = Path("results/csv_output"), output_path: Path = Path("results/final_supplier_kpis.json")):
+# Bump when parsing or the manifest layout changes so every CSV is re-parsed once
+MANIFEST_VERSION = 2
+
+
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _load_manifest(manifest_path: Path):
+    try:
+        if manifest_path.exists():
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest.get("files", {})
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable KPI manifest: {e}")
+    return {}
+
+
+def _save_manifest(manifest_path: Path, files):
+    try:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": MANIFEST_VERSION, "files": files}))
+        os.replace(tmp_path, manifest_path)
+    except Exception as e:
+        logger.warning(f"Failed to save KPI manifest: {e}")
+
+
+def _blocks_dir(manifest_path: Path) -> Path:
+    """Folder of parsed KPI blocks next to the manifest, one `<sha256>.json` per distinct CSV content."""
+    return manifest_path.with_name(f"{manifest_path.stem}_blocks")
+
+
+def _save_block(blocks_dir: Path, digest: str, kpis):
+    # Not fsynced: a block lost in a crash is simply re-parsed from its CSV
+    path = blocks_dir / f"{digest}.json"
+    if path.exists():
+        return
+    try:
+        blocks_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(kpis))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Failed to save parsed KPI block {path.name}: {e}")
+
+
+def _load_block(blocks_dir: Path, digest: str):
+    """(found, kpis) for a stored block; found is False when it is missing or unreadable."""
+    try:
+        with open(blocks_dir / f"{digest}.json", "r", encoding="utf-8") as f:
+            return True, json.load(f)
+    except (OSError, ValueError):
+        return False, None
+
+
+def _prune_blocks(blocks_dir: Path, files):
+    """Delete the blocks no manifest entry refers to any more."""
+    keep = {f"{entry['sha256']}.json" for entry in files.values()}
+    try:
+        with os.scandir(blocks_dir) as entries:
+            for entry in entries:
+                if entry.name not in keep:
+                    os.unlink(entry.path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Failed to prune parsed KPI blocks: {e}")
+
+
+def _save_output(output_path: Path, data):
+    """Write the KPI JSON plus its Arrow copy (for readers that memory-map instead of parsing).
+
+    Under results/ both are published together as a new results snapshot;
+    elsewhere each file is replaced atomically.
+    """
+    def write(folder: Path):
+        write_json_atomic(folder / output_path.name, data)
+        write_arrow_snapshot(data, folder / output_path.name)
+
+    if results_store.owns(output_path):
+        results_store.commit(write)
+    else:
+        write(output_path.parent)
+
+
+def _supplier_name(csv_path: Path) -> str:
+    return csv_path.stem.replace("- Supplier Partner Performance Matrix", "").strip()
+
+
+def _parse_supplier_csv(csv_path: Path):
+    """Parse one supplier CSV into {kpi: {month: value}}; None when it has no usable content."""
+    supplier_name = _supplier_name(csv_path)
+    logger.info(f"Processing supplier: {supplier_name} from {csv_path.name}")
+
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            csv_rows = list(reader)
+        if len(csv_rows) < 2:
+            logger.warning(f"CSV file appears to have minimal content: {csv_path.name}")
+            return None
+    except Exception as e:
+        logger.error(f"Failed to read CSV for {supplier_name}: {e}")
+        return None
+
+    data_start_col = find_month_data_columns(csv_rows)
+    logger.info(f"Data starts at column {data_start_col} for {supplier_name}")
+
+    supplier_kpis = {}
+    for row in csv_rows:
+        if len(row) < 5:
+            continue
+        kpi_name = None
+        for i in range(min(3, len(row))):
+            cell_content = row[i].strip()
+            if cell_content in kpi_map:
+                kpi_name = kpi_map[cell_content]
+                break
+        if kpi_name:
+            monthly_data = parse_monthly_data_from_row(row, data_start_col)
+            supplier_kpis[kpi_name] = monthly_data
+            logger.info(f"Extracted {kpi_name}: {sum(1 for v in monthly_data.values() if v is not None)} months of data")
+    return supplier_kpis
+
+
+def build_kpi_json(csv_folder: Path = Path("results/csv_output"), output_path: Path = Path("results/final_supplier_kpis.json"), manifest_path: Path = None, changed_suppliers: list = None):
+    """Build the supplier KPI JSON from the per-supplier CSVs.
+
+    A manifest (default: kpi_manifest.json next to `output_path`) records each
+    CSV's mtime, size and hash, and the parsed KPI block of each CSV is kept
+    in its own file (see _blocks_dir), so only new or changed CSVs are
+    re-parsed and only their blocks are written; the output is reassembled
+    from the stored blocks.
+
+    If `changed_suppliers` is given, the names of suppliers whose CSV was
+    re-parsed or removed are appended to it; None is appended when the
+    whole output changed (no manifest to compare against).
+    """
+    manifest_path = manifest_path or output_path.parent / "kpi_manifest.json"
     logger.info(f"Looking for CSV files in: {csv_folder}")
     logger.info(f"CSV folder exists: {csv_folder.exists()}")
 
     if not csv_folder.exists():
         logger.error(f"CSV folder does not exist: {csv_folder}")
+        if changed_suppliers is not None:
+            changed_suppliers.append(None)
         # Create minimal valid output so downstream services can proceed
         try:
             output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -79,8 +233,7 @@ def build_kpi_json(csv_folder: Path = Path("results/csv_output"), output_path: P
                     }
                 },
             }
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(minimal_output, f, indent=2)
+            _save_output(output_path, minimal_output)
             return minimal_output
         except Exception as e:
             logger.error(f"Failed to save minimal KPI data: {e}")
@@ -108,79 +261,96 @@ def build_kpi_json(csv_folder: Path = Path("results/csv_output"), output_path: P
 
     if not csv_files:
         logger.warning("No CSV files found for KPI processing")
+        if changed_suppliers is not None:
+            changed_suppliers.append(None)
         # Ensure an output file exists so downstream services (LLM/ingestion) can proceed
         try:
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(final_output, f, indent=2)
+            _save_output(output_path, final_output)
             logger.info(f"Saved empty KPI data to: {output_path}")
         except Exception as e:
             logger.error(f"Failed to save empty KPI data: {e}")
+        _save_manifest(manifest_path, {})
+        _prune_blocks(_blocks_dir(manifest_path), {})
         return final_output
 
-    if output_path.exists():
-        kpi_file_mtime = output_path.stat().st_mtime
-        csv_files_modified = any(csv_file.stat().st_mtime > kpi_file_mtime for csv_file in csv_files)
-        if not csv_files_modified:
-            logger.info("Using cached KPI data - no CSV files have changed")
-            try:
-                with open(output_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"Failed to load cached KPI data: {e}, regenerating...")
-
-    processed_count = 0
+    manifest = _load_manifest(manifest_path)
+    blocks_dir = _blocks_dir(manifest_path)
+    files = {}
+    parsed = {}
+    changed = []
     for csv_path in csv_files:
-        supplier_name = csv_path.stem.replace("- Supplier Partner Performance Matrix", "").strip()
-        logger.info(f"Processing supplier: {supplier_name} from {csv_path.name}")
+        stat = csv_path.stat()
+        entry = manifest.get(csv_path.name)
+        if entry and entry.get("mtime") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+            files[csv_path.name] = entry
+            continue
+        digest = _file_sha256(csv_path)
+        if entry and entry.get("sha256") == digest:
+            # Touched but identical content: keep the parsed block
+            files[csv_path.name] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+            continue
+        files[csv_path.name] = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "supplier": _supplier_name(csv_path),
+        }
+        parsed[csv_path.name] = _parse_supplier_csv(csv_path)
+        _save_block(blocks_dir, digest, parsed[csv_path.name])
+        changed.append(csv_path.name)
+    removed = [name for name in manifest if name not in files]
+    if changed_suppliers is not None:
+        if not manifest:
+            changed_suppliers.append(None)
+        changed_suppliers.extend(files[name]["supplier"] for name in changed)
+        changed_suppliers.extend(manifest[name].get("supplier") for name in removed)
 
+    if not changed and not removed and output_path.exists():
+        logger.info("Using cached KPI data - no CSV files have changed")
         try:
-            with open(csv_path, newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                csv_rows = list(reader)
-            if len(csv_rows) < 2:
-                logger.warning(f"CSV file appears to have minimal content: {csv_path.name}")
-                continue
+            with open(output_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if files != manifest:
+                _save_manifest(manifest_path, files)
+            if arrow_available() and open_arrow_snapshot(output_path) is None:
+                _save_output(output_path, cached)
+            return cached
         except Exception as e:
-            logger.error(f"Failed to read CSV for {supplier_name}: {e}")
-            continue
+            logger.warning(f"Failed to load cached KPI data: {e}, regenerating...")
 
-        data_start_col = find_month_data_columns(csv_rows)
-        logger.info(f"Data starts at column {data_start_col} for {supplier_name}")
-
-        supplier_kpis = {}
-        for row in csv_rows:
-            if len(row) < 5:
-                continue
-            kpi_name = None
-            for i in range(min(3, len(row))):
-                cell_content = row[i].strip()
-                if cell_content in kpi_map:
-                    kpi_name = kpi_map[cell_content]
-                    break
-            if kpi_name:
-                monthly_data = parse_monthly_data_from_row(row, data_start_col)
-                supplier_kpis[kpi_name] = monthly_data
-                logger.info(f"Extracted {kpi_name}: {sum(1 for v in monthly_data.values() if v is not None)} months of data")
+    logger.info(f"Re-parsed {len(changed)} changed CSV(s), dropped {len(removed)} removed; reusing {len(files) - len(changed)}")
 
-        for kpi_name, monthly_data in supplier_kpis.items():
+    processed_count = 0
+    for csv_path in csv_files:
+        entry = files[csv_path.name]
+        if csv_path.name in parsed:
+            kpis = parsed[csv_path.name]
+        else:
+            found, kpis = _load_block(blocks_dir, entry["sha256"])
+            if not found:
+                kpis = _parse_supplier_csv(csv_path)
+                _save_block(blocks_dir, entry["sha256"], kpis)
+        if kpis is None:
+            continue
+        for kpi_name, monthly_data in kpis.items():
             if kpi_name not in final_output:
                 final_output[kpi_name] = {}
-            final_output[kpi_name][supplier_name] = monthly_data
-
+            final_output[kpi_name][entry["supplier"]] = monthly_data
         processed_count += 1
 
     logger.info(f"Successfully processed {processed_count} suppliers")
 
     try:
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(final_output, f, indent=2)
+        _save_output(output_path, final_output)
         logger.info(f"Saved KPI data to: {output_path}")
     except Exception as e:
         logger.error(f"Failed to save KPI data: {e}")
         return None
 
+    _save_manifest(manifest_path, files)
+    _prune_blocks(blocks_dir, files)
     logger.info(f"KPI processing completed - {processed_count} suppliers processed")
     return final_output
 
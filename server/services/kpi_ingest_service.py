@@ -1,10 +1,18 @@
 import os
-import json
+import csv
 import datetime
+import hashlib
+import io
 import logging
 import time
+import queue
+import threading
+import uuid
+import zlib
 from pathlib import Path
-from typing import Dict, List, Any, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple
 import psycopg2
 import psycopg2.extras as pg_extras
 
@@ -12,6 +20,9 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 
+from config import KPI_TABLE_PARTITIONED
+from services.kpi_repository import load_kpi_columns, load_kpis
+
 
 # Load .env from the server directory (same pattern as ai_client.py)
 ENV_PATH = Path(__file__).parent.parent / ".env"
@@ -22,6 +33,9 @@ logger = logging.getLogger(__name__)
 
 # Reuse a single engine within the process to avoid repeated SSL handshakes
 _ENGINE: Engine | None = None
+_POOL_SIZE = 5
+# Stored rows a delta ingest holds in memory at once (see _plan_delta)
+_DELTA_GROUP_ROWS = 200_000
 
 
 MONTH_MAP: Dict[str, int] = {
@@ -74,17 +88,20 @@ def _get_engine() -> Engine:
         database_url,
         pool_pre_ping=True,
         connect_args=connect_args,
-        pool_size=5,
+        pool_size=_POOL_SIZE,
         max_overflow=0,
     )
     return _ENGINE
 
 
-def _ensure_table_exists(engine: Engine) -> None:
-    create_sql = text(
-        """
-        CREATE TABLE IF NOT EXISTS supplier_kpi_monthly (
-          id BIGSERIAL PRIMARY KEY,
+# (supplier_name, kpi_name, year, month, value, unit, generated_on), in COLUMNS order
+Row = Tuple[str, str, int, int, Optional[float], Optional[str], Optional[str]]
+
+COLUMNS = ("supplier_name", "kpi_name", "year", "month", "value", "unit", "generated_on")
+INGEST_METHODS = ("values", "batch", "copy")
+
+
+_COLUMNS_DDL = """
           supplier_name TEXT NOT NULL,
           kpi_name TEXT NOT NULL,
           year INT NOT NULL,
@@ -93,90 +110,236 @@ def _ensure_table_exists(engine: Engine) -> None:
           unit TEXT,
           generated_on DATE,
           created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
-          UNIQUE (supplier_name, kpi_name, year, month)
-        );
+          UNIQUE (supplier_name, kpi_name, year, month)"""
+
+_SUPPORT_DDL = """
         CREATE INDEX IF NOT EXISTS idx_skm_supplier ON supplier_kpi_monthly (supplier_name);
         CREATE INDEX IF NOT EXISTS idx_skm_kpi ON supplier_kpi_monthly (kpi_name, year, month);
-        """
-    )
-    with engine.begin() as conn:
-        conn.execute(create_sql)
-
-
-def _iter_chunks(items: List[Dict[str, Any]], chunk_size: int) -> Iterable[List[Dict[str, Any]]]:
-    for i in range(0, len(items), chunk_size):
-        yield items[i : i + chunk_size]
-
-
-def _upsert_with_execute_values(raw_conn, rows: List[Dict[str, Any]], page_size: int) -> None:
-    # Build list of tuples in column order matching the template
-    data = [
-        (
-            r["supplier_name"],
-            r["kpi_name"],
-            r["year"],
-            r["month"],
-            r.get("value"),
-            r.get("unit"),
-            r.get("generated_on"),
-        )
-        for r in rows
-    ]
+        CREATE TABLE IF NOT EXISTS supplier_kpi_hashes (
+          supplier_name TEXT NOT NULL,
+          year INT NOT NULL,
+          content_hash TEXT NOT NULL,
+          row_count INT NOT NULL,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+          PRIMARY KEY (supplier_name, year)
+        );
+        CREATE TABLE IF NOT EXISTS supplier_kpi_version (
+          year INT PRIMARY KEY,
+          version BIGINT NOT NULL,
+          updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+"""
+
+# Serializes schema changes across processes (pg_advisory_xact_lock key)
+_SCHEMA_LOCK_KEY = 0x4B50494D
+
+# Per-process schema state: checked once, then only new years cost a round trip
+_schema_lock = threading.Lock()
+_schema_partitioned: Optional[bool] = None
+_partition_years: set = set()
+
+
+def _table_kind(conn) -> Optional[str]:
+    """pg_class.relkind of supplier_kpi_monthly: 'r' (plain), 'p' (partitioned) or None (missing)."""
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('supplier_kpi_monthly')")).scalar()
+
+
+def _partition_name(year: int) -> str:
+    return f"supplier_kpi_monthly_y{int(year)}"
+
+
+def _create_partition(conn, year: int) -> None:
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(year)} PARTITION OF supplier_kpi_monthly FOR VALUES IN ({int(year)})"
+    ))
+
+
+def _create_partitioned_table(conn, id_default: str = "") -> None:
+    id_column = f"id BIGINT NOT NULL DEFAULT {id_default}" if id_default else "id BIGSERIAL"
+    conn.execute(text(
+        f"CREATE TABLE supplier_kpi_monthly ({id_column},{_COLUMNS_DDL},\n          PRIMARY KEY (id, year)\n        ) PARTITION BY LIST (year)"
+    ))
+
+
+def _migrate_to_partitioned(conn) -> List[int]:
+    """Move a plain supplier_kpi_monthly into the partitioned layout, in the caller's transaction.
+
+    The old table is renamed aside (with its indexes, so the names are free),
+    one partition per stored year is created, all rows are copied with their
+    ids, the id sequence is handed over and the old table is dropped.
+    Returns the years that got a partition.
+    """
+    conn.execute(text("LOCK TABLE supplier_kpi_monthly IN ACCESS EXCLUSIVE MODE"))
+    count = conn.execute(text("SELECT count(*) FROM supplier_kpi_monthly")).scalar()
+    logger.info(f"Migrating supplier_kpi_monthly ({count} rows) to a table partitioned by year")
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence('supplier_kpi_monthly', 'id')")).scalar()
+    conn.execute(text("ALTER TABLE supplier_kpi_monthly RENAME TO supplier_kpi_monthly_legacy"))
+    for (index_name,) in conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'supplier_kpi_monthly_legacy'"
+    )).fetchall():
+        conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:48]}_legacy"'))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    _create_partitioned_table(conn, f"nextval('{sequence}')" if sequence else "")
+    years = [year for (year,) in conn.execute(text("SELECT DISTINCT year FROM supplier_kpi_monthly_legacy")).fetchall()]
+    for year in years:
+        _create_partition(conn, year)
+    conn.execute(text(
+        f"INSERT INTO supplier_kpi_monthly (id, {', '.join(COLUMNS)}, created_at) "
+        f"SELECT id, {', '.join(COLUMNS)}, created_at FROM supplier_kpi_monthly_legacy"
+    ))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY supplier_kpi_monthly.id"))
+    conn.execute(text("DROP TABLE supplier_kpi_monthly_legacy"))
+    logger.info(f"Migrated supplier_kpi_monthly into {len(years)} yearly partition(s)")
+    return years
+
+
+def _ensure_table_exists(engine: Engine, year: Optional[int] = None) -> None:
+    """Create the KPI tables (and, when partitioned, the partition for `year`) if needed.
+
+    The catalog is consulted once per process; after that only a year not seen
+    yet costs a statement. With KPI_TABLE_PARTITIONED a plain table left from
+    before is migrated once. An existing partitioned table is always treated
+    as such, whatever the setting.
+    """
+    global _schema_partitioned
+    with _schema_lock:
+        if _schema_partitioned is not None and (not _schema_partitioned or year is None or year in _partition_years):
+            return
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+            created: List[int] = []
+            if _schema_partitioned is None:
+                kind = _table_kind(conn)
+                if kind is None and KPI_TABLE_PARTITIONED:
+                    _create_partitioned_table(conn)
+                elif kind is None:
+                    conn.execute(text(f"CREATE TABLE supplier_kpi_monthly (\n          id BIGSERIAL PRIMARY KEY,{_COLUMNS_DDL}\n        )"))
+                elif kind == "r" and KPI_TABLE_PARTITIONED:
+                    created = _migrate_to_partitioned(conn)
+                conn.execute(text(_SUPPORT_DDL))
+                partitioned = kind == "p" or KPI_TABLE_PARTITIONED
+            else:
+                partitioned = _schema_partitioned
+            if partitioned and year is not None and year not in _partition_years:
+                _create_partition(conn, year)
+                created.append(year)
+        # Only remembered once the transaction has committed
+        _schema_partitioned = partitioned
+        _partition_years.update(created)
+
+
+def _iter_chunks(items: Iterable[Row], chunk_size: int) -> Iterator[List[Row]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_rows(snapshot, year: int, skip_nulls: bool) -> Iterator[Row]:
+    """One Row per KPI cell of the snapshot, produced lazily."""
+    unit_descriptions = snapshot.unit_descriptions
+    generated_on = snapshot.generated_on
+    for kpi_name, supplier_name, month_str, value in snapshot.iter_values():
+        month_num = MONTH_MAP.get(month_str)
+        if month_num is None:
+            continue
+        if skip_nulls and value is None:
+            continue
+        yield supplier_name, kpi_name, year, month_num, value, unit_descriptions.get(kpi_name), generated_on
+
+
+def _upsert_with_execute_values(raw_conn, rows: List[Row], page_size: int) -> None:
     sql = (
         "INSERT INTO supplier_kpi_monthly (supplier_name, kpi_name, year, month, value, unit, generated_on) VALUES %s "
         "ON CONFLICT (supplier_name, kpi_name, year, month) DO UPDATE SET "
         "value = EXCLUDED.value, unit = EXCLUDED.unit, generated_on = EXCLUDED.generated_on"
     )
     with raw_conn.cursor() as cur:
-        pg_extras.execute_values(cur, sql, data, page_size=page_size)
+        pg_extras.execute_values(cur, sql, rows, page_size=page_size)
 
 
-def ingest_final_kpis(
-    json_path: str = "results/final_supplier_kpis.json",
-    skip_nulls: bool = False,
-    batch_size: int = 2000,
-    method: str = "values",  # "values" (fast) | "batch" (sqlalchemy executemany)
-) -> Dict[str, Any]:
-    data = json.loads(Path(json_path).read_text(encoding="utf-8"))
-    unit_descriptions: Dict[str, str] = (data.get("kpiMetadata") or {}).get("unitDescriptions") or {}
-    generated_on = data.get("generatedOn")
-    year = _parse_year(generated_on) if generated_on else datetime.date.today().year
+def _copy_rows(raw_conn, table: str, rows: Iterable[Row], batch_size: int) -> int:
+    """Stream rows into `table` with COPY ... FROM STDIN (CSV), one COPY per batch; returns the batch count."""
+    copy_sql = f"COPY {table} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    batches = 0
+    with raw_conn.cursor() as cur:
+        for chunk in _iter_chunks(rows, batch_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            # None is written as an empty unquoted field, which CSV COPY reads as NULL
+            writer.writerows(chunk)
+            buffer.seek(0)
+            cur.copy_expert(copy_sql, buffer)
+            batches += 1
+    return batches
 
-    rows: List[Dict[str, Any]] = []
-    for kpi_name, per_supplier in data.items():
-        if kpi_name in ("generatedOn", "kpiMetadata"):
-            continue
-        if not isinstance(per_supplier, dict):
-            continue
-        for supplier_name, monthly in per_supplier.items():
-            if supplier_name == "Sheet1":
-                continue
-            if not isinstance(monthly, dict):
-                continue
-            for month_str, value in monthly.items():
-                month_num = MONTH_MAP.get(month_str)
-                if month_num is None:
-                    continue
-                if skip_nulls and value is None:
-                    continue
-                rows.append(
-                    {
-                        "supplier_name": supplier_name,
-                        "kpi_name": kpi_name,
-                        "year": year,
-                        "month": month_num,
-                        "value": value,
-                        "unit": unit_descriptions.get(kpi_name),
-                        "generated_on": generated_on,
-                    }
-                )
-
-    if not rows:
-        return {"upserted": 0}
 
-    engine = _get_engine()
-    _ensure_table_exists(engine)
+def _new_stage(cur) -> str:
+    """Create a uniquely named UNLOGGED staging table and return its name."""
+    stage = f"supplier_kpi_monthly_stage_{uuid.uuid4().hex[:12]}"
+    cur.execute(
+        f"CREATE UNLOGGED TABLE {stage} ("
+        "supplier_name TEXT, kpi_name TEXT, year INT, month SMALLINT, value NUMERIC, unit TEXT, generated_on DATE)"
+    )
+    return stage
+
+
+def _merge_stage(cur, stage: str) -> None:
+    """One set-based upsert of everything in `stage`, then drop it."""
+    columns = ", ".join(COLUMNS)
+    cur.execute(
+        f"INSERT INTO supplier_kpi_monthly ({columns}) SELECT {columns} FROM {stage} "
+        "ON CONFLICT (supplier_name, kpi_name, year, month) DO UPDATE SET "
+        "value = EXCLUDED.value, unit = EXCLUDED.unit, generated_on = EXCLUDED.generated_on"
+    )
+    cur.execute(f"DROP TABLE {stage}")
+
+
+def _load_stage(raw_conn, stage: str, rows: Iterable[Row], batch_size: int, method: str) -> int:
+    """Append rows to a staging table (COPY for "copy", plain multi-row INSERTs otherwise) and commit."""
+    try:
+        if method == "copy":
+            batches = _copy_rows(raw_conn, stage, rows, batch_size)
+        else:
+            batches = 0
+            with raw_conn.cursor() as cur:
+                for chunk in _iter_chunks(rows, batch_size):
+                    pg_extras.execute_values(
+                        cur, f"INSERT INTO {stage} ({', '.join(COLUMNS)}) VALUES %s", chunk, page_size=batch_size
+                    )
+                    batches += 1
+        raw_conn.commit()
+        return batches
+    except Exception:
+        raw_conn.rollback()
+        raise
+
+
+def _upsert_with_copy(raw_conn, rows: Iterable[Row], batch_size: int) -> int:
+    """COPY rows into a private UNLOGGED staging table, then merge them with one INSERT ... SELECT upsert.
 
+    Everything runs in one transaction: the staging table is created, loaded,
+    merged and dropped together, so a failure leaves nothing behind.
+    """
+    try:
+        with raw_conn.cursor() as cur:
+            stage = _new_stage(cur)
+        batches = _copy_rows(raw_conn, stage, rows, batch_size)
+        with raw_conn.cursor() as cur:
+            _merge_stage(cur, stage)
+        raw_conn.commit()
+        return batches
+    except Exception:
+        raw_conn.rollback()
+        raise
+
+
+def _upsert_rows(engine: Engine, rows: Iterable[Row], batch_size: int, method: str) -> int:
+    """Upsert `rows` with the given method, holding at most one batch in memory; returns the number of batches sent."""
     upsert_sql = text(
         """
         INSERT INTO supplier_kpi_monthly
@@ -191,34 +354,473 @@ def ingest_final_kpis(
         """
     )
 
-    start = time.time()
-    total_rows = len(rows)
-    logger.info(f"Starting KPI ingestion: {total_rows} rows, batch_size={batch_size}")
     batches = 0
     if method == "values":
         # Use psycopg2.execute_values for fastest single-round-trip batches
         raw_conn = engine.raw_connection()
         try:
-            for chunk in _iter_chunks(rows, max(1, int(batch_size))):
+            for chunk in _iter_chunks(rows, batch_size):
                 _upsert_with_execute_values(raw_conn, chunk, page_size=batch_size)
                 raw_conn.commit()
                 batches += 1
         finally:
             raw_conn.close()
+    elif method == "copy":
+        raw_conn = engine.raw_connection()
+        try:
+            batches = _upsert_with_copy(raw_conn, rows, batch_size)
+        finally:
+            raw_conn.close()
     else:
         with engine.begin() as conn:
-            for chunk in _iter_chunks(rows, max(1, int(batch_size))):
-                conn.execute(upsert_sql, chunk)
+            for chunk in _iter_chunks(rows, batch_size):
+                conn.execute(upsert_sql, [dict(zip(COLUMNS, row)) for row in chunk])
                 batches += 1
-    elapsed = time.time() - start
-    logger.info(f"KPI ingestion complete: {total_rows} upserted in {elapsed:.2f}s across {batches} batches")
+    return batches
 
+
+def _hash_value(value) -> str:
+    # 3 and 3.0 (JSON vs Arrow snapshot vs NUMERIC) hash alike
+    return "" if value is None else repr(float(value))
+
+
+def _row_digest(row: Row) -> int:
+    key = "\x1f".join((row[1], str(row[3]), _hash_value(row[4]), row[5] or ""))
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest(), "big")
+
+
+def _supplier_hashes(rows: Iterable[Row]) -> Dict[str, Tuple[str, int]]:
+    """{supplier: (content hash, row count)} in one pass over the rows.
+
+    A supplier's hash covers kpi, month, value and unit (not generated_on) and
+    is the sum of its row digests mod 2**256, so it does not depend on the
+    order the rows arrive in and needs no buffering.
+    """
+    sums: Dict[str, List[int]] = {}
+    for row in rows:
+        entry = sums.setdefault(row[0], [0, 0])
+        entry[0] = (entry[0] + _row_digest(row)) % (1 << 256)
+        entry[1] += 1
+    return {supplier: (f"{total:064x}", count) for supplier, (total, count) in sums.items()}
+
+
+def _plan_delta(engine: Engine, hashes: Dict[str, Tuple[str, int]], year: int) -> Dict[str, Any]:
+    """Compare the incoming supplier hashes with what is stored for `year`.
+
+    Suppliers whose content hash matches supplier_kpi_hashes are skipped
+    without reading their rows. The others are split into groups of at most
+    about _DELTA_GROUP_ROWS rows, which _delta_parts diffs one at a time.
+    Suppliers with a stored hash that are missing from the file have all
+    their rows for the year deleted.
+    """
+    with engine.connect() as conn:
+        stored = {
+            row.supplier_name: (row.content_hash, row.row_count)
+            for row in conn.execute(
+                text("SELECT supplier_name, content_hash, row_count FROM supplier_kpi_hashes WHERE year = :year"),
+                {"year": year},
+            ).fetchall()
+        }
+    changed = [supplier for supplier, (digest, _) in hashes.items() if stored.get(supplier, (None, 0))[0] != digest]
+    groups: List[List[str]] = []
+    group: List[str] = []
+    group_rows = 0
+    for supplier in changed:
+        # Stored and incoming rows of a supplier can differ in number; budget for the larger
+        rows = max(hashes[supplier][1], stored.get(supplier, (None, 0))[1])
+        if group and group_rows + rows > _DELTA_GROUP_ROWS:
+            groups.append(group)
+            group, group_rows = [], 0
+        group.append(supplier)
+        group_rows += rows
+    if group:
+        groups.append(group)
     return {
+        "changedSuppliers": set(changed),
+        "groups": groups,
+        "stale": [],
+        "inserted": 0,
+        "changed": 0,
+        "removedSuppliers": [supplier for supplier in stored if supplier not in hashes],
+        "hashes": {supplier: hashes[supplier] for supplier in changed},
+        "skippedSuppliers": len(hashes) - len(changed),
+    }
+
+
+def _stored_rows(engine: Engine, suppliers: List[str], year: int) -> Dict[Tuple[str, str, int], Tuple[str, Optional[str]]]:
+    """{(supplier, kpi, month): (value hash, unit)} of the stored rows of `suppliers` for `year`."""
+    with engine.connect() as conn:
+        return {
+            (row.supplier_name, row.kpi_name, row.month): (_hash_value(row.value), row.unit)
+            for row in conn.execute(
+                text(
+                    "SELECT supplier_name, kpi_name, month, value, unit FROM supplier_kpi_monthly "
+                    "WHERE year = :year AND supplier_name = ANY(:suppliers)"
+                ),
+                {"year": year, "suppliers": suppliers},
+            )
+        }
+
+
+def _delta_rows(plan: Dict[str, Any], existing: Dict[Any, Any], suppliers: set, rows: Iterable[Row]) -> Iterator[Row]:
+    """The rows of `suppliers` that are new or differ from `existing` (their stored rows), counted into `plan`.
+
+    Once `rows` is exhausted, the stored rows it did not match are no longer
+    in the file; they are added to plan["stale"] for _apply_delta_deletes.
+    """
+    for row in rows:
+        if row[0] not in suppliers:
+            continue
+        current = existing.pop((row[0], row[1], row[3]), None)
+        if current is None:
+            plan["inserted"] += 1
+        elif current != (_hash_value(row[4]), row[5]):
+            plan["changed"] += 1
+        else:
+            continue
+        yield row
+    plan["stale"].extend(existing)
+
+
+def _delta_parts(engine: Engine, plan: Dict[str, Any], year: int, make_rows: Callable[[], Iterable[Row]]) -> Iterator[Iterator[Row]]:
+    """One _delta_rows stream per supplier group of the plan, each over a fresh pass of `make_rows()`.
+
+    Only one group's stored rows are in memory at a time. They are read when
+    the group's stream is requested, i.e. after the previous one has been
+    written and its connections returned to the pool.
+    """
+    for group in plan["groups"]:
+        existing = _stored_rows(engine, group, year)
+        yield _delta_rows(plan, existing, set(group), make_rows())
+
+
+def _apply_delta_deletes(cur, plan: Dict[str, Any], year: int) -> int:
+    """Delete rows gone from the file and record the new hashes; returns rows deleted. The caller commits."""
+    deleted = 0
+    if plan["stale"]:
+        pg_extras.execute_values(
+            cur,
+            "DELETE FROM supplier_kpi_monthly t USING (VALUES %s) AS d(supplier_name, kpi_name, month) "
+            f"WHERE t.year = {int(year)} AND t.supplier_name = d.supplier_name AND t.kpi_name = d.kpi_name AND t.month = d.month",
+            plan["stale"],
+            template="(%s, %s, %s::smallint)",
+        )
+        deleted += len(plan["stale"])
+    if plan["removedSuppliers"]:
+        cur.execute(
+            "DELETE FROM supplier_kpi_monthly WHERE year = %s AND supplier_name = ANY(%s)",
+            (year, plan["removedSuppliers"]),
+        )
+        deleted += cur.rowcount
+        cur.execute(
+            "DELETE FROM supplier_kpi_hashes WHERE year = %s AND supplier_name = ANY(%s)",
+            (year, plan["removedSuppliers"]),
+        )
+    if plan["hashes"]:
+        pg_extras.execute_values(
+            cur,
+            "INSERT INTO supplier_kpi_hashes (supplier_name, year, content_hash, row_count) VALUES %s "
+            "ON CONFLICT (supplier_name, year) DO UPDATE SET "
+            "content_hash = EXCLUDED.content_hash, row_count = EXCLUDED.row_count, updated_at = now()",
+            [(supplier, year, digest, count) for supplier, (digest, count) in plan["hashes"].items()],
+        )
+    return deleted
+
+
+def _forget_hashes(cur, year: int) -> None:
+    """Drop the stored supplier hashes for `year`. A plain upsert neither deletes
+    rows gone from the file nor records hashes, so after one the next delta run
+    has to compare every supplier again."""
+    cur.execute("DELETE FROM supplier_kpi_hashes WHERE year = %s", (year,))
+
+
+def _commit_forget_hashes(engine: Engine, year: int) -> None:
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            _forget_hashes(cur, year)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+
+def _bump_version(cur, year: int) -> None:
+    """Move `year`'s row in supplier_kpi_version on. The Postgres dashboard backend
+    fingerprints its data by these versions, so every worker reloads after an ingest."""
+    cur.execute(
+        "INSERT INTO supplier_kpi_version (year, version) VALUES (%s, 1) "
+        "ON CONFLICT (year) DO UPDATE SET version = supplier_kpi_version.version + 1, updated_at = now()",
+        (year,),
+    )
+
+
+def _commit_version(engine: Engine, year: int) -> None:
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            _bump_version(cur, year)
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+
+def _commit_delta(engine: Engine, plan: Dict[str, Any], year: int) -> int:
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            deleted = _apply_delta_deletes(cur, plan, year)
+            _bump_version(cur, year)
+        raw_conn.commit()
+        return deleted
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+
+class _Counted:
+    """Counts the rows drawn from the row iterators it wraps."""
+
+    def __init__(self):
+        self.count = 0
+
+    def wrap(self, rows: Iterable[Row]) -> Iterator[Row]:
+        for row in rows:
+            self.count += 1
+            yield row
+
+
+def _partition(supplier: str, parts: int) -> int:
+    # Stable across runs and processes (unlike hash()), so a supplier always lands in the same part
+    return zlib.crc32(supplier.encode("utf-8")) % parts
+
+
+def _fan_out(rows: Iterable[Row], consumers: List[Callable[[Iterable[Row]], int]], batch_size: int) -> List[int]:
+    """Stream rows to one consumer thread per partition; returns each consumer's result.
+
+    Rows are split by supplier (every supplier goes to exactly one consumer, so
+    concurrent upserts never contend for the same key) and handed over in
+    batches through small bounded queues, so memory stays at a few batches per
+    consumer however many rows there are. A consumer that fails stops receiving
+    rows; the others run to completion before its error is raised.
+    """
+    parts = len(consumers)
+    queues = [queue.Queue(maxsize=2) for _ in range(parts)]
+
+    def drain(q: "queue.Queue[Optional[List[Row]]]") -> Iterator[Row]:
+        while True:
+            chunk = q.get()
+            if chunk is None:
+                return
+            yield from chunk
+
+    def run(index: int) -> int:
+        try:
+            return consumers[index](drain(queues[index]))
+        finally:
+            # Unblock the producer if this consumer stopped early
+            while True:
+                try:
+                    queues[index].get_nowait()
+                except queue.Empty:
+                    break
+
+    with ThreadPoolExecutor(max_workers=parts) as executor:
+        futures = [executor.submit(run, index) for index in range(parts)]
+
+        def put(index: int, chunk: Optional[List[Row]]):
+            while not futures[index].done():
+                try:
+                    queues[index].put(chunk, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        buffers: List[List[Row]] = [[] for _ in range(parts)]
+        try:
+            for row in rows:
+                index = _partition(row[0], parts)
+                buffers[index].append(row)
+                if len(buffers[index]) >= batch_size:
+                    put(index, buffers[index])
+                    buffers[index] = []
+            for index in range(parts):
+                if buffers[index]:
+                    put(index, buffers[index])
+        finally:
+            for index in range(parts):
+                put(index, None)
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {parts} ingest partition(s) failed, the others ran to completion: {errors[0]}") from errors[0]
+    return [future.result() for future in futures]
+
+
+def _ingest_parallel(engine: Engine, rows: Iterable[Row], workers: int, batch_size: int, method: str) -> int:
+    """Upsert each supplier partition on its own pooled connection; each one commits independently."""
+    return sum(_fan_out(rows, [lambda part: _upsert_rows(engine, part, batch_size, method)] * workers, batch_size))
+
+
+def _ingest_atomic(engine: Engine, parts: Iterable[Iterable[Row]], workers: int, batch_size: int, method: str,
+                   plan: Optional[Dict[str, Any]], year: int) -> Tuple[int, int]:
+    """Load the row streams of `parts` one after another into one shared UNLOGGED staging
+    table, each split across the workers in parallel, then apply everything (merge,
+    delta deletes, hashes) in a single transaction.
+
+    supplier_kpi_monthly changes all at once or not at all. Without a delta plan the
+    year's supplier hashes are dropped in that transaction, which also bumps the year's
+    supplier_kpi_version. Returns (batches, rows deleted).
+    """
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            stage = _new_stage(cur)
+        # Committed so the loader connections can see it
+        raw_conn.commit()
+        try:
+            def load(part: Iterable[Row]) -> int:
+                loader = engine.raw_connection()
+                try:
+                    return _load_stage(loader, stage, part, batch_size, method)
+                finally:
+                    loader.close()
+
+            batches = sum(sum(_fan_out(rows, [load] * workers, batch_size)) for rows in parts)
+            with raw_conn.cursor() as cur:
+                _merge_stage(cur, stage)
+                if plan is not None:
+                    deleted = _apply_delta_deletes(cur, plan, year)
+                else:
+                    _forget_hashes(cur, year)
+                    deleted = 0
+                _bump_version(cur, year)
+            raw_conn.commit()
+            return batches, deleted
+        except Exception:
+            raw_conn.rollback()
+            try:
+                with raw_conn.cursor() as cur:
+                    cur.execute(f"DROP TABLE IF EXISTS {stage}")
+                raw_conn.commit()
+            except Exception as e:
+                logger.warning(f"Could not drop KPI staging table {stage}: {e}")
+            raise
+    finally:
+        raw_conn.close()
+
+
+def ingest_final_kpis(
+    json_path: str = "results/final_supplier_kpis.json",
+    skip_nulls: bool = False,
+    batch_size: int = 2000,
+    method: str = "values",  # "values" (fast) | "batch" (sqlalchemy executemany) | "copy" (COPY + set-based merge, for large loads)
+    delta: bool = False,
+    workers: int = 1,
+    atomic: bool = False,
+) -> Dict[str, Any]:
+    """Upsert final_supplier_kpis.json into supplier_kpi_monthly for the year of its generatedOn.
+
+    Rows are produced lazily from the loaded KPI snapshot and written batch by
+    batch, so no more than a few batches of rows are held at any time.
+
+    With `delta`, only rows that are new or whose value/unit changed are
+    written and rows gone from the file are deleted (see _plan_delta). The
+    stored rows are compared one group of suppliers at a time, so memory is
+    bounded by the group size rather than the year; the
+    report then counts inserted, changed, deleted and unchanged rows. Without
+    it the year's supplier hashes are dropped, since a plain upsert leaves rows
+    gone from the file in place; the next delta run compares every supplier.
+
+    `workers` > 1 splits the rows by supplier and upserts the parts
+    concurrently on separate pooled connections; each part commits on its
+    own. With `atomic`, the parts are only loaded in parallel into a staging
+    table and a single transaction applies them, so the table changes all at
+    once or not at all.
+
+    Every ingest ends by bumping the year's row in supplier_kpi_version (in
+    the last transaction it writes), which the Postgres dashboard backend
+    polls to notice new data in every worker.
+    """
+    if method not in INGEST_METHODS:
+        raise ValueError(f"Unknown ingest method '{method}'. Expected one of: {', '.join(INGEST_METHODS)}")
+    # The Arrow snapshot, when current, spares parsing the whole JSON file
+    snapshot = load_kpi_columns(json_path) or load_kpis(json_path)
+    if snapshot is None:
+        raise FileNotFoundError(f"KPI file not found or unreadable: {json_path}")
+    generated_on = snapshot.generated_on
+    year = _parse_year(generated_on) if generated_on else datetime.date.today().year
+
+    # Delta mode reads the rows again for each diff pass (one per supplier group); the snapshot is already in memory
+    hashes = _supplier_hashes(_iter_rows(snapshot, year, skip_nulls)) if delta else None
+    empty = not hashes if delta else next(_iter_rows(snapshot, year, skip_nulls), None) is None
+    if empty:
+        # An empty file means nothing was built, not that every stored row should go
+        return {"upserted": 0}
+
+    engine = _get_engine()
+    _ensure_table_exists(engine, year)
+    batch_size = max(1, int(batch_size))
+
+    start = time.time()
+    plan = None
+    parts: Iterable[Iterable[Row]] = [_iter_rows(snapshot, year, skip_nulls)]
+    if delta:
+        plan = _plan_delta(engine, hashes, year)
+        logger.info(
+            f"KPI delta: {len(plan['changedSuppliers'])} changed supplier(s) to compare in {len(plan['groups'])} group(s), "
+            f"{plan['skippedSuppliers']} unchanged supplier(s) skipped, {len(plan['removedSuppliers'])} supplier(s) dropped"
+        )
+        parts = _delta_parts(engine, plan, year, lambda: _iter_rows(snapshot, year, skip_nulls))
+
+    # Each worker holds one pooled connection; one is always left for the atomic merge
+    # or, otherwise, for the chat and dashboard queries that share the engine
+    workers = max(1, min(int(workers), _POOL_SIZE - 1))
+    logger.info(f"Starting KPI ingestion: batch_size={batch_size}, {workers} worker(s){' (atomic)' if atomic else ''}")
+    counted = _Counted()
+    parts = (counted.wrap(rows) for rows in parts)
+    deleted = None
+    if plan is None and not atomic:
+        # Dropped before any rows are written: these modes commit batch by batch
+        # (or part by part), so stale hashes must not outlive the first commit
+        _commit_forget_hashes(engine, year)
+    if atomic:
+        batches, deleted = _ingest_atomic(engine, parts, workers, batch_size, method, plan, year)
+    elif workers > 1:
+        batches = sum(_ingest_parallel(engine, rows, workers, batch_size, method) for rows in parts)
+    else:
+        batches = sum(_upsert_rows(engine, rows, batch_size, method) for rows in parts)
+    if plan is None and not atomic:
+        _commit_version(engine, year)
+    total_rows = counted.count
+    result: Dict[str, Any] = {
         "upserted": total_rows,
+        "method": method,
         "batches": batches,
         "batchSize": batch_size,
-        "elapsedSeconds": round(elapsed, 2),
+        "workers": workers,
+        "atomic": atomic,
     }
+    if plan is not None:
+        # Hashes are recorded only after the rows are written, so a failed run is redone next time
+        if deleted is None:
+            deleted = _commit_delta(engine, plan, year)
+        result.update({
+            "inserted": plan["inserted"],
+            "changed": plan["changed"],
+            "deleted": deleted,
+            "unchangedSuppliers": plan["skippedSuppliers"],
+        })
+    elapsed = time.time() - start
+    logger.info(f"KPI ingestion complete: {total_rows} upserted in {elapsed:.2f}s across {batches} batches")
+    result["elapsedSeconds"] = round(elapsed, 2)
+    return result
 
 
 def test_db_connection() -> bool:
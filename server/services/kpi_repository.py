@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from config import RESULTS_DIR
+from services.kpi_arrow import EXCLUDED_SUPPLIERS, KpiArrowSnapshot, open_arrow_snapshot
+
+logger = logging.getLogger(__name__)
+
+KPI_FILE = RESULTS_DIR / "final_supplier_kpis.json"
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+# Top-level keys of the KPI file that are not KPIs
+META_KEYS = ("generatedOn", "kpiMetadata")
+
+Value = Optional[float]
+MonthlyValues = Dict[str, Value]
+
+
+class KpiSnapshot:
+    """One loaded version of the KPI file.
+
+    `data` is the parsed payload, shared by every reader of this version: treat
+    it (and everything the accessors return) as read-only.
+    """
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        self.data = data
+        self.version = version
+        self.generated_on: Optional[str] = data.get("generatedOn")
+        self.unit_descriptions: Dict[str, str] = (data.get("kpiMetadata") or {}).get("unitDescriptions") or {}
+        self.kpi_names: List[str] = [key for key, value in data.items() if key not in META_KEYS and isinstance(value, dict)]
+        suppliers = set()
+        for kpi_name in self.kpi_names:
+            suppliers.update(data[kpi_name])
+        self.suppliers: List[str] = sorted(suppliers.difference(EXCLUDED_SUPPLIERS))
+        self._by_supplier: Dict[str, Dict[str, MonthlyValues]] = {}
+        self._by_month: Dict[str, Dict[str, Dict[str, Value]]] = {}
+
+    def kpi(self, kpi_name: str) -> Dict[str, MonthlyValues]:
+        """{supplier: {month: value}} for one KPI (empty if unknown)."""
+        return self.data.get(kpi_name, {}) if kpi_name in self.kpi_names else {}
+
+    def supplier(self, supplier: str) -> Dict[str, MonthlyValues]:
+        """{kpi: {month: value}} for one supplier (empty if unknown)."""
+        if supplier not in self._by_supplier:
+            self._by_supplier[supplier] = {
+                kpi_name: self.data[kpi_name][supplier]
+                for kpi_name in self.kpi_names
+                if isinstance(self.data[kpi_name].get(supplier), dict)
+            }
+        return self._by_supplier[supplier]
+
+    def month(self, month: str) -> Dict[str, Dict[str, Value]]:
+        """{kpi: {supplier: value}} for one month."""
+        if month not in self._by_month:
+            self._by_month[month] = {
+                kpi_name: {
+                    supplier: monthly.get(month)
+                    for supplier, monthly in self.data[kpi_name].items()
+                    if isinstance(monthly, dict)
+                }
+                for kpi_name in self.kpi_names
+            }
+        return self._by_month[month]
+
+    def value(self, kpi_name: str, supplier: str, month: str) -> Value:
+        monthly = self.kpi(kpi_name).get(supplier)
+        return monthly.get(month) if isinstance(monthly, dict) else None
+
+    def iter_values(self, include_excluded: bool = False) -> Iterator[Tuple[str, str, str, Value]]:
+        """(kpi, supplier, month, value) for every stored cell, in file order."""
+        for kpi_name in self.kpi_names:
+            for supplier, monthly in self.data[kpi_name].items():
+                if not isinstance(monthly, dict) or (not include_excluded and supplier in EXCLUDED_SUPPLIERS):
+                    continue
+                for month, value in monthly.items():
+                    yield kpi_name, supplier, month, value
+
+
+class KpiRepository:
+    """Shared, lazily loaded view of one KPI file.
+
+    The file is parsed once per version and handed out as a KpiSnapshot. A new
+    snapshot is loaded when the file's mtime/size change or after `bump()`;
+    `publish()` adopts data that was just written without reading it back.
+    """
+
+    def __init__(self, path: Path = KPI_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._stat: Optional[Tuple[int, int]] = None
+        self._snapshot: Optional[KpiSnapshot] = None
+        self._columns: Optional[KpiArrowSnapshot] = None
+
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self):
+        """Force the next `snapshot()` / `columns()` to re-read the file."""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+            self._columns = None
+
+    def publish(self, data: Dict[str, Any]) -> KpiSnapshot:
+        """Use `data`, which has just been written to the file, as the current snapshot."""
+        with self._lock:
+            self._version += 1
+            self._stat = self._file_stat()
+            self._snapshot = KpiSnapshot(data, self._version)
+            return self._snapshot
+
+    def snapshot(self) -> Optional[KpiSnapshot]:
+        """The current data, loading it if the file changed; None if there is no (readable) file."""
+        with self._lock:
+            stat = self._file_stat()
+            if stat is None:
+                self._snapshot = None
+                return None
+            if self._snapshot is None or stat != self._stat:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except Exception as e:
+                    logger.error(f"Failed to load KPI data from {self.path}: {e}")
+                    return None
+                self._version += 1
+                self._stat = stat
+                self._snapshot = KpiSnapshot(data, self._version)
+                logger.info(f"Loaded KPI data v{self._version} from {self.path}")
+            return self._snapshot
+
+    def columns(self) -> Optional[KpiArrowSnapshot]:
+        """The memory-mapped Arrow snapshot written alongside the current file, if any.
+
+        Cheaper than `snapshot()` for readers that only need numeric columns:
+        nothing is parsed until a KPI is accessed.
+        """
+        with self._lock:
+            columns = self._columns
+            if columns is None or columns.source != self._arrow_source():
+                columns = self._columns = open_arrow_snapshot(self.path)
+            return columns
+
+    def _arrow_source(self) -> Optional[Dict[str, int]]:
+        stat = self._file_stat()
+        return {"mtimeNs": stat[0], "size": stat[1]} if stat else None
+
+
+_REPOSITORIES: Dict[Path, KpiRepository] = {}
+_REPOSITORIES_LOCK = threading.Lock()
+
+
+def kpi_repository(path: Union[str, Path, None] = None) -> KpiRepository:
+    """The process-wide repository for `path` (default: results/final_supplier_kpis.json)."""
+    # Absolute but not resolved: results/ artifacts are symlinks that move to each new snapshot
+    key = Path(os.path.abspath(path or KPI_FILE))
+    with _REPOSITORIES_LOCK:
+        if key not in _REPOSITORIES:
+            _REPOSITORIES[key] = KpiRepository(key)
+        return _REPOSITORIES[key]
+
+
+def load_kpis(path: Union[str, Path, None] = None) -> Optional[KpiSnapshot]:
+    return kpi_repository(path).snapshot()
+
+
+def load_kpi_columns(path: Union[str, Path, None] = None) -> Optional[KpiArrowSnapshot]:
+    return kpi_repository(path).columns()
@@ -0,0 +1,189 @@
+import json
+import logging
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KPICUBE1"
+# magic, version, metadata bytes, KPIs, suppliers, months
+HEADER = struct.Struct("<8sQQQQQ")
+# Control segment: the version of the live cube segment (0 = none yet)
+CONTROL = struct.Struct("<Q")
+
+
+def _segment(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """Open a segment without handing it to the resource tracker.
+
+    Segments outlive the worker that created them: other workers keep
+    reading them after it exits, and swaps unlink superseded ones explicitly.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:  # Python < 3.13 always tracks, which unlinks the segment when this process exits
+        segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+def _unlink(name: str):
+    try:
+        segment = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # tracked here, and untracked again by unlink()
+        segment = shared_memory.SharedMemory(name=name)
+    segment.unlink()
+    segment.close()
+
+
+class SharedKpiCube:
+    """A read-only KPI cube mapped from a shared-memory segment."""
+
+    def __init__(self, segment: shared_memory.SharedMemory):
+        magic, version, meta_size, kpis, suppliers, months = HEADER.unpack_from(segment.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory segment {segment.name} is not a KPI cube")
+        meta = json.loads(bytes(segment.buf[HEADER.size:HEADER.size + meta_size]).decode("utf-8"))
+        self.segment = segment
+        self.version: int = version
+        self.kpi_names: List[str] = meta["kpis"]
+        self.suppliers: List[str] = meta["suppliers"]
+        self.months: List[str] = meta["months"]
+        self.metadata: Dict[str, Any] = meta["metadata"]
+        self.source: Optional[Dict[str, int]] = meta["source"]
+        offset = _cube_offset(meta_size)
+        self.cube = np.ndarray((kpis, suppliers, months), dtype="<f8", buffer=segment.buf, offset=offset)
+        self.cube.flags.writeable = False
+
+
+def _cube_offset(meta_size: int) -> int:
+    # float64 data starts 8-byte aligned after the header and metadata
+    return -(-(HEADER.size + meta_size) // 8) * 8
+
+
+class SharedCubeStore:
+    """Publishes KPI cubes into named shared memory for every worker process.
+
+    Each version lives in its own segment `<name>_<version>`; a small control
+    segment `<name>_ctl` holds the live version. Publishing writes the new
+    segment completely, then flips the control word, so readers see either
+    the old cube or the new one, never a mix. Superseded segments are
+    unlinked at once: workers still mapping them keep their memory until they
+    move on. Publishers are serialized with an exclusive lock on `lock_path`.
+    """
+
+    def __init__(self, name: str, lock_path: Path):
+        self.name = name
+        self.lock_path = Path(lock_path)
+        self._lock = threading.Lock()
+        self._control: Optional[shared_memory.SharedMemory] = None
+        self._attached: Optional[SharedKpiCube] = None
+        # Earlier mappings still referenced by arrays; closed once they are released
+        self._retired: List[shared_memory.SharedMemory] = []
+
+    def _control_segment(self, create: bool = False) -> Optional[shared_memory.SharedMemory]:
+        if self._control is None:
+            try:
+                self._control = _segment(f"{self.name}_ctl")
+            except FileNotFoundError:
+                if not create:
+                    return None
+                try:
+                    self._control = _segment(f"{self.name}_ctl", create=True, size=CONTROL.size)
+                    CONTROL.pack_into(self._control.buf, 0, 0)
+                except FileExistsError:
+                    self._control = _segment(f"{self.name}_ctl")
+        return self._control
+
+    def version(self) -> int:
+        """The live version (0 when nothing has been published)."""
+        control = self._control_segment()
+        return CONTROL.unpack_from(control.buf, 0)[0] if control is not None else 0
+
+    def attach(self) -> Optional[SharedKpiCube]:
+        """The live cube, mapping it on first use after a swap; None if there is none."""
+        with self._lock:
+            for _ in range(3):
+                version = self.version()
+                if version == 0:
+                    return None
+                if self._attached is not None and self._attached.version == version:
+                    return self._attached
+                try:
+                    cube = SharedKpiCube(_segment(f"{self.name}_{version}"))
+                except FileNotFoundError:
+                    # Swapped again between reading the control word and opening the segment
+                    continue
+                if cube.version != version:
+                    continue
+                self._retire(self._attached)
+                self._attached = cube
+                return cube
+            return None
+
+    def _retire(self, cube: Optional[SharedKpiCube]):
+        if cube is not None:
+            self._retired.append(cube.segment)
+        still_used = []
+        for segment in self._retired:
+            try:
+                segment.close()
+            except BufferError:
+                still_used.append(segment)
+        self._retired = still_used
+
+    def publish(self, kpi_names: List[str], suppliers: List[str], months: List[str], cube: np.ndarray,
+                metadata: Dict[str, Any], source: Optional[Dict[str, int]]) -> SharedKpiCube:
+        """Copy `cube` into a new segment, make it the live version and return it mapped."""
+        import fcntl
+
+        meta = json.dumps({
+            "kpis": kpi_names,
+            "suppliers": suppliers,
+            "months": months,
+            "metadata": metadata,
+            "source": source,
+        }).encode("utf-8")
+        offset = _cube_offset(len(meta))
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                control = self._control_segment(create=True)
+                previous = CONTROL.unpack_from(control.buf, 0)[0]
+                version = previous + 1
+                try:
+                    segment = _segment(f"{self.name}_{version}", create=True, size=offset + cube.size * 8)
+                except FileExistsError:
+                    # Left over by a publisher that died before flipping the control word
+                    _unlink(f"{self.name}_{version}")
+                    segment = _segment(f"{self.name}_{version}", create=True, size=offset + cube.size * 8)
+                HEADER.pack_into(segment.buf, 0, MAGIC, version, len(meta), *cube.shape)
+                segment.buf[HEADER.size:HEADER.size + len(meta)] = meta
+                target = np.ndarray(cube.shape, dtype="<f8", buffer=segment.buf, offset=offset)
+                target[...] = cube
+                del target
+                CONTROL.pack_into(control.buf, 0, version)
+                segment.close()
+                if previous:
+                    try:
+                        _unlink(f"{self.name}_{previous}")
+                    except FileNotFoundError:
+                        pass
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        logger.info(f"Published shared KPI cube v{version} ({cube.shape[0]} KPIs x {cube.shape[1]} suppliers)")
+        return self.attach()
+
+    def unlink(self):
+        """Remove the live and control segments (e.g. when the deployment is torn down)."""
+        version = self.version()
+        for name in ([f"{self.name}_{version}"] if version else []) + [f"{self.name}_ctl"]:
+            try:
+                _unlink(name)
+            except FileNotFoundError:
+                pass
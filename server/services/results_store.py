@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from config import RESULTS_DIR, RESULTS_SNAPSHOTS_KEEP
+
+logger = logging.getLogger(__name__)
+
+# Files under results/ that are published through snapshots
+ARTIFACTS = (
+    "final_supplier_kpis.json",
+    "final_supplier_kpis.arrow",
+    "General-info.json",
+    "additional-insights.json",
+    "dashboard_analytics.json",
+)
+
+
+def write_json_atomic(path: Path, data: Any, indent: Optional[int] = None, ensure_ascii: bool = True):
+    """Write JSON to a temp file next to `path`, fsync it and rename it over `path`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # dumps, unlike dump, uses the C encoder when there is no indent
+            f.write(json.dumps(data, indent=indent, ensure_ascii=ensure_ascii))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _fsync_dir(path: Path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ResultsStore:
+    """Versioned, atomically published snapshots of the results/ artifacts.
+
+    Every commit builds a complete directory `snapshots/<version>/` (new files
+    written by the caller, the rest hard-linked from the current snapshot),
+    renames it into place and then swaps the `current` symlink to it, so a
+    reader opening `results/<artifact>` (a symlink to `current/<artifact>`)
+    always gets a whole file from one consistent snapshot. Snapshot files are
+    never modified after commit. Commits from all workers and processes are
+    serialized by an exclusive lock on `.results.lock`; the newest `keep`
+    snapshots are retained.
+    """
+
+    def __init__(self, root: Path = RESULTS_DIR, keep: int = RESULTS_SNAPSHOTS_KEEP):
+        self.root = Path(root)
+        self.keep = max(2, keep)
+        self.snapshots_dir = self.root / "snapshots"
+        self.current = self.root / "current"
+        self._thread_lock = threading.Lock()
+
+    def owns(self, path) -> bool:
+        """True for artifact paths directly under this store's root."""
+        path = Path(path)
+        return path.name in ARTIFACTS and os.path.abspath(path.parent) == os.path.abspath(self.root)
+
+    def path(self, name: str) -> Path:
+        """Stable path of an artifact; it always resolves into the current snapshot."""
+        return self.root / name
+
+    def version(self) -> Optional[int]:
+        try:
+            return int(os.readlink(self.current).rsplit("/", 1)[-1])
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        import fcntl
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock, open(self.root / ".results.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def commit(self, write: Callable[[Path], None]) -> Path:
+        """Publish a new snapshot.
+
+        `write(staging_dir)` creates the changed artifacts in an empty staging
+        directory; every other artifact of the current snapshot is carried over.
+        Nothing becomes visible if `write` raises. Returns the snapshot directory.
+        """
+        with self.lock():
+            self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+            staging = self.snapshots_dir / f".staging-{os.getpid()}-{uuid.uuid4().hex}"
+            staging.mkdir()
+            try:
+                write(staging)
+                for name in ARTIFACTS:
+                    target = staging / name
+                    if target.exists():
+                        continue
+                    source = self.current / name if self.current.exists() else self.root / name
+                    if source.is_file():
+                        try:
+                            os.link(source, target)
+                        except OSError:
+                            shutil.copy2(source, target)
+                _fsync_dir(staging)
+                version = max(self._versions(), default=0) + 1
+                snapshot = self.snapshots_dir / f"{version:06d}"
+                os.rename(staging, snapshot)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            self._point_current(snapshot)
+            self._link_artifacts()
+            self._prune()
+        logger.info(f"Committed results snapshot {snapshot.name}")
+        return snapshot
+
+    def write_json(self, name: str, data: Any, indent: Optional[int] = 2, ensure_ascii: bool = True) -> Path:
+        """Commit a snapshot that replaces one JSON artifact; returns its stable path."""
+        self.commit(lambda staging: write_json_atomic(staging / name, data, indent, ensure_ascii))
+        return self.path(name)
+
+    def _versions(self):
+        if not self.snapshots_dir.exists():
+            return []
+        return [int(entry.name) for entry in self.snapshots_dir.iterdir() if entry.name.isdigit()]
+
+    def _point_current(self, snapshot: Path):
+        tmp_link = self.root / f".current-{uuid.uuid4().hex}"
+        os.symlink(os.path.relpath(snapshot, self.root), tmp_link)
+        os.replace(tmp_link, self.current)
+        _fsync_dir(self.root)
+
+    def _link_artifacts(self):
+        """Make results/<artifact> a symlink into `current`, replacing files from before snapshots."""
+        for name in ARTIFACTS:
+            path = self.root / name
+            if path.is_symlink() or not (self.current / name).exists():
+                continue
+            tmp_link = self.root / f".{name}-{uuid.uuid4().hex}"
+            os.symlink(f"current/{name}", tmp_link)
+            os.replace(tmp_link, path)
+
+    def _prune(self):
+        current = self.version()
+        for version in sorted(self._versions())[:-self.keep]:
+            if version != current:
+                shutil.rmtree(self.snapshots_dir / f"{version:06d}", ignore_errors=True)
+
+
+results_store = ResultsStore()
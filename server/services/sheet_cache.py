@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import CSV_DIR, SHEET_CACHE_FILE
+from services.csv_parser import normalize_sheet_name
+
+logger = logging.getLogger(__name__)
+
+# Bump when the extraction logic changes so every cached sheet is re-extracted once
+CACHE_VERSION = 1
+
+
+class SheetCache:
+    """Tracks which raw sheet XML hash each CSV in `csv_dir` was extracted from.
+
+    A sheet is a hit when the manifest entry for its CSV name carries the same
+    hash and the CSV is still on disk (or the sheet was empty and produced none).
+    """
+
+    def __init__(self, csv_dir: Path = CSV_DIR, manifest_path: Path = SHEET_CACHE_FILE):
+        self.csv_dir = Path(csv_dir)
+        self.manifest_path = Path(manifest_path)
+        self.entries: Dict[str, Dict[str, Optional[str]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            if self.manifest_path.exists():
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == CACHE_VERSION:
+                    self.entries = manifest.get("sheets", {})
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sheet cache manifest: {e}")
+            self.entries = {}
+
+    def is_fresh(self, sheet_name: str, digest: Optional[str]) -> bool:
+        entry = self.entries.get(normalize_sheet_name(sheet_name))
+        fresh = bool(
+            digest
+            and entry
+            and entry.get("digest") == digest
+            and (entry.get("csv") is None or (self.csv_dir / entry["csv"]).exists())
+        )
+        if fresh:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return fresh
+
+    def record(self, sheet_name: str, digest: Optional[str], extracted: bool):
+        """Remember a sheet that was extracted, or found empty; drops a stale CSV if it produced none.
+
+        Not for sheets whose extraction failed: those must stay uncached so the
+        next upload tries them again, and their previous CSV stays in place.
+        """
+        clean_name = normalize_sheet_name(sheet_name)
+        csv_name = f"{clean_name}.csv"
+        if not extracted:
+            try:
+                (self.csv_dir / csv_name).unlink()
+                logger.info(f"Removed stale CSV for changed sheet '{sheet_name}'")
+            except FileNotFoundError:
+                pass
+        if digest:
+            self.entries[clean_name] = {"sheet": sheet_name, "digest": digest, "csv": csv_name if extracted else None}
+        else:
+            self.entries.pop(clean_name, None)
+
+    def save(self):
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": CACHE_VERSION, "sheets": self.entries}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except Exception as e:
+            logger.warning(f"Failed to save sheet cache manifest: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import UPLOAD_JOB_WORKERS, UPLOAD_JOB_HISTORY, UPLOAD_JOBS_DIR
+from services.results_store import write_json_atomic
+from services.upload_pipeline import (
+    UploadProcessingError,
+    expand_archives,
+    parse_workbook,
+    parse_workbooks,
+    build_kpis,
+    generate_insights,
+    ingest_kpis,
+)
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+_JOBS: "OrderedDict[str, UploadJob]" = OrderedDict()
+_JOBS_LOCK = threading.Lock()
+_EXECUTOR = ThreadPoolExecutor(max_workers=UPLOAD_JOB_WORKERS, thread_name_prefix="upload-job")
+
+
+class UploadJob:
+    """State of one upload run; mutated only by its worker thread under `_JOBS_LOCK`."""
+
+    def __init__(self, filename: str, stages: List[str], upload: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.upload = upload or {}
+        self.status = "queued"
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.stages: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "startedAt": None, "elapsedSeconds": None} for name in stages
+        }
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Dict[str, Any]] = None
+        # Bumped on every change so pollers/streams can tell when to emit
+        self.version = 0
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        done = sum(1 for stage in self.stages.values() if stage["status"] == "completed")
+        payload = {
+            "jobId": self.id,
+            "filename": self.filename,
+            "upload": self.upload,
+            "status": self.status,
+            "progress": round(done / len(self.stages), 2) if self.stages else 1.0,
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "error": self.error,
+            "version": self.version,
+        }
+        if include_result:
+            payload["result"] = self.result
+        return payload
+
+
+def _status_path(job_id: str):
+    return UPLOAD_JOBS_DIR / f"{job_id}.json"
+
+
+def _result_path(job_id: str):
+    return UPLOAD_JOBS_DIR / f"{job_id}.result.json"
+
+
+def _persist(job: UploadJob, snapshot: Dict[str, Any]):
+    """Mirror a job snapshot to UPLOAD_JOBS_DIR for the other server workers.
+
+    Only the job's own worker thread calls this, so writes never race. The
+    result is stored once, in its own file, so status polls stay small.
+    """
+    result = snapshot.pop("result", None)
+    for path, data in ((_result_path(job.id), result), (_status_path(job.id), {**snapshot, "ownerPid": os.getpid()})):
+        if data is None:
+            continue
+        try:
+            write_json_atomic(path, data)
+        except Exception as e:
+            logger.warning(f"Job {job.id}: failed to persist {path.name}: {e}")
+
+
+def _update(job: UploadJob, **changes):
+    with _JOBS_LOCK:
+        for key, value in changes.items():
+            setattr(job, key, value)
+        job.version += 1
+        snapshot = job.to_dict(include_result="result" in changes)
+    _persist(job, snapshot)
+
+
+def _update_stage(job: UploadJob, stage: str, **changes):
+    with _JOBS_LOCK:
+        job.stages[stage].update(changes)
+        job.version += 1
+        snapshot = job.to_dict(include_result=False)
+    _persist(job, snapshot)
+
+
+def _run_stage(job: UploadJob, stage: str, fn: Callable[[], Any]) -> Any:
+    start = time.time()
+    _update_stage(job, stage, status="running", startedAt=datetime.now().isoformat())
+    try:
+        value = fn()
+    except Exception:
+        _update_stage(job, stage, status="failed", elapsedSeconds=round(time.time() - start, 2))
+        raise
+    _update_stage(job, stage, status="completed", elapsedSeconds=round(time.time() - start, 2))
+    logger.info(f"Job {job.id}: stage '{stage}' completed in {time.time() - start:.2f}s")
+    return value
+
+
+def _fail(job: UploadJob, error: Dict[str, Any]):
+    for stage, info in job.stages.items():
+        if info["status"] == "pending":
+            _update_stage(job, stage, status="skipped")
+    _update(job, status="failed", error=error, finished_at=datetime.now().isoformat())
+
+
+def _run_job(job: UploadJob, steps: List[Tuple[str, Callable[[], Any]]], assemble: Callable[[Dict[str, Any]], Dict[str, Any]], cleanup: Optional[Callable[[], None]]):
+    _update(job, status="running", started_at=datetime.now().isoformat())
+    outputs: Dict[str, Any] = {}
+    try:
+        for stage, fn in steps:
+            outputs[stage] = _run_stage(job, stage, fn)
+        _update(job, status="completed", result=assemble(outputs), finished_at=datetime.now().isoformat())
+    except UploadProcessingError as e:
+        logger.warning(f"Job {job.id} rejected: {e.detail}")
+        _fail(job, {"statusCode": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logger.exception(f"Job {job.id}: unexpected error during processing")
+        _fail(job, {"statusCode": 500, "detail": f"Processing failed: {str(e)}"})
+    finally:
+        if cleanup:
+            try:
+                cleanup()
+            except Exception as e:
+                logger.warning(f"Job {job.id}: cleanup failed: {e}")
+
+
+def _register(job: UploadJob):
+    with _JOBS_LOCK:
+        _JOBS[job.id] = job
+        # Forget the oldest finished jobs beyond the retention limit
+        while len(_JOBS) > UPLOAD_JOB_HISTORY:
+            oldest_id = next((jid for jid, j in _JOBS.items() if j.status in TERMINAL_STATUSES), None)
+            if oldest_id is None:
+                break
+            _JOBS.pop(oldest_id)
+        snapshot = job.to_dict(include_result=False)
+    _persist(job, snapshot)
+    _prune_persisted()
+
+
+def _prune_persisted():
+    """Delete the oldest finished jobs' files beyond UPLOAD_JOB_HISTORY."""
+    jobs = _persisted_jobs()
+    finished = [job for job in jobs if job["status"] in TERMINAL_STATUSES]
+    for job in finished[UPLOAD_JOB_HISTORY:]:
+        for path in (_status_path(job["jobId"]), _result_path(job["jobId"])):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _owner_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_persisted(job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+    """A job snapshot written by any worker, or None.
+
+    An unfinished job whose worker process is gone is reported as failed.
+    """
+    try:
+        with open(_status_path(job_id), "r", encoding="utf-8") as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+    owner = job.pop("ownerPid", None)
+    if job["status"] not in TERMINAL_STATUSES and not _owner_alive(owner):
+        job["status"] = "failed"
+        job["error"] = {"statusCode": 500, "detail": "The server worker running this job exited before it finished"}
+    if include_result:
+        job["result"] = None
+        if job["status"] == "completed":
+            try:
+                with open(_result_path(job_id), "r", encoding="utf-8") as f:
+                    job["result"] = json.load(f)
+            except (OSError, ValueError):
+                pass
+    return job
+
+
+def _persisted_jobs() -> List[Dict[str, Any]]:
+    """Snapshots (without results) of every persisted job, newest first."""
+    if not UPLOAD_JOBS_DIR.exists():
+        return []
+    jobs = []
+    for path in UPLOAD_JOBS_DIR.glob("*.json"):
+        job_id = path.name[:-len(".json")]
+        if JOB_ID_PATTERN.fullmatch(job_id):
+            job = _read_persisted(job_id, include_result=False)
+            if job is not None:
+                jobs.append(job)
+    jobs.sort(key=lambda job: job["createdAt"], reverse=True)
+    return jobs
+
+
+def submit_job(filename: str, steps: List[Tuple[str, Callable[[], Any]]], assemble: Callable[[Dict[str, Any]], Dict[str, Any]], cleanup: Optional[Callable[[], None]] = None, upload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Queue `steps` (stage name, callable) on the worker pool; returns the initial job snapshot."""
+    job = UploadJob(filename, [stage for stage, _ in steps], upload)
+    _register(job)
+    _EXECUTOR.submit(_run_job, job, steps, assemble, cleanup)
+    return job.to_dict(include_result=False)
+
+
+def submit_upload_job(filename: str, source, upload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Queue the parse -> KPI build -> insights -> ingest pipeline for one workbook.
+
+    `source` is a seekable binary file handle (the spooled upload); it is closed
+    when the job finishes.
+    """
+    steps = [
+        ("parse", lambda: parse_workbook(source)),
+        ("kpi", build_kpis),
+        ("insights", generate_insights),
+        ("ingest", ingest_kpis),
+    ]
+
+    def assemble(outputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "message": "Processing completed",
+            "general-insights": outputs["insights"],
+            "Supplier-KPIs": outputs["kpi"],
+            "ingestion": outputs["ingest"],
+            "sheetCache": outputs["parse"]["sheetCache"],
+        }
+
+    return submit_job(filename, steps, assemble, cleanup=getattr(source, "close", None), upload=upload)
+
+
+def submit_batch_upload_job(files: List[Tuple[str, str]], uploads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Queue one pipeline for many workbooks: parallel extraction, then a single KPI build and ingest.
+
+    `files` are (filename, temp path) pairs, .xlsx or .zip; every temp file,
+    including workbooks unpacked from zips, is removed when the job finishes.
+    """
+    temp_paths = [path for _, path in files]
+
+    def parse():
+        workbooks = expand_archives(files, temp_paths)
+        return parse_workbooks(workbooks)
+
+    steps = [
+        ("parse", parse),
+        ("kpi", build_kpis),
+        ("insights", generate_insights),
+        ("ingest", ingest_kpis),
+    ]
+
+    def assemble(outputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "message": "Processing completed",
+            "general-insights": outputs["insights"],
+            "Supplier-KPIs": outputs["kpi"],
+            "ingestion": outputs["ingest"],
+            "sheetCache": outputs["parse"]["sheetCache"],
+            "workbooks": outputs["parse"]["workbooks"],
+        }
+
+    def cleanup():
+        for path in temp_paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    filename = files[0][0] if len(files) == 1 else f"{len(files)} files"
+    return submit_job(filename, steps, assemble, cleanup=cleanup, upload={"files": uploads})
+
+
+def get_job(job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+    """A job started by any server worker: this process's own jobs from memory, others from UPLOAD_JOBS_DIR."""
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job:
+            return job.to_dict(include_result=include_result)
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    return _read_persisted(job_id, include_result=include_result)
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    with _JOBS_LOCK:
+        jobs = {job.id: job.to_dict(include_result=False) for job in _JOBS.values()}
+    for job in _persisted_jobs():
+        jobs.setdefault(job["jobId"], job)
+    return sorted(jobs.values(), key=lambda job: job["createdAt"], reverse=True)
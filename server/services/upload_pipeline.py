@@ -0,0 +1,252 @@
+import logging
+import os
+import tempfile
+import zipfile
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from config import (
+    CSV_DIR, RESULTS_DIR, EXCLUDED_SHEETS, MAX_UPLOAD_BYTES, BATCH_EXTRACT_WORKERS, UPLOAD_CHUNK_BYTES,
+    MAX_BATCH_WORKBOOKS, MAX_BATCH_UNPACKED_BYTES,
+    KPI_INGEST_BATCH_SIZE, KPI_INGEST_DELTA, KPI_INGEST_METHOD, KPI_INGEST_WORKERS, KPI_INGEST_ATOMIC,
+    DASHBOARD_BACKEND,
+)
+from services.csv_parser import extract_csv, get_sheet_names, hash_sheet_parts, normalize_sheet_name
+from services.kpi_builder import build_kpi_json
+from services.sheet_cache import SheetCache
+from services.dashboard_cache import invalidate_dashboard_cache, update_dashboard_cache
+from services.general_summary_service import generate_general_insights
+from services.kpi_ingest_service import ingest_final_kpis, test_db_connection
+from services.kpi_repository import kpi_repository
+
+logger = logging.getLogger(__name__)
+
+
+class UploadProcessingError(Exception):
+    """A workbook that cannot be processed; `status_code` is the HTTP status to report."""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def parse_workbook(source) -> Dict[str, Any]:
+    """Extract changed sheets of the uploaded workbook into CSV_DIR.
+
+    Sheet names and hashes come from the zip index and extract_csv opens the
+    workbook once, checking content and boundaries per sheet in one pass.
+    """
+    all_sheet_names = get_sheet_names(source)
+    if not all_sheet_names:
+        raise UploadProcessingError("No sheets found in the Excel file")
+
+    sheets_to_process = [sheet for sheet in all_sheet_names if sheet.strip() not in EXCLUDED_SHEETS]
+    if not sheets_to_process:
+        raise UploadProcessingError("No processable sheets found after exclusions")
+
+    # Sheets whose raw XML hash matches the cached extraction are reused as-is
+    sheet_digests = hash_sheet_parts(source)
+    sheet_cache = SheetCache(CSV_DIR)
+    changed_sheets = [
+        sheet for sheet in sheets_to_process
+        if not sheet_cache.is_fresh(sheet, sheet_digests.get(sheet))
+    ]
+
+    if changed_sheets:
+        CSV_DIR.mkdir(parents=True, exist_ok=True)
+        _, name_mapping, failed_sheets = extract_csv(
+            source,
+            CSV_DIR,
+            sheets_to_process=changed_sheets,
+            skip_first_sheet=False,
+            require_content=True,
+        )
+        for sheet in changed_sheets:
+            # A failed sheet stays uncached and keeps its previous CSV, so the next upload retries it
+            if sheet not in failed_sheets:
+                sheet_cache.record(sheet, sheet_digests.get(sheet), normalize_sheet_name(sheet) in name_mapping)
+        sheet_cache.save()
+    logger.info(f"Sheet cache: {sheet_cache.stats()}")
+
+    all_csv_paths = []
+    for sheet in sheets_to_process:
+        csv_path = CSV_DIR / (normalize_sheet_name(sheet) + ".csv")
+        if csv_path.exists():
+            all_csv_paths.append(csv_path)
+
+    if not all_csv_paths:
+        raise UploadProcessingError("No CSV files available for processing")
+
+    return {"sheets": len(sheets_to_process), "csvFiles": len(all_csv_paths), "sheetCache": sheet_cache.stats()}
+
+
+def expand_archives(files: List[Tuple[str, str]], temp_paths: List[str]) -> List[Tuple[str, str]]:
+    """Replace uploaded .zip files by the .xlsx workbooks they contain.
+
+    Each member is copied in chunks to its own temp file (appended to
+    `temp_paths` for cleanup) and is subject to MAX_UPLOAD_BYTES. Workbooks
+    inside archives count against MAX_BATCH_WORKBOOKS like uploaded ones, and
+    everything unpacked in one call must fit in MAX_BATCH_UNPACKED_BYTES.
+    """
+    workbooks = []
+    unpacked = 0
+    for filename, path in files:
+        if not filename.lower().endswith(".zip"):
+            workbooks.append((filename, path))
+            continue
+        try:
+            archive = zipfile.ZipFile(path)
+        except zipfile.BadZipFile:
+            raise UploadProcessingError(f"'{filename}' is not a valid zip archive")
+        with archive:
+            for member in archive.infolist():
+                base_name = os.path.basename(member.filename)
+                if member.is_dir() or member.filename.startswith("__MACOSX/") or base_name.startswith("~$"):
+                    continue
+                if not base_name.lower().endswith(".xlsx"):
+                    continue
+                if len(workbooks) >= MAX_BATCH_WORKBOOKS:
+                    raise UploadProcessingError(f"At most {MAX_BATCH_WORKBOOKS} workbooks can be uploaded at once, including those inside archives", status_code=413)
+                if member.file_size > MAX_UPLOAD_BYTES:
+                    raise UploadProcessingError(f"'{filename}/{member.filename}' exceeds the maximum upload size", status_code=413)
+                if unpacked + member.file_size > MAX_BATCH_UNPACKED_BYTES:
+                    raise UploadProcessingError("The archives unpack to more than the maximum batch size", status_code=413)
+                try:
+                    with archive.open(member) as src, tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as dst:
+                        temp_paths.append(dst.name)
+                        # Counted as it is written: the sizes in the zip directory are only declarations
+                        for chunk in iter(lambda: src.read(UPLOAD_CHUNK_BYTES), b""):
+                            unpacked += len(chunk)
+                            if unpacked > MAX_BATCH_UNPACKED_BYTES:
+                                raise UploadProcessingError("The archives unpack to more than the maximum batch size", status_code=413)
+                            dst.write(chunk)
+                except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError) as e:
+                    # Bad CRC, truncated or corrupt data, unsupported compression or encryption
+                    raise UploadProcessingError(f"'{filename}/{member.filename}' could not be unpacked: {e}")
+                workbooks.append((f"{filename}/{member.filename}", dst.name))
+    if not workbooks:
+        raise UploadProcessingError("No .xlsx workbooks found in the upload")
+    return workbooks
+
+
+def _extract_workbook_task(path: str, sheets: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    _, name_mapping, failed_sheets = extract_csv(path, CSV_DIR, sheets_to_process=sheets, skip_first_sheet=False, require_content=True, workers=1)
+    return name_mapping, failed_sheets
+
+
+def parse_workbooks(workbooks: List[Tuple[str, str]], workers: int = BATCH_EXTRACT_WORKERS) -> Dict[str, Any]:
+    """Extract changed sheets of several workbooks (name, path) into CSV_DIR in parallel.
+
+    When the same sheet appears in more than one workbook the later workbook
+    wins, as if they had been uploaded one after another, so no two workers
+    ever write the same CSV.
+    """
+    plan: "OrderedDict[str, Tuple[int, str, Any]]" = OrderedDict()
+    summaries = []
+    for index, (filename, path) in enumerate(workbooks):
+        sheet_names = get_sheet_names(path)
+        if not sheet_names:
+            logger.warning(f"No sheets found in '{filename}' - skipping")
+        sheet_digests = hash_sheet_parts(path) if sheet_names else {}
+        processable = [sheet for sheet in sheet_names if sheet.strip() not in EXCLUDED_SHEETS]
+        for sheet in processable:
+            clean_name = normalize_sheet_name(sheet)
+            if clean_name in plan and plan[clean_name][0] != index:
+                logger.info(f"Sheet '{sheet}' in '{filename}' replaces the same sheet from '{workbooks[plan[clean_name][0]][0]}'")
+            plan.pop(clean_name, None)
+            plan[clean_name] = (index, sheet, sheet_digests.get(sheet))
+        summaries.append({"filename": filename, "sheets": len(processable), "extracted": 0})
+
+    if not plan:
+        raise UploadProcessingError("No processable sheets found in the uploaded workbooks")
+
+    sheet_cache = SheetCache(CSV_DIR)
+    changed: Dict[int, List[str]] = {}
+    for index, sheet, digest in plan.values():
+        if not sheet_cache.is_fresh(sheet, digest):
+            changed.setdefault(index, []).append(sheet)
+
+    if changed:
+        CSV_DIR.mkdir(parents=True, exist_ok=True)
+        workers = min(max(1, int(workers)), len(changed))
+        logger.info(f"Extracting {sum(len(s) for s in changed.values())} changed sheet(s) from {len(changed)} workbook(s) with {workers} worker(s)")
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {index: executor.submit(_extract_workbook_task, workbooks[index][1], sheets) for index, sheets in changed.items()}
+                results = {}
+                for index, future in futures.items():
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        # e.g. a crashed pool worker: the whole workbook counts as failed
+                        logger.error(f"Failed to extract '{workbooks[index][0]}': {e}")
+                        results[index] = ({}, list(changed[index]))
+        else:
+            results = {index: _extract_workbook_task(workbooks[index][1], sheets) for index, sheets in changed.items()}
+
+        for index, sheets in changed.items():
+            name_mapping, failed_sheets = results[index]
+            summaries[index]["extracted"] = len(name_mapping)
+            if failed_sheets:
+                summaries[index]["failed"] = len(failed_sheets)
+            for sheet in sheets:
+                # A failed sheet stays uncached and keeps its previous CSV, so the next upload retries it
+                if sheet not in failed_sheets:
+                    sheet_cache.record(sheet, plan[normalize_sheet_name(sheet)][2], normalize_sheet_name(sheet) in name_mapping)
+        sheet_cache.save()
+    logger.info(f"Sheet cache: {sheet_cache.stats()}")
+
+    csv_files = sum(1 for clean_name in plan if (CSV_DIR / f"{clean_name}.csv").exists())
+    if not csv_files:
+        raise UploadProcessingError("No CSV files available for processing")
+
+    return {"workbooks": summaries, "sheets": len(plan), "csvFiles": csv_files, "sheetCache": sheet_cache.stats()}
+
+
+def build_kpis() -> Dict[str, Any]:
+    changed_suppliers: List[str] = []
+    supplier_kpi_info = build_kpi_json(changed_suppliers=changed_suppliers)
+    if supplier_kpi_info is None:
+        invalidate_dashboard_cache()
+        logger.warning("KPI builder returned None; continuing with empty outputs")
+        return {}
+    # Readers of the KPI file (insights, ingest, dashboard) share this copy instead of re-reading it
+    kpi_repository().publish(supplier_kpi_info)
+    # Patches the loaded dashboard state for just the changed suppliers when it can
+    update_dashboard_cache(supplier_kpi_info, changed_suppliers)
+    return supplier_kpi_info
+
+
+def generate_insights():
+    try:
+        return generate_general_insights()
+    except Exception as e:
+        logger.warning(f"General insights generation failed: {e}")
+        return []
+
+
+def ingest_kpis() -> Dict[str, Any]:
+    ingest_result = {"upserted": 0}
+    try:
+        # quick connectivity check to fail fast
+        if test_db_connection():
+            ingest_result = ingest_final_kpis(
+                str(RESULTS_DIR / "final_supplier_kpis.json"),
+                skip_nulls=False,
+                batch_size=KPI_INGEST_BATCH_SIZE,
+                method=KPI_INGEST_METHOD,
+                delta=KPI_INGEST_DELTA,
+                workers=KPI_INGEST_WORKERS,
+                atomic=KPI_INGEST_ATOMIC,
+            )
+            if DASHBOARD_BACKEND == "postgres":
+                # Reads what was just ingested; the json backend was already patched in build_kpis
+                invalidate_dashboard_cache()
+        else:
+            logger.warning("Skipping ingestion: DB connectivity test failed")
+    except Exception as ingest_err:
+        logger.warning(f"KPI ingestion failed: {ingest_err}")
+    return ingest_result
@@ -0,0 +1,121 @@
+"""Concurrency in services/dashboard_cache.py: builds and loads run outside the cache lock, once per key."""
+import json
+import threading
+
+import pytest
+
+from services import dashboard_cache
+from services.dashboard_cache import DashboardCache
+
+WAIT = 5
+
+
+@pytest.fixture
+def cache(tmp_path):
+    path = tmp_path / "final_supplier_kpis.json"
+    path.write_text(json.dumps({
+        "generatedOn": "2024-05-01",
+        "kpiMetadata": {"unitDescriptions": {"trips": "count"}},
+        "trips": {"Acme": {"Jan": 3, "Feb": 4}, "Bolt": {"Jan": 5}},
+    }))
+    return DashboardCache(kpi_file=path, backend="json", shared_memory=False)
+
+
+def in_thread(target):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", target()))
+    thread.start()
+    return thread, result
+
+
+def test_a_slow_build_does_not_block_hits_on_other_keys(cache):
+    cache.get("cached", lambda: b"hit")
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        assert release.wait(WAIT)
+        return b"slow"
+
+    thread, result = in_thread(lambda: cache.get("slow", slow))
+    assert started.wait(WAIT)
+    try:
+        assert cache.get("cached", lambda: b"rebuilt")[1] == b"hit"
+    finally:
+        release.set()
+        thread.join(WAIT)
+    assert result["value"][1] == b"slow"
+
+
+def test_concurrent_misses_share_one_build(cache):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        assert release.wait(WAIT)
+        return b"body"
+
+    first, first_result = in_thread(lambda: cache.get("key", build))
+    assert started.wait(WAIT)
+    second, second_result = in_thread(lambda: cache.get("key", build))
+    release.set()
+    first.join(WAIT)
+    second.join(WAIT)
+
+    assert len(calls) == 1
+    assert first_result["value"] == second_result["value"]
+    assert first_result["value"][1] == b"body"
+
+
+def test_a_failed_build_is_not_cached(cache):
+    def build():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get("key", build)
+    assert cache.get("key", lambda: b"body")[1] == b"body"
+
+
+def test_a_build_that_outlives_its_data_is_not_cached(cache):
+    def build():
+        cache.invalidate()
+        return b"stale"
+
+    fingerprint, body = cache.get("key", build)
+    assert body == b"stale"
+    assert fingerprint != cache.fingerprint()
+    assert cache.get("key", lambda: b"fresh")[1] == b"fresh"
+
+
+def test_analytics_is_loaded_once(cache):
+    analytics = cache.analytics()
+    assert analytics is not None and analytics.suppliers == ["Acme", "Bolt"]
+    assert cache.analytics() is analytics
+
+
+
+def test_postgres_fingerprint_follows_the_ingest_version(monkeypatch):
+    versions = iter([3, 3, 4])
+    monkeypatch.setattr(dashboard_cache, "data_version", lambda: next(versions))
+    monkeypatch.setattr(dashboard_cache, "DASHBOARD_VERSION_POLL_SECONDS", 0)
+    first = DashboardCache(backend="postgres", shared_memory=False)
+    second = DashboardCache(backend="postgres", shared_memory=False)
+
+    # Workers agree on the version without either of them calling invalidate()
+    before = first.fingerprint()
+    assert second.fingerprint() == before
+    assert first.fingerprint() != before
+
+
+def test_postgres_version_is_polled_and_reread_after_invalidate(monkeypatch):
+    reads = []
+    monkeypatch.setattr(dashboard_cache, "data_version", lambda: reads.append(1) or len(reads))
+    monkeypatch.setattr(dashboard_cache, "DASHBOARD_VERSION_POLL_SECONDS", 60)
+    cache = DashboardCache(backend="postgres", shared_memory=False)
+
+    before = cache.fingerprint()
+    assert cache.fingerprint() == before and len(reads) == 1
+    cache.invalidate()
+    assert cache.fingerprint() != before and len(reads) == 2
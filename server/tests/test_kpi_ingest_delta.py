@@ -0,0 +1,307 @@
+"""Delta ingest bookkeeping in services/kpi_ingest_service.py, against a recording fake database."""
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from services import kpi_ingest_service as ingest
+
+YEAR = 2024
+
+
+def row(supplier, kpi_name, month, value, unit="count"):
+    return (supplier, kpi_name, YEAR, month, value, unit, "2024-05-01")
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append((sql, params))
+        self.rowcount = 2 if sql.startswith("DELETE FROM supplier_kpi_monthly") else 0
+
+    def copy_expert(self, sql, buffer):
+        self.log.append((sql, buffer.getvalue()))
+
+
+class FakeRawConnection:
+    def __init__(self, log):
+        self.log = log
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit(self):
+        self.log.append(("COMMIT", None))
+
+    def rollback(self):
+        self.log.append(("ROLLBACK", None))
+
+    def close(self):
+        pass
+
+
+class FakeResult(list):
+    def fetchall(self):
+        return list(self)
+
+
+class FakeConnection:
+    """SQLAlchemy-style connection answering the delta planning queries from the engine's hashes and rows."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.engine.log.append((sql, params))
+        if "FROM supplier_kpi_hashes" in sql:
+            return FakeResult(
+                SimpleNamespace(supplier_name=supplier, content_hash=digest, row_count=count)
+                for supplier, (digest, count) in self.engine.hashes.items()
+            )
+        if "FROM supplier_kpi_monthly" in sql:
+            return FakeResult(
+                SimpleNamespace(supplier_name=supplier, kpi_name=kpi_name, month=month, value=value, unit=unit)
+                for (supplier, kpi_name, month), (value, unit) in self.engine.rows.items()
+                if supplier in params["suppliers"]
+            )
+        return FakeResult()
+
+
+class FakeEngine:
+    def __init__(self, hashes=None, rows=None):
+        self.hashes = dict(hashes or {})
+        self.rows = dict(rows or {})
+        self.log = []
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def raw_connection(self):
+        return FakeRawConnection(self.log)
+
+
+@pytest.fixture
+def execute_values(monkeypatch):
+    """Record execute_values calls in the cursor's log instead of sending them."""
+
+    def fake(cur, sql, argslist, template=None, page_size=100):
+        cur.log.append((sql, list(argslist)))
+
+    monkeypatch.setattr(ingest.pg_extras, "execute_values", fake)
+
+
+def statements(log):
+    return [sql for sql, _ in log]
+
+
+def test_supplier_hashes_treat_3_and_3_0_alike():
+    as_int = ingest._supplier_hashes([row("Acme", "trips", 1, 3)])
+    assert ingest._supplier_hashes([row("Acme", "trips", 1, 3.0)]) == as_int
+    assert ingest._supplier_hashes([row("Acme", "trips", 1, Decimal("3.000"))]) == as_int
+    assert ingest._supplier_hashes([row("Acme", "trips", 1, 3.5)]) != as_int
+
+
+def test_supplier_hashes_ignore_row_order():
+    rows = [row("Acme", "trips", 1, 3), row("Acme", "trips", 2, 4), row("Bolt", "trips", 1, None)]
+    hashes = ingest._supplier_hashes(rows)
+    assert hashes == ingest._supplier_hashes(list(reversed(rows)))
+    assert hashes["Acme"][1] == 2 and hashes["Bolt"][1] == 1
+
+
+def test_plan_delta_skips_hash_hits_and_finds_removed_suppliers():
+    incoming = {
+        "Acme": [row("Acme", "trips", 1, 3)],
+        "Bolt": [row("Bolt", "trips", 1, 5)],
+    }
+    hashes = {supplier: ingest._supplier_hashes(rows)[supplier] for supplier, rows in incoming.items()}
+    engine = FakeEngine(
+        hashes={"Acme": hashes["Acme"], "Bolt": ("0" * 64, 1), "Gone": ("f" * 64, 12)},
+    )
+
+    plan = ingest._plan_delta(engine, hashes, YEAR)
+
+    assert plan["changedSuppliers"] == {"Bolt"}
+    assert plan["groups"] == [["Bolt"]]
+    assert plan["skippedSuppliers"] == 1
+    assert plan["removedSuppliers"] == ["Gone"]
+    assert plan["hashes"] == {"Bolt": hashes["Bolt"]}
+
+
+def test_plan_delta_groups_changed_suppliers_by_row_budget(monkeypatch):
+    monkeypatch.setattr(ingest, "_DELTA_GROUP_ROWS", 30)
+    hashes = {"A": ("1" * 64, 12), "B": ("2" * 64, 12), "C": ("3" * 64, 12), "D": ("4" * 64, 5)}
+    # C has more rows stored than it brings, which is what its group must hold
+    engine = FakeEngine(hashes={"C": ("0" * 64, 24)})
+
+    plan = ingest._plan_delta(engine, hashes, YEAR)
+
+    assert plan["groups"] == [["A", "B"], ["C", "D"]]
+
+
+def new_plan():
+    return {"stale": [], "inserted": 0, "changed": 0}
+
+
+def test_delta_rows_yields_inserts_and_changes_only():
+    plan = new_plan()
+    existing = {
+        ("Acme", "trips", 1): (ingest._hash_value(Decimal("3.0")), "count"),
+        ("Acme", "trips", 2): (ingest._hash_value(Decimal("4")), "count"),
+        ("Acme", "trips", 3): (ingest._hash_value(Decimal("5")), "count"),
+    }
+    rows = [
+        row("Acme", "trips", 1, 3),  # stored as 3.0: unchanged
+        row("Acme", "trips", 2, 7),  # changed
+        row("Acme", "trips", 4, 1),  # new
+        row("Skip", "trips", 1, 9),  # supplier outside this group
+    ]
+
+    written = list(ingest._delta_rows(plan, existing, {"Acme"}, rows))
+
+    assert written == [rows[1], rows[2]]
+    assert (plan["inserted"], plan["changed"]) == (1, 1)
+    # What is left was not in the file and is deleted later
+    assert plan["stale"] == [("Acme", "trips", 3)]
+
+
+def test_delta_rows_counts_a_unit_change():
+    plan = new_plan()
+    existing = {("Acme", "trips", 1): (ingest._hash_value(3), "count")}
+    changed = row("Acme", "trips", 1, 3, unit="loads")
+    assert list(ingest._delta_rows(plan, existing, {"Acme"}, [changed])) == [changed]
+    assert plan["changed"] == 1 and plan["stale"] == []
+
+
+def test_delta_parts_reads_stored_rows_one_group_at_a_time():
+    engine = FakeEngine(rows={
+        ("A", "trips", 1): (Decimal("1"), "count"),
+        ("A", "trips", 2): (Decimal("2"), "count"),
+        ("B", "trips", 1): (Decimal("9"), "count"),
+    })
+    plan = dict(new_plan(), groups=[["A"], ["B"]])
+    rows = [row("A", "trips", 1, 1), row("B", "trips", 1, 8), row("B", "trips", 2, 8)]
+    passes = []
+
+    def make_rows():
+        passes.append(len(passes))
+        return iter(rows)
+
+    parts = ingest._delta_parts(engine, plan, YEAR, make_rows)
+    first = next(parts)
+    assert [params["suppliers"] for sql, params in engine.log] == [["A"]]
+    assert list(first) == []
+    assert list(next(parts)) == rows[1:]
+    assert [params["suppliers"] for sql, params in engine.log] == [["A"], ["B"]]
+    assert next(parts, None) is None
+
+    assert len(passes) == 2
+    assert (plan["inserted"], plan["changed"]) == (1, 1)
+    assert plan["stale"] == [("A", "trips", 2)]
+
+
+def test_apply_delta_deletes_removes_gone_rows_and_suppliers(execute_values):
+    log = []
+    plan = {
+        "stale": [("Acme", "trips", 3)],
+        "removedSuppliers": ["Gone"],
+        "hashes": {"Acme": ("a" * 64, 2)},
+    }
+
+    deleted = ingest._apply_delta_deletes(FakeCursor(log), plan, YEAR)
+
+    sqls = statements(log)
+    assert deleted == 1 + 2
+    assert sqls[0].startswith("DELETE FROM supplier_kpi_monthly t USING (VALUES %s)")
+    assert log[0][1] == [("Acme", "trips", 3)]
+    assert log[1] == ("DELETE FROM supplier_kpi_monthly WHERE year = %s AND supplier_name = ANY(%s)", (YEAR, ["Gone"]))
+    assert log[2] == ("DELETE FROM supplier_kpi_hashes WHERE year = %s AND supplier_name = ANY(%s)", (YEAR, ["Gone"]))
+    assert sqls[3].startswith("INSERT INTO supplier_kpi_hashes")
+    assert log[3][1] == [("Acme", YEAR, "a" * 64, 2)]
+
+
+def test_apply_delta_deletes_with_nothing_to_do(execute_values):
+    log = []
+    plan = {"stale": [], "removedSuppliers": [], "hashes": {}}
+    assert ingest._apply_delta_deletes(FakeCursor(log), plan, YEAR) == 0
+    assert log == []
+
+
+@pytest.fixture
+def kpi_file(tmp_path):
+    path = tmp_path / "final_supplier_kpis.json"
+    path.write_text(json.dumps({
+        "generatedOn": "2024-05-01",
+        "kpiMetadata": {"unitDescriptions": {"trips": "count"}},
+        "trips": {"Acme": {"Jan": 3, "Feb": 4}, "Bolt": {"Jan": 5}},
+    }))
+    return str(path)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setattr(ingest, "_get_engine", lambda: engine)
+    monkeypatch.setattr(ingest, "_ensure_table_exists", lambda engine, year=None: None)
+    return engine
+
+
+def test_non_delta_ingest_drops_the_year_hashes_before_writing(kpi_file, engine, execute_values):
+    result = ingest.ingest_final_kpis(kpi_file, delta=False)
+
+    sqls = statements(engine.log)
+    forget = sqls.index("DELETE FROM supplier_kpi_hashes WHERE year = %s")
+    assert engine.log[forget][1] == (YEAR,)
+    assert sqls[forget + 1] == "COMMIT"
+    assert forget < next(i for i, sql in enumerate(sqls) if sql.startswith("INSERT INTO supplier_kpi_monthly"))
+    assert result["upserted"] == 3
+    # The dashboard version moves on only after the rows are written
+    bump = sqls.index(next(sql for sql in sqls if sql.startswith("INSERT INTO supplier_kpi_version")))
+    assert engine.log[bump][1] == (YEAR,)
+    assert bump > max(i for i, sql in enumerate(sqls) if sql.startswith("INSERT INTO supplier_kpi_monthly"))
+    assert sqls[bump + 1] == "COMMIT"
+
+
+def test_atomic_non_delta_ingest_drops_the_year_hashes_with_the_merge(kpi_file, engine, execute_values):
+    ingest.ingest_final_kpis(kpi_file, delta=False, atomic=True, workers=2)
+
+    sqls = statements(engine.log)
+    merge = next(i for i, sql in enumerate(sqls) if sql.startswith("INSERT INTO supplier_kpi_monthly ("))
+    assert sqls[merge + 1].startswith("DROP TABLE")
+    assert sqls[merge + 2] == "DELETE FROM supplier_kpi_hashes WHERE year = %s"
+    assert sqls[merge + 3].startswith("INSERT INTO supplier_kpi_version")
+    assert sqls[merge + 4] == "COMMIT"
+    assert sqls.count("DELETE FROM supplier_kpi_hashes WHERE year = %s") == 1
+
+
+def test_delta_ingest_keeps_other_suppliers_hashes(kpi_file, engine, execute_values):
+    ingest.ingest_final_kpis(kpi_file, delta=True)
+
+    assert "DELETE FROM supplier_kpi_hashes WHERE year = %s" not in statements(engine.log)
+    recorded = next(params for sql, params in engine.log if sql.startswith("INSERT INTO supplier_kpi_hashes"))
+    assert sorted(supplier for supplier, *_ in recorded) == ["Acme", "Bolt"]
+
+
+def test_delta_ingest_bumps_the_version_with_the_hashes(kpi_file, engine, execute_values):
+    ingest.ingest_final_kpis(kpi_file, delta=True)
+
+    sqls = statements(engine.log)
+    hashes = next(i for i, sql in enumerate(sqls) if sql.startswith("INSERT INTO supplier_kpi_hashes"))
+    assert sqls[hashes + 1].startswith("INSERT INTO supplier_kpi_version")
+    assert sqls[hashes + 2] == "COMMIT"
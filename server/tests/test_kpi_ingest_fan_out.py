@@ -0,0 +1,101 @@
+"""Parallel ingest plumbing in services/kpi_ingest_service.py: _fan_out and the worker cap."""
+import json
+import threading
+
+import pytest
+
+from services import kpi_ingest_service as ingest
+
+YEAR = 2024
+
+
+def rows_for(suppliers, months=12):
+    for supplier in suppliers:
+        for month in range(1, months + 1):
+            yield supplier, "trips", YEAR, month, month, "count", "2024-05-01"
+
+
+def collecting(received, lock):
+    def consume(part):
+        rows = list(part)
+        with lock:
+            received.append(rows)
+        return len(rows)
+
+    return consume
+
+
+def test_fan_out_delivers_every_row_once_by_supplier():
+    suppliers = [f"Supplier {n}" for n in range(40)]
+    received, lock = [], threading.Lock()
+
+    results = ingest._fan_out(rows_for(suppliers), [collecting(received, lock)] * 3, batch_size=5)
+
+    assert sum(results) == len(suppliers) * 12
+    assert sorted(row for part in received for row in part) == sorted(rows_for(suppliers))
+    # A supplier's rows all land in one partition
+    owners = {}
+    for index, part in enumerate(received):
+        for row in part:
+            assert owners.setdefault(row[0], index) == index
+
+
+def test_fan_out_raises_after_the_other_consumers_finish_when_one_fails():
+    suppliers = [f"Supplier {n}" for n in range(60)]
+    failing = ingest._partition(suppliers[0], 3)
+    received, lock = [], threading.Lock()
+
+    def consumer(index):
+        consume = collecting(received, lock)
+
+        def run(part):
+            if index == failing:
+                next(iter(part))
+                raise ValueError("boom")
+            return consume(part)
+
+        return run
+
+    with pytest.raises(RuntimeError, match="1 of 3 ingest partition") as excinfo:
+        ingest._fan_out(rows_for(suppliers), [consumer(index) for index in range(3)], batch_size=2)
+
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    # The healthy partitions still got all of their rows
+    expected = [row for row in rows_for(suppliers) if ingest._partition(row[0], 3) != failing]
+    assert sorted(row for part in received for row in part) == sorted(expected)
+
+
+def test_fan_out_stops_the_consumers_when_the_rows_fail():
+    def broken_rows():
+        yield from rows_for(["Acme", "Bolt"])
+        raise OSError("snapshot went away")
+
+    received, lock = [], threading.Lock()
+    with pytest.raises(OSError, match="snapshot went away"):
+        ingest._fan_out(broken_rows(), [collecting(received, lock)] * 2, batch_size=5)
+
+    # Every consumer was told the stream ended instead of waiting forever
+    assert len(received) == 2
+    # Only whole batches went out before the failure
+    assert all(len(part) % 5 == 0 for part in received)
+
+
+def test_parallel_ingest_leaves_a_pooled_connection_free(tmp_path, monkeypatch):
+    path = tmp_path / "final_supplier_kpis.json"
+    path.write_text(json.dumps({"generatedOn": "2024-05-01", "trips": {"Acme": {"Jan": 3}}}))
+    monkeypatch.setattr(ingest, "_get_engine", lambda: None)
+    monkeypatch.setattr(ingest, "_ensure_table_exists", lambda engine, year=None: None)
+    monkeypatch.setattr(ingest, "_commit_forget_hashes", lambda engine, year: None)
+    monkeypatch.setattr(ingest, "_commit_version", lambda engine, year: None)
+    used = []
+
+    def parallel(engine, rows, workers, batch_size, method):
+        used.append(workers)
+        return sum(1 for _ in rows)
+
+    monkeypatch.setattr(ingest, "_ingest_parallel", parallel)
+
+    result = ingest.ingest_final_kpis(str(path), delta=False, workers=ingest._POOL_SIZE + 3)
+
+    assert used == [ingest._POOL_SIZE - 1]
+    assert result["workers"] == ingest._POOL_SIZE - 1